@@ -2,6 +2,10 @@ from functools import lru_cache
 from app.services.toxicity_service import ToxicityService
 from app.services.rewriter_service import RewriterService
 from app.services.decision_engine import DecisionService
+from app.services.rewrite_jobs import RewriteJobStore
+from app.services.admission import AdmissionController, TokenBucketLimiter
+from app.core.config import get_settings
+from app.core.upstream import get_upstream_manager
 
 @lru_cache()
 def get_toxicity_service() -> ToxicityService:
@@ -14,3 +18,24 @@ def get_rewriter_service() -> RewriterService:
 @lru_cache()
 def get_decision_service() -> DecisionService:
     return DecisionService()
+
+@lru_cache()
+def get_rewrite_job_store() -> RewriteJobStore:
+    settings = get_settings()
+    return RewriteJobStore(max_jobs=settings.REWRITE_JOB_MAX, ttl=settings.REWRITE_JOB_TTL)
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    rate_limiter = TokenBucketLimiter(
+        rate=settings.RATE_LIMIT_PER_SECOND,
+        burst=settings.RATE_LIMIT_BURST,
+        max_clients=settings.RATE_LIMIT_MAX_CLIENTS
+    ) if settings.RATE_LIMIT_ENABLED else None
+    return AdmissionController(
+        rate_limiter=rate_limiter,
+        upstream_limiter=get_upstream_manager().limiter,
+        overload_threshold=settings.OVERLOAD_QUEUE_THRESHOLD,
+        policy=settings.OVERLOAD_POLICY,
+        retry_after=settings.OVERLOAD_RETRY_AFTER
+    )
@@ -1,41 +1,439 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.schemas.analysis import AnalysisRequest, AnalysisResponse
+import asyncio
+import json
+import math
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from starlette.requests import HTTPConnection
+from pydantic import ValidationError
+from fastapi.responses import Response, StreamingResponse
+from app.schemas.analysis import (
+    AnalysisRequest, AnalysisResponse,
+    BatchAnalysisRequest, BatchAnalysisResponse, BatchItem, BatchItemResult,
+    RewriteJob, StreamAnalysisRequest, StreamAnalysisResponse
+)
 from app.services.toxicity_service import ToxicityService
 from app.services.rewriter_service import RewriterService
-from app.services.decision_engine import DecisionService
-from app.api.deps import get_toxicity_service, get_rewriter_service, get_decision_service
+from app.services.decision_engine import DecisionService, REWRITE_ACTIONS
+from app.services.rewrite_jobs import RewriteJobStore, JobStoreFull
+from app.services.admission import AdmissionController, Rejected
+from app.api.deps import (
+    get_toxicity_service, get_rewriter_service, get_decision_service, get_rewrite_job_store,
+    get_admission_controller
+)
+from app.core.config import get_settings
 from datetime import datetime
-from app.core.logging import logger
+from app.core.logging import logger, bind_request, unbind_request, annotate_request, logging_stats
+from app.core.metrics import observe_request, observe_stage, record_outcome, render_metrics
 
 router = APIRouter()
 
+async def run_until_disconnect(request: Request, coro):
+    """
+    Runs `coro` as a task and cancels it if the client goes away first,
+    so abandoned requests stop holding upstream calls open.
+    """
+    interval = get_settings().DISCONNECT_POLL_INTERVAL
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                logger.info("Client disconnected. Cancelled in-flight analysis.")
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+def request_id_for(headers) -> str:
+    """Correlation id: the caller's X-Request-ID if given, otherwise a new one."""
+    return headers.get("x-request-id") or uuid.uuid4().hex
+
+def client_key(connection: HTTPConnection) -> str:
+    """
+    Rate-limit identity of the caller: its address, or behind a proxy the
+    RATE_LIMIT_CLIENT_HEADER entry appended by the outermost of the
+    RATE_LIMIT_TRUSTED_PROXIES proxies. Entries left of that are whatever
+    the client sent, so they're never used. Nor is the user_id it sends.
+    """
+    settings = get_settings()
+    header = settings.RATE_LIMIT_CLIENT_HEADER
+    forwarded = connection.headers.get(header) if header else None
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        if len(hops) >= settings.RATE_LIMIT_TRUSTED_PROXIES > 0:
+            return hops[-settings.RATE_LIMIT_TRUSTED_PROXIES]
+    return connection.client.host if connection.client else "unknown"
+
+def admit_or_429(admission: AdmissionController, http_request: Request, items: int, priority: str) -> bool:
+    """Admission check for an HTTP request; returns True if it should run degraded."""
+    try:
+        return admission.admit(client_key(http_request), items, priority)
+    except Rejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded" if e.reason == "rate_limited" else "Server overloaded",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+
+def check_message_size(message: str):
+    max_chars = get_settings().MAX_MESSAGE_CHARS
+    if len(message) > max_chars:
+        raise HTTPException(status_code=413, detail=f"Message exceeds {max_chars} characters")
+
+async def analyze_pipeline(
+    message: str,
+    user_id: str,
+    toxicity_service: ToxicityService,
+    rewriter_service: RewriterService,
+    decision_service: DecisionService,
+    rewrite_jobs: Optional[RewriteJobStore] = None,
+    incremental: bool = False,
+    degraded: bool = False
+) -> AnalysisResponse:
+    # 1. Analyze (per sentence for incremental drafts)
+    with observe_stage("classify"):
+        if incremental:
+            analysis_result = await toxicity_service.analyze_incremental(message)
+        else:
+            analysis_result = await toxicity_service.analyze(message)
+
+    # 2. Decide
+    with observe_stage("decide"):
+        action, reason = await decision_service.decide(analysis_result, user_id)
+    record_outcome(analysis_result.label, action)
+    annotate_request(action=action, label=analysis_result.label, severity=analysis_result.severity)
+
+    # 3. Rewrite if needed (in the background when a job store is given),
+    # unless the request was degraded to shed load
+    rewritten_text = None
+    rewrite_tier = None
+    rewrite_job_id = None
+    if action in REWRITE_ACTIONS and not degraded:
+        if rewrite_jobs is not None:
+            try:
+                rewrite_job_id = rewrite_jobs.submit(message, rewriter_service.rewrite_with_tier)
+            except JobStoreFull as e:
+                logger.error(f"Deferred rewrite unavailable, rewriting inline: {e}")
+        if rewrite_job_id is None:
+            with observe_stage("rewrite"):
+                rewritten_text, rewrite_tier = await rewriter_service.rewrite_with_tier(message)
+
+    return AnalysisResponse(
+        analysis=analysis_result,
+        action=action,
+        reason=reason,
+        rewrite=rewritten_text,
+        rewrite_tier=rewrite_tier,
+        rewrite_job_id=rewrite_job_id,
+        degraded=degraded,
+        timestamp=datetime.now().isoformat()
+    )
+
+async def analyze_batch_pipeline(
+    items: list[BatchItem],
+    toxicity_service: ToxicityService,
+    rewriter_service: RewriterService,
+    decision_service: DecisionService,
+    degraded: bool = False
+) -> BatchAnalysisResponse:
+    # 1. Analyze (batched upstream calls)
+    with observe_stage("classify"):
+        analyses = await toxicity_service.analyze_batch([item.message for item in items])
+
+    # 2. Decide, in input order so escalation matches sequential submission
+    decided = [i for i, analysis_result in enumerate(analyses) if analysis_result.label != "error"]
+    with observe_stage("decide"):
+        decisions = dict(zip(decided, await decision_service.decide_batch(
+            [analyses[i] for i in decided], [items[i].user_id for i in decided]
+        )))
+    results = []
+    for index, analysis_result in enumerate(analyses):
+        if index not in decisions:
+            results.append(BatchItemResult(index=index, error="Toxicity analysis failed."))
+            continue
+        action, reason = decisions[index]
+        record_outcome(analysis_result.label, action)
+        results.append(BatchItemResult(
+            index=index,
+            result=AnalysisResponse(
+                analysis=analysis_result,
+                action=action,
+                reason=reason,
+                degraded=degraded,
+                timestamp=datetime.now().isoformat()
+            )
+        ))
+
+    # 3. Rewrite only the items that need it, concurrently
+    to_rewrite = [] if degraded else [r for r in results if r.result and r.result.action in REWRITE_ACTIONS]
+    async def rewrite(message: str):
+        with observe_stage("rewrite"):
+            return await rewriter_service.rewrite_with_tier(message)
+
+    rewrites = await asyncio.gather(
+        *[rewrite(items[r.index].message) for r in to_rewrite],
+        return_exceptions=True
+    )
+    for item_result, rewritten in zip(to_rewrite, rewrites):
+        if isinstance(rewritten, Exception):
+            logger.error(f"Rewrite failed for batch item {item_result.index}: {rewritten}")
+            item_result.error = "Rewrite failed."
+        else:
+            item_result.result.rewrite, item_result.result.rewrite_tier = rewritten
+
+    return BatchAnalysisResponse(results=results)
+
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_message(
     request: AnalysisRequest,
+    http_request: Request,
+    response: Response,
     toxicity_service: ToxicityService = Depends(get_toxicity_service),
     rewriter_service: RewriterService = Depends(get_rewriter_service),
-    decision_service: DecisionService = Depends(get_decision_service)
+    decision_service: DecisionService = Depends(get_decision_service),
+    rewrite_jobs: RewriteJobStore = Depends(get_rewrite_job_store),
+    admission: AdmissionController = Depends(get_admission_controller)
 ):
+    check_message_size(request.message)
+    degraded = admit_or_429(admission, http_request, 1, request.priority)
+    request_id = request_id_for(http_request.headers)
+    response.headers["X-Request-ID"] = request_id
+    token = bind_request(request_id=request_id, user_id=request.user_id)
     try:
-        # 1. Analyze
-        analysis_result = toxicity_service.analyze(request.message)
-        
-        # 2. Decide
-        action, reason = decision_service.decide(analysis_result, request.user_id)
-        
-        # 3. Rewrite if needed
-        rewritten_text = None
-        if action in ["block_and_rewrite", "warn", "block_and_alert"]:
-            rewritten_text = rewriter_service.rewrite(request.message)
-            
-        return AnalysisResponse(
-            analysis=analysis_result,
-            action=action,
-            reason=reason,
-            rewrite=rewritten_text,
-            timestamp=datetime.now().isoformat()
-        )
-            
+        with observe_request("analyze"):
+            result = await run_until_disconnect(
+                http_request,
+                analyze_pipeline(
+                    request.message,
+                    request.user_id,
+                    toxicity_service,
+                    rewriter_service,
+                    decision_service,
+                    rewrite_jobs if request.defer_rewrite else None,
+                    request.incremental,
+                    degraded
+                )
+            )
+        logger.info("Analysis complete", extra={"high_volume": True})
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        unbind_request(token)
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(
+    request: BatchAnalysisRequest,
+    http_request: Request,
+    response: Response,
+    toxicity_service: ToxicityService = Depends(get_toxicity_service),
+    rewriter_service: RewriterService = Depends(get_rewriter_service),
+    decision_service: DecisionService = Depends(get_decision_service),
+    admission: AdmissionController = Depends(get_admission_controller)
+):
+    max_items = get_settings().BATCH_MAX_ITEMS
+    if len(request.items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {max_items} items")
+    for item in request.items:
+        check_message_size(item.message)
+    degraded = admit_or_429(admission, http_request, len(request.items), request.priority)
+
+    request_id = request_id_for(http_request.headers)
+    response.headers["X-Request-ID"] = request_id
+    token = bind_request(request_id=request_id, items=len(request.items))
+    try:
+        with observe_request("analyze_batch"):
+            result = await run_until_disconnect(
+                http_request,
+                analyze_batch_pipeline(
+                    request.items,
+                    toxicity_service,
+                    rewriter_service,
+                    decision_service,
+                    degraded
+                )
+            )
+        logger.info("Batch analysis complete", extra={"high_volume": True})
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing batch request: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        unbind_request(token)
+
+@router.websocket("/ws/analyze")
+async def analyze_stream(
+    websocket: WebSocket,
+    toxicity_service: ToxicityService = Depends(get_toxicity_service),
+    rewriter_service: RewriterService = Depends(get_rewriter_service),
+    decision_service: DecisionService = Depends(get_decision_service),
+    rewrite_jobs: RewriteJobStore = Depends(get_rewrite_job_store),
+    admission: AdmissionController = Depends(get_admission_controller)
+):
+    """
+    One connection per client. Each text update carries a `seq`; a newer
+    update cancels the in-flight analysis of older ones, so only the latest
+    verdict is sent back.
+    """
+    await websocket.accept()
+    latest_seq = None
+    current: Optional[asyncio.Task] = None
+
+    connection_id = request_id_for(websocket.headers)
+    client = client_key(websocket)
+
+    async def process(update: StreamAnalysisRequest, degraded: bool):
+        # Runs in its own task, so the binding is local to this update.
+        bind_request(request_id=f"{connection_id}:{update.seq}", user_id=update.user_id)
+        try:
+            with observe_request("ws_analyze"):
+                response = await analyze_pipeline(
+                    update.message,
+                    update.user_id,
+                    toxicity_service,
+                    rewriter_service,
+                    decision_service,
+                    rewrite_jobs if update.defer_rewrite else None,
+                    update.incremental,
+                    degraded
+                )
+            payload = StreamAnalysisResponse(seq=update.seq, **response.model_dump()).model_dump_json()
+            logger.info("Stream analysis complete", extra={"high_volume": True})
+        except Exception as e:
+            logger.error(f"Error processing stream update {update.seq}: {e}")
+            payload = json.dumps({"seq": update.seq, "error": str(e)})
+        # Shielded so a late cancellation can't interrupt a frame mid-send.
+        await asyncio.shield(websocket.send_text(payload))
+
+    try:
+        while True:
+            try:
+                data = await websocket.receive_json()
+            except (ValueError, KeyError):
+                # Not JSON, or a binary frame (no "text" in the message).
+                await websocket.send_json({"seq": None, "error": "Invalid update"})
+                continue
+            try:
+                update = StreamAnalysisRequest.model_validate(data)
+                check_message_size(update.message)
+            except ValidationError:
+                await websocket.send_json({"seq": data.get("seq") if isinstance(data, dict) else None, "error": "Invalid update"})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"seq": update.seq, "error": e.detail})
+                continue
+
+            # Updates can only move forward; late arrivals of older drafts are dropped.
+            if latest_seq is not None and update.seq <= latest_seq:
+                continue
+            latest_seq = update.seq
+            try:
+                degraded = admission.admit(client, 1, update.priority)
+            except Rejected as e:
+                await websocket.send_json({"seq": update.seq, "error": e.reason, "retry_after": e.retry_after})
+                continue
+            if current is not None and not current.done():
+                current.cancel()
+            current = asyncio.create_task(process(update, degraded))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if current is not None and not current.done():
+            current.cancel()
+
+@router.get("/rewrite/{job_id}", response_model=RewriteJob)
+def get_rewrite_job(job_id: str, rewrite_jobs: RewriteJobStore = Depends(get_rewrite_job_store)):
+    job = rewrite_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired rewrite job")
+    return job
+
+@router.get("/rewrite/{job_id}/stream")
+async def stream_rewrite_job(job_id: str, rewrite_jobs: RewriteJobStore = Depends(get_rewrite_job_store)):
+    """
+    Server-sent events: one `rewrite` event once the job finishes (or expires).
+    """
+    if rewrite_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired rewrite job")
+
+    async def events():
+        job = await rewrite_jobs.wait(job_id)
+        yield f"event: rewrite\ndata: {job.model_dump_json()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@router.get("/cache/stats")
+def cache_stats(
+    toxicity_service: ToxicityService = Depends(get_toxicity_service),
+    rewriter_service: RewriterService = Depends(get_rewriter_service)
+):
+    return {
+        "verdicts": toxicity_service.cache.stats() if toxicity_service.cache else None,
+        "rewrites": rewriter_service.cache.stats() if rewriter_service.cache else None,
+        "near_duplicate_verdicts": toxicity_service.near_duplicates.stats() if toxicity_service.near_duplicates else None,
+        "near_duplicate_rewrites": rewriter_service.near_duplicates.stats() if rewriter_service.near_duplicates else None
+    }
+
+@router.get("/batching/stats")
+def batching_stats(toxicity_service: ToxicityService = Depends(get_toxicity_service)):
+    return toxicity_service.batcher.stats() if toxicity_service.batcher else {"enabled": False}
+
+@router.get("/prefilter/stats")
+def prefilter_stats(toxicity_service: ToxicityService = Depends(get_toxicity_service)):
+    return toxicity_service.prefilter.stats() if toxicity_service.prefilter else {"mode": "off"}
+
+@router.get("/admission/stats")
+def admission_stats(admission: AdmissionController = Depends(get_admission_controller)):
+    return admission.stats()
+
+@router.get("/policy/stats")
+def policy_stats(decision_service: DecisionService = Depends(get_decision_service)):
+    return decision_service.policy_store.stats()
+
+@router.get("/alerts/stats")
+def alert_stats(decision_service: DecisionService = Depends(get_decision_service)):
+    return decision_service.alerts.stats() if decision_service.alerts else {"enabled": False}
+
+@router.get("/resilience/stats")
+def resilience_stats(
+    toxicity_service: ToxicityService = Depends(get_toxicity_service),
+    rewriter_service: RewriterService = Depends(get_rewriter_service)
+):
+    return {
+        "toxicity": toxicity_service.upstream.stats(),
+        "rewriter": rewriter_service.upstream.stats()
+    }
+
+@router.get("/metrics")
+def metrics(
+    toxicity_service: ToxicityService = Depends(get_toxicity_service),
+    rewriter_service: RewriterService = Depends(get_rewriter_service),
+    decision_service: DecisionService = Depends(get_decision_service),
+    admission: AdmissionController = Depends(get_admission_controller)
+):
+    """Prometheus scrape endpoint."""
+    components = {
+        "verdict_cache": toxicity_service.cache.stats() if toxicity_service.cache else None,
+        "rewrite_cache": rewriter_service.cache.stats() if rewriter_service.cache else None,
+        "near_duplicate_verdicts": toxicity_service.near_duplicates.stats() if toxicity_service.near_duplicates else None,
+        "near_duplicate_rewrites": rewriter_service.near_duplicates.stats() if rewriter_service.near_duplicates else None,
+        "micro_batcher": toxicity_service.batcher.stats() if toxicity_service.batcher else None,
+        "prefilter": toxicity_service.prefilter.stats() if toxicity_service.prefilter else None,
+        "toxicity_upstream": toxicity_service.upstream.stats(),
+        "rewriter_upstream": rewriter_service.upstream.stats(),
+        "logging": logging_stats(),
+        "admission": admission.stats(),
+        "policy": decision_service.policy_store.stats(),
+        "alerts": decision_service.alerts.stats() if decision_service.alerts else None
+    }
+    body, content_type = render_metrics(components)
+    return Response(content=body, media_type=content_type)
@@ -1,18 +1,177 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     APP_NAME: str = "SafeSpeak API"
     VERSION: str = "2.0.0"
     DEBUG: bool = True
     
-    # API Keys
-    HF_API_KEY: str
-    GEMINI_API_KEY: str
+    # API Keys: checked when the service that needs them is built, so
+    # importing the app (or running with TOXICITY_BACKEND=local) never needs them
+    HF_API_KEY: Optional[str] = None
+    GEMINI_API_KEY: Optional[str] = None
     
     # Model Config
     TOXICITY_MODEL: str = "s-nlp/roberta_toxicity_classifier"
     GENERATIVE_MODEL: str = "gemini-2.0-flash"
+    HF_INFERENCE_URL: str = "https://router.huggingface.co/hf-inference/models"
+    # Override the Gemini endpoint (e.g. the benchmark stand-in); None = Google's default
+    GEMINI_BASE_URL: Optional[str] = None
+
+    # Toxicity Backend: "remote" (HF Inference API) or "local" (in-process CPU)
+    TOXICITY_BACKEND: str = "remote"
+    TOXICITY_LOCAL_MODEL_PATH: Optional[str] = None
+    TOXICITY_LOCAL_THREADS: Optional[int] = None
+
+    # Upstream Timeouts (seconds)
+    TOXICITY_TIMEOUT: float = 5.0
+    REWRITER_TIMEOUT: float = 10.0
+    DISCONNECT_POLL_INTERVAL: float = 0.1
+
+    # Resilience: circuit breakers, adaptive timeouts (p99 x multiplier,
+    # capped by the timeouts above) and hedged requests after the p95
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 30.0
+    ADAPTIVE_TIMEOUT_MIN: float = 0.5
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = 3.0
+    TOXICITY_HEDGE: bool = False
+    REWRITER_HEDGE: bool = False
+    # Severity assumed while the toxicity breaker is open (0 = allow)
+    TOXICITY_FALLBACK_SEVERITY: float = 0.0
+
+    # Admission Control: per-client token buckets, a global cap on upstream
+    # calls in flight, and what low-priority requests get once
+    # OVERLOAD_QUEUE_THRESHOLD calls are waiting for a slot: "degrade"
+    # (verdict without the rewrite) or "reject" (429 with Retry-After).
+    # Buckets are keyed on the caller's address, never the user_id it sends
+    # (every extension install sends the same one). Off by default: behind a
+    # proxy (Render, Heroku) the socket address is the proxy's, so set
+    # RATE_LIMIT_CLIENT_HEADER=X-Forwarded-For and RATE_LIMIT_TRUSTED_PROXIES
+    # to the number of proxies that append to it before enabling.
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_PER_SECOND: float = 5.0
+    RATE_LIMIT_BURST: int = 20
+    RATE_LIMIT_MAX_CLIENTS: int = 100000
+    RATE_LIMIT_CLIENT_HEADER: Optional[str] = None
+    RATE_LIMIT_TRUSTED_PROXIES: int = 1
+    UPSTREAM_MAX_CONCURRENCY: int = 64
+    UPSTREAM_MAX_QUEUE: int = 1024
+    UPSTREAM_QUEUE_TIMEOUT: float = 2.0
+    OVERLOAD_QUEUE_THRESHOLD: int = 32
+    OVERLOAD_POLICY: str = "degrade"
+    OVERLOAD_RETRY_AFTER: float = 1.0
+
+    # Upstream Connection Pools and Warmup
+    UPSTREAM_HTTP2: bool = True
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    WARMUP_ENABLED: bool = True
+    WARMUP_REWRITER: bool = False
+    WARMUP_TIMEOUT: float = 30.0
+    # Log per-service initialization and warmup time at startup
+    # (see also `python -m app.core.startup` for import times)
+    STARTUP_PROFILE: bool = False
+
+    # Long Inputs: split into overlapping word windows above LONG_TEXT_WINDOW_WORDS
+    MAX_MESSAGE_CHARS: int = 20000
+    LONG_TEXT_WINDOW_WORDS: int = 200
+    LONG_TEXT_WINDOW_OVERLAP: int = 32
+
+    # Batch Analysis
+    TOXICITY_BATCH_SIZE: int = 32
+    BATCH_MAX_ITEMS: int = 256
+
+    # Micro-Batching of single /analyze calls
+    MICRO_BATCH_ENABLED: bool = True
+    MICRO_BATCH_MAX_SIZE: int = 16
+    MICRO_BATCH_MAX_WAIT_MS: float = 5.0
+    MICRO_BATCH_MAX_QUEUE: int = 1024
+
+    # Lexical Pre-Filter: "off", "shadow" (compare with model only) or "enforce"
+    PREFILTER_MODE: str = "off"
+    PREFILTER_LEXICON_PATH: Optional[str] = None
+    PREFILTER_SEVERE_SEVERITY: float = 95
+    PREFILTER_WHITELIST_ENABLED: bool = True
+    PREFILTER_WHITELIST_MAX_CHARS: int = 12
+
+    # Verdict Cache
+    VERDICT_CACHE_ENABLED: bool = True
+    VERDICT_CACHE_SIZE: int = 10000
+    VERDICT_CACHE_TTL: float = 3600.0
+    VERDICT_CACHE_PATH: Optional[str] = None
+    VERDICT_CACHE_DISK_MAX_ROWS: int = 100000
+
+    # Near-Duplicate Reuse: serve the verdict (and, with NEAR_DUP_REWRITES,
+    # the rewrite) of a recent message whose character shingles are at least
+    # NEAR_DUP_THRESHOLD similar (estimated Jaccard, 0-1). Lower thresholds
+    # catch more flood variants but risk reusing across a meaningful edit
+    NEAR_DUP_ENABLED: bool = False
+    NEAR_DUP_THRESHOLD: float = 0.9
+    NEAR_DUP_MAX_ENTRIES: int = 5000
+    NEAR_DUP_TTL: float = 600.0
+    NEAR_DUP_MIN_CHARS: int = 20
+    NEAR_DUP_REWRITES: bool = False
+
+    # Rewrite Tiers: "tiered" (Gemini within REWRITE_LATENCY_BUDGET_MS, else
+    # the local lexicon rewrite), "local" (never calls Gemini, no key needed)
+    # or "gemini" (no local tier; failures get the fixed fallback sentence).
+    # A budget of 0 waits for Gemini and uses the local rewrite on failure only.
+    # A local rewrite that leaves the message unchanged is never served: the
+    # request waits for Gemini, or gets the fallback sentence in "local" mode.
+    REWRITER_MODE: str = "tiered"
+    REWRITE_LATENCY_BUDGET_MS: float = 1500
+    REWRITE_LEXICON_PATH: Optional[str] = None
+
+    # Rewrite Cache
+    REWRITE_CACHE_ENABLED: bool = True
+    REWRITE_CACHE_SIZE: int = 2000
+    REWRITE_CACHE_TTL: float = 3600.0
+
+    # Escalation: escalate when a user has more than ESCALATION_THRESHOLD
+    # offences within the last OFFENCE_WINDOW_SECONDS
+    ESCALATION_THRESHOLD: int = 3
+    OFFENCE_WINDOW_SECONDS: float = 86400.0
+    OFFENCE_WINDOW_BUCKETS: int = 24
+    OFFENCE_MAX_TRACKED_USERS: int = 100000
+
+    # Decision Policy: severity bands, labels, actions and escalation rules
+    # (see policy.example.json); None = built-in defaults. The file is
+    # re-read when its mtime changes, checked every POLICY_RELOAD_INTERVAL s
+    POLICY_PATH: Optional[str] = None
+    POLICY_RELOAD_INTERVAL: float = 5.0
+
+    # Admin Alerts: block_and_alert decisions are queued in memory and POSTed
+    # to ALERT_WEBHOOK_URL (None = no alerts) in batches every
+    # ALERT_BATCH_WINDOW seconds. One alert per user per ALERT_DEDUP_SECONDS;
+    # repeats are counted on the pending alert. With ALERT_MAX_QUEUE alerts
+    # waiting, ALERT_OVERFLOW_POLICY "drop_newest" refuses new ones and
+    # "drop_oldest" replaces the oldest
+    ALERT_WEBHOOK_URL: Optional[str] = None
+    ALERT_WEBHOOK_TOKEN: Optional[str] = None
+    ALERT_BATCH_WINDOW: float = 5.0
+    ALERT_MAX_BATCH: int = 100
+    ALERT_MAX_QUEUE: int = 1000
+    ALERT_OVERFLOW_POLICY: str = "drop_newest"
+    ALERT_DEDUP_SECONDS: float = 300.0
+    ALERT_RETRIES: int = 3
+    ALERT_RETRY_BACKOFF: float = 1.0
+    ALERT_TIMEOUT: float = 5.0
+
+    # Offence Store: "memory" (per process) or "redis" (shared)
+    OFFENCE_STORE: str = "memory"
+    REDIS_URL: Optional[str] = None
+
+    # Logging: records are written by a background thread through a bounded
+    # queue; LOG_SAMPLE_RATE keeps that fraction of per-request info events
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATE: float = 1.0
+
+    # Deferred Rewrite Jobs
+    REWRITE_JOB_MAX: int = 10000
+    REWRITE_JOB_TTL: float = 300.0
 
     class Config:
         env_file = ".env"
@@ -1,19 +1,170 @@
+import atexit
+import contextvars
+import json
 import logging
+import queue
+import random
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
-def setup_logging():
+# Per-request correlation fields (request_id, user_id, action, stage timings),
+# attached to every record logged while the request is being handled.
+_request_context: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("safespeak_log_context", default=None)
+
+def bind_request(**fields) -> contextvars.Token:
+    """Starts a correlation context for the current request; pass the token to `unbind_request`."""
+    return _request_context.set({k: v for k, v in fields.items() if v is not None})
+
+def unbind_request(token: contextvars.Token):
+    _request_context.reset(token)
+
+def annotate_request(**fields):
+    """Adds fields (e.g. the decided action) to the current correlation context."""
+    context = _request_context.get()
+    if context is not None:
+        context.update(fields)
+
+def current_request_id() -> Optional[str]:
+    """The request id bound for the current request, if any."""
+    context = _request_context.get()
+    return context.get("request_id") if context is not None else None
+
+def record_stage(stage: str, seconds: float):
+    """Adds time spent in a pipeline stage (summed if the stage runs more than once)."""
+    context = _request_context.get()
+    if context is not None:
+        stages = context.setdefault("stages_ms", {})
+        stages[stage] = round(stages.get(stage, 0.0) + 1000 * seconds, 2)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, serialized with json.dumps so any message text is safe."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        context = getattr(record, "context", None)
+        if context:
+            entry.update(context)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ContextFilter(logging.Filter):
+    """
+    Runs in the caller's thread, before the record is queued: snapshots the
+    correlation context onto the record, and keeps only `sample_rate` of the
+    records logged with `extra={"high_volume": True}`. Warnings and errors
+    are never sampled out.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (
+            self.sample_rate < 1.0
+            and record.levelno < logging.WARNING
+            and getattr(record, "high_volume", False)
+            and random.random() >= self.sample_rate
+        ):
+            return False
+        context = _request_context.get()
+        if context:
+            record.context = {**context, "stages_ms": dict(context["stages_ms"])} if "stages_ms" in context else dict(context)
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread through a bounded queue. When the
+    queue is full the record is dropped and counted rather than blocking
+    the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback here so args and exc_info (which
+        # may reference mutable request state) don't cross threads.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _LoggingPipeline:
+    def __init__(self):
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self.context_filter = ContextFilter()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0,
+            "sample_rate": self.context_filter.sample_rate,
+        }
+
+_pipeline = _LoggingPipeline()
+
+def setup_logging(level: int = logging.INFO, queue_size: int = 10000, sample_rate: float = 1.0, stream=None):
+    """
+    Wires the "safespeak" logger to a queue; a background listener thread
+    formats records as JSON and writes them to `stream` (stdout by default),
+    so request handlers never wait on the write. Safe to call again to
+    reconfigure.
+    """
     logger = logging.getLogger("safespeak")
-    logger.setLevel(logging.INFO)
-    
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(logging.INFO)
-    
-    formatter = logging.Formatter(
-        '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "module": "%(module)s", "message": "%(message)s"}'
-    )
-    
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    logger.setLevel(level)
+
+    flush_logging()
+    if _pipeline.handler is not None:
+        logger.removeHandler(_pipeline.handler)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    _pipeline.context_filter.sample_rate = sample_rate
+    _pipeline.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _pipeline.handler.addFilter(_pipeline.context_filter)
+    _pipeline.listener = QueueListener(_pipeline.handler.queue, output, respect_handler_level=True)
+    _pipeline.listener.start()
+    logger.addHandler(_pipeline.handler)
     return logger
 
+def configure_logging(settings):
+    """Applies the LOG_* settings; called once the app has loaded its settings."""
+    return setup_logging(
+        level=logging.getLevelName(settings.LOG_LEVEL.upper()),
+        queue_size=settings.LOG_QUEUE_SIZE,
+        sample_rate=settings.LOG_SAMPLE_RATE
+    )
+
+def logging_stats() -> dict:
+    return _pipeline.stats()
+
+def flush_logging():
+    """Drains the queue and stops the writer thread."""
+    if _pipeline.listener is not None:
+        _pipeline.listener.stop()
+        _pipeline.listener = None
+
+atexit.register(flush_logging)
+
 logger = setup_logging()
@@ -0,0 +1,117 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+from app.core.logging import record_stage
+
+# Dedicated registry so only SafeSpeak metrics are exported.
+REGISTRY = CollectorRegistry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "safespeak_request_seconds", "End-to-end request latency.",
+    ["endpoint"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+STAGE_LATENCY = Histogram(
+    "safespeak_stage_seconds", "Latency of each pipeline stage (classify, decide, rewrite).",
+    ["stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+ACTIONS = Counter("safespeak_actions_total", "Decisions by action.", ["action"], registry=REGISTRY)
+LABELS = Counter("safespeak_labels_total", "Analysis results by label.", ["label"], registry=REGISTRY)
+UPSTREAM_ERRORS = Counter(
+    "safespeak_upstream_errors_total", "Failed upstream calls by kind (error, timeout, circuit_open).",
+    ["upstream", "kind"], registry=REGISTRY
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "safespeak_upstream_in_flight", "Upstream calls currently in flight.", ["upstream"], registry=REGISTRY
+)
+REWRITE_TIERS = Counter(
+    "safespeak_rewrites_total", "Rewrites by serving tier (gemini, local, fallback) and why that tier served it.",
+    ["tier", "reason"], registry=REGISTRY
+)
+IN_FLIGHT = Gauge("safespeak_requests_in_flight", "Requests currently being processed.", ["endpoint"], registry=REGISTRY)
+
+# Pre-bound children keep label lookups off the hot path; known label
+# values are bound at import, anything else on first use.
+_stage_children: Dict[str, Histogram] = {stage: STAGE_LATENCY.labels(stage=stage) for stage in ("classify", "decide", "rewrite")}
+_endpoint_children: Dict[str, Tuple[Gauge, Histogram]] = {
+    endpoint: (IN_FLIGHT.labels(endpoint=endpoint), REQUEST_LATENCY.labels(endpoint=endpoint))
+    for endpoint in ("analyze", "analyze_batch", "ws_analyze")
+}
+_label_children: Dict[str, Counter] = {}
+_action_children: Dict[str, Counter] = {}
+
+@contextmanager
+def observe_stage(stage: str):
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_LATENCY.labels(stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        child.observe(elapsed)
+        record_stage(stage, elapsed)
+
+@contextmanager
+def observe_request(endpoint: str):
+    children = _endpoint_children.get(endpoint)
+    if children is None:
+        children = _endpoint_children[endpoint] = (IN_FLIGHT.labels(endpoint=endpoint), REQUEST_LATENCY.labels(endpoint=endpoint))
+    in_flight, latency = children
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        latency.observe(time.perf_counter() - start)
+        in_flight.dec()
+
+def record_outcome(label: str, action: str):
+    # Labels and actions come from the policy, so they're bound on first use.
+    label_child = _label_children.get(label)
+    if label_child is None:
+        label_child = _label_children[label] = LABELS.labels(label=label)
+    action_child = _action_children.get(action)
+    if action_child is None:
+        action_child = _action_children[action] = ACTIONS.labels(action=action)
+    label_child.inc()
+    action_child.inc()
+
+class ComponentStatsCollector:
+    """
+    Exports the numeric fields of each component's `stats()` dict (caches,
+    batcher, breakers, ...) as `safespeak_component{component, stat}` gauges.
+    The stats are only read at scrape time, so this costs nothing per request.
+    """
+
+    def __init__(self, components: Dict[str, Optional[dict]]):
+        self.components = components
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "safespeak_component", "Component statistics (caches, batching, breakers).",
+            labels=["component", "stat"]
+        )
+        for component, stats in self.components.items():
+            for stat, value in (stats or {}).items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    family.add_metric([component, stat], value)
+                elif stat == "state":
+                    # Breaker state as 0 = closed, 1 = half_open, 2 = open
+                    family.add_metric([component, "state"], {"closed": 0, "half_open": 1, "open": 2}.get(value, -1))
+        yield family
+
+def render_metrics(components: Optional[Dict[str, Optional[dict]]] = None) -> Tuple[bytes, str]:
+    """Prometheus text exposition of all metrics plus the given component stats."""
+    output = generate_latest(REGISTRY)
+    if components:
+        scrape = CollectorRegistry(auto_describe=False)
+        scrape.register(ComponentStatsCollector(components))
+        output += generate_latest(scrape)
+    return output, CONTENT_TYPE_LATEST
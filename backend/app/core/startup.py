@@ -0,0 +1,94 @@
+"""
+Startup profiling: where a worker's cold start goes.
+
+    cd backend
+    python -m app.core.startup            # imports of app.main, then service init
+    python -m app.core.startup --top 30 --no-init
+
+Import times come from a fresh interpreter run with `-X importtime`, so
+nothing already loaded in this process skews them. Service initialization
+is timed in-process by building each dependency the way the lifespan does.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def import_profile(module: str = "app.main") -> List[Tuple[str, float, float]]:
+    """(module, self ms, cumulative ms) for every module imported by `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.splitlines()[-1]}")
+    return rows
+
+def by_package(rows: List[Tuple[str, float, float]]) -> Dict[str, float]:
+    """Self import time summed per top-level package, in ms."""
+    totals: Dict[str, float] = defaultdict(float)
+    for name, self_ms, _ in rows:
+        totals[name.split(".")[0]] += self_ms
+    return dict(totals)
+
+def timed(steps: Dict[str, Callable[[], object]]) -> Dict[str, object]:
+    """Runs each step in order and returns its wall time in ms (or why it failed)."""
+    timings = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            timings[name] = f"failed: {e}"
+            continue
+        timings[name] = round(1000 * (time.perf_counter() - start), 1)
+    return timings
+
+def init_profile() -> Dict[str, object]:
+    start = time.perf_counter()
+    import app.main  # noqa: F401
+    from app.api import deps
+    timings = {"import app.main": round(1000 * (time.perf_counter() - start), 1)}
+    timings.update(timed({
+        "toxicity_service": deps.get_toxicity_service,
+        "rewriter_service": deps.get_rewriter_service,
+        "decision_service": deps.get_decision_service,
+        "rewrite_job_store": deps.get_rewrite_job_store,
+    }))
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile SafeSpeak worker startup")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--no-init", action="store_true", help="skip timing service initialization")
+    args = parser.parse_args(argv)
+
+    rows = import_profile(args.module)
+    total = max(cumulative for _, _, cumulative in rows)
+    print(f"import {args.module}: {total:.1f} ms ({len(rows)} modules)\n")
+    print("By package (self time):")
+    for package, ms in sorted(by_package(rows).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<32}{ms:>9.1f} ms")
+    print("\nSlowest modules (cumulative):")
+    for name, _, cumulative in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"  {name:<48}{cumulative:>9.1f} ms")
+
+    if not args.no_init:
+        print("\nInitialization:")
+        for name, ms in init_profile().items():
+            print(f"  {name:<32}{ms:>9.1f} ms" if isinstance(ms, float) else f"  {name:<32}{ms}")
+
+if __name__ == "__main__":
+    main()
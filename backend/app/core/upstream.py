@@ -0,0 +1,166 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Awaitable, Callable, Deque, Dict, Iterable
+import httpx
+from app.core.config import get_settings
+from app.core.logging import logger
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class UpstreamOverloaded(Exception):
+    pass
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of upstream calls in flight across all callers that
+    share it. Excess calls wait in FIFO order, at most `max_queue` of them
+    and for at most `queue_timeout` seconds, then fail with
+    UpstreamOverloaded. Waiters are plain futures so the limiter isn't tied
+    to one event loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int = 1024, queue_timeout: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.in_flight >= self.max_concurrency or self._waiters:
+            await self._wait_for_slot()
+        else:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def _wait_for_slot(self):
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise UpstreamOverloaded("upstream queue is full")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise UpstreamOverloaded(f"no upstream slot within {self.queue_timeout}s") from None
+        except asyncio.CancelledError:
+            # A slot handed over just before cancellation must be passed on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def try_acquire(self) -> bool:
+        """Takes a slot only if one is free right now, without queueing; pair with release()."""
+        if self.in_flight >= self.max_concurrency or self._waiters:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        # Hand the slot straight to the next live waiter; in_flight is unchanged.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+class UpstreamManager:
+    """
+    Owns the pooled keep-alive HTTP clients used to reach HF and Gemini,
+    warms the upstreams up before the worker reports ready, and closes
+    everything on shutdown. Driven by the FastAPI lifespan in app.main.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.http2 = settings.UPSTREAM_HTTP2 and _http2_available()
+        self.ready = False
+        # Shared by every upstream caller, so HF and Gemini together stay
+        # under UPSTREAM_MAX_CONCURRENCY calls in flight.
+        self.limiter = ConcurrencyLimiter(
+            max_concurrency=settings.UPSTREAM_MAX_CONCURRENCY,
+            max_queue=settings.UPSTREAM_MAX_QUEUE,
+            queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT
+        )
+        self.warmup_results: Dict[str, dict] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def client(self, name: str, **kwargs) -> httpx.AsyncClient:
+        """Shared pooled client for one upstream, created on first use."""
+        if name not in self._clients:
+            self._clients[name] = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.settings.UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=self.settings.UPSTREAM_MAX_KEEPALIVE,
+                    keepalive_expiry=self.settings.UPSTREAM_KEEPALIVE_EXPIRY
+                ),
+                **kwargs
+            )
+        return self._clients[name]
+
+    async def warmup(self, checks: Dict[str, Callable[[], Awaitable]], required: Iterable[str] = ()) -> bool:
+        """
+        Runs each named check (a service's `warmup`) once, so connections are
+        open and models awake before the first real request. Every result is
+        recorded for /ready; returns False if a `required` check failed.
+        """
+        async def run(name, check):
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(check(), timeout=self.settings.WARMUP_TIMEOUT)
+                status = "ok"
+            except Exception as e:
+                logger.error(f"Warmup of {name} failed: {e!r}")
+                status = "failed"
+            self.warmup_results[name] = {
+                "status": status,
+                "ms": round(1000 * (time.perf_counter() - start), 1)
+            }
+
+        await asyncio.gather(*[run(name, check) for name, check in checks.items()])
+        logger.info(f"Upstream warmup finished: {self.warmup_results}")
+        return all(self.warmup_results[name]["status"] == "ok" for name in required if name in checks)
+
+    async def aclose(self):
+        self.ready = False
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+@lru_cache()
+def get_upstream_manager() -> UpstreamManager:
+    return UpstreamManager(get_settings())
@@ -1,15 +1,65 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import get_settings
+from app.core.upstream import get_upstream_manager
 from app.api.routes import router
-from app.core.logging import logger
+from app.api.deps import get_toxicity_service, get_rewriter_service, get_decision_service
+from app.core.logging import logger, configure_logging
 
 settings = get_settings()
+configure_logging(settings)
+
+def _resolve(dependency):
+    # Honour dependency_overrides so tests can swap services out.
+    return app.dependency_overrides.get(dependency, dependency)()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build services and warm upstreams before accepting traffic.
+    upstream = get_upstream_manager()
+    timings = {}
+
+    def build(name, dependency):
+        start = time.perf_counter()
+        service = _resolve(dependency)
+        timings[name] = round(1000 * (time.perf_counter() - start), 1)
+        return service
+
+    toxicity_service = build("toxicity_service", get_toxicity_service)
+    rewriter_service = build("rewriter_service", get_rewriter_service)
+    decision_service = build("decision_service", get_decision_service)
+    ready = True
+    if settings.WARMUP_ENABLED:
+        checks = {"toxicity": toxicity_service.warmup}
+        if settings.WARMUP_REWRITER:
+            checks["rewriter"] = rewriter_service.warmup
+        start = time.perf_counter()
+        # Without the classifier every verdict is an error; the rewriter
+        # has local and fallback tiers, so its failure only shows in /ready.
+        ready = await upstream.warmup(checks, required=("toxicity",))
+        timings["warmup"] = round(1000 * (time.perf_counter() - start), 1)
+    if settings.STARTUP_PROFILE:
+        logger.info(f"Startup timings (ms): {timings}")
+    upstream.ready = ready
+    if ready:
+        logger.info("SafeSpeak worker ready.")
+    else:
+        logger.error("SafeSpeak worker not ready: toxicity warmup failed.")
+    yield
+    await toxicity_service.aclose()
+    await rewriter_service.aclose()
+    # Before the upstream clients close: flushes queued admin alerts.
+    await decision_service.aclose()
+    await upstream.aclose()
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="SafeSpeak API - AI Guardian"
+    description="SafeSpeak API - AI Guardian",
+    lifespan=lifespan
 )
 
 # CORS
@@ -28,6 +78,12 @@ app.include_router(router)
 def health_check():
     return {"status": "online", "version": settings.VERSION}
 
+@app.get("/ready")
+def readiness_check():
+    upstream = get_upstream_manager()
+    body = {"ready": upstream.ready, "warmup": upstream.warmup_results}
+    return JSONResponse(body, status_code=200 if upstream.ready else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=10000, reload=True)
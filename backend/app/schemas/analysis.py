@@ -1,18 +1,64 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Dict, Any, List, Literal
 
 class AnalysisRequest(BaseModel):
     message: str
     user_id: Optional[str] = "anonymous"
+    defer_rewrite: bool = False
+    incremental: bool = False
+    # Low-priority requests are degraded or shed first under overload
+    priority: Literal["normal", "low"] = "normal"
 
 class AnalysisResult(BaseModel):
+    # A policy band label, "error" (classification failed) or "fallback"
+    # (TOXICITY_FALLBACK_SEVERITY served while the upstream is unavailable)
     label: str
     score: float
     severity: float
+    segment: Optional[int] = None
 
 class AnalysisResponse(BaseModel):
     analysis: AnalysisResult
     action: str
     reason: str
     rewrite: Optional[str] = None
+    # Which rewriter produced `rewrite`: "gemini", "local" (lexicon fast path)
+    # or "fallback" (fixed sentence)
+    rewrite_tier: Optional[Literal["gemini", "local", "fallback"]] = None
+    rewrite_job_id: Optional[str] = None
+    # True when the rewrite was skipped to shed load
+    degraded: bool = False
     timestamp: str
+
+class BatchItem(BaseModel):
+    # Priority is set once for the whole batch, and batch items are always
+    # rewritten inline and classified whole: the single-message options are
+    # rejected rather than silently ignored.
+    model_config = ConfigDict(extra="forbid")
+
+    message: str
+    user_id: Optional[str] = "anonymous"
+
+class BatchAnalysisRequest(BaseModel):
+    items: List[BatchItem]
+    priority: Literal["normal", "low"] = "normal"
+
+class BatchItemResult(BaseModel):
+    index: int
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchItemResult]
+
+class RewriteJob(BaseModel):
+    job_id: str
+    status: str
+    rewrite: Optional[str] = None
+    rewrite_tier: Optional[Literal["gemini", "local", "fallback"]] = None
+
+class StreamAnalysisRequest(AnalysisRequest):
+    seq: int
+
+class StreamAnalysisResponse(AnalysisResponse):
+    seq: int
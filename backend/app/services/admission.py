@@ -0,0 +1,123 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from app.services.resilience import ConcurrencyLimiter
+
+class Rejected(Exception):
+    """Request refused; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets refilled at `rate` tokens/second up to `burst`.
+    At most `max_clients` buckets are kept (least recently seen evicted first);
+    an evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_clients: int = 100000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self.limited = 0
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Takes `cost` tokens; returns 0 if allowed, else seconds until it would be."""
+        now = self.clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(float(self.burst), now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            return 0.0
+        self.limited += 1
+        return (cost - bucket.tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class AdmissionController:
+    """
+    Decides, before any work is done, whether a request runs in full, runs
+    degraded (verdict only, no rewrite) or is rejected. Clients over their
+    rate limit are always rejected. When the shared upstream limiter has
+    `overload_threshold` or more calls waiting, low-priority requests are
+    degraded or rejected according to `policy`; normal-priority requests
+    still queue for a slot.
+    """
+
+    def __init__(
+        self,
+        rate_limiter: Optional[TokenBucketLimiter],
+        upstream_limiter: ConcurrencyLimiter,
+        overload_threshold: int,
+        policy: str = "degrade",
+        retry_after: float = 1.0
+    ):
+        if policy not in ("degrade", "reject"):
+            raise ValueError(f"Unknown OVERLOAD_POLICY: {policy}")
+        self.rate_limiter = rate_limiter
+        self.upstream_limiter = upstream_limiter
+        self.overload_threshold = overload_threshold
+        self.policy = policy
+        self.retry_after = retry_after
+        self.degraded = 0
+        self.shed = 0
+
+    def overloaded(self) -> bool:
+        return self.upstream_limiter.waiting >= self.overload_threshold
+
+    def admit(self, client: str, items: int = 1, priority: str = "normal") -> bool:
+        """
+        Charges `client` (a server-derived identity such as its address) one
+        token per item, capped at the burst size so a large batch can still
+        get through. Returns True if the request should run degraded; raises
+        Rejected if it shouldn't run at all.
+        """
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.acquire(client, min(items, self.rate_limiter.burst))
+            if wait > 0:
+                raise Rejected("rate_limited", wait)
+
+        if priority == "low" and self.overloaded():
+            if self.policy == "reject":
+                self.shed += 1
+                raise Rejected("overloaded", self.retry_after)
+            self.degraded += 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "tracked_clients": len(self.rate_limiter) if self.rate_limiter else 0,
+            "rate_limited": self.rate_limiter.limited if self.rate_limiter else 0,
+            "degraded": self.degraded,
+            "shed": self.shed,
+            **{f"upstream_{k}": v for k, v in self.upstream_limiter.stats().items()},
+        }
@@ -0,0 +1,207 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+import httpx
+from app.core.logging import logger
+from app.core.upstream import get_upstream_manager
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest")
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class AlertDispatcher:
+    """
+    Delivers admin alerts for block_and_alert decisions off the request
+    path. `submit` only touches an in-memory queue; a background task POSTs
+    whatever accumulated every `window` seconds to the webhook, at most
+    `max_batch` alerts per request, retrying failures with exponential
+    backoff before giving the batch up.
+
+    One pending alert per user: repeats while it waits are counted on it,
+    and after it has been queued the user is quiet for `dedup_seconds`.
+    At most `max_queue` alerts wait; beyond that `overflow` decides whether
+    the new alert ("drop_newest") or the oldest pending one ("drop_oldest")
+    is dropped. Both are counted.
+    """
+
+    def __init__(
+        self,
+        webhook_url: str,
+        http: httpx.AsyncClient,
+        window: float = 5.0,
+        max_batch: int = 100,
+        max_queue: int = 1000,
+        overflow: str = "drop_newest",
+        dedup_seconds: float = 300.0,
+        max_tracked_users: int = 100000,
+        retries: int = 3,
+        retry_backoff: float = 1.0,
+        headers: Optional[Dict[str, str]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown ALERT_OVERFLOW_POLICY: {overflow}")
+        self.webhook_url = webhook_url
+        self.http = http
+        self.window = window
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.dedup_seconds = dedup_seconds
+        self.max_tracked_users = max_tracked_users
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.headers = headers or {}
+        self.clock = clock
+        self._pending: "OrderedDict[str, dict]" = OrderedDict()
+        self._last_queued: "OrderedDict[str, float]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_delivery = 0
+
+        self.submitted = 0
+        self.merged = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.delivered = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+
+    def submit(self, user_id: str, **details) -> bool:
+        """Queues an alert without blocking; returns False if it was merged, suppressed or dropped."""
+        self._ensure_worker()
+        self.submitted += 1
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            pending["count"] += 1
+            pending["last_at"] = _now_iso()
+            pending["max_severity"] = max(pending["max_severity"], details.get("severity", 0))
+            self.merged += 1
+            return False
+
+        now = self.clock()
+        last = self._last_queued.get(user_id)
+        if last is not None and now - last < self.dedup_seconds:
+            self.suppressed += 1
+            return False
+
+        if len(self._pending) >= self.max_queue:
+            self.dropped += 1
+            if self.overflow == "drop_newest":
+                return False
+            evicted, _ = self._pending.popitem(last=False)
+            self._last_queued.pop(evicted, None)
+
+        at = _now_iso()
+        self._pending[user_id] = {
+            "user_id": user_id, "count": 1, "first_at": at, "last_at": at,
+            "max_severity": details.get("severity", 0), **details
+        }
+        self._last_queued[user_id] = now
+        self._last_queued.move_to_end(user_id)
+        if len(self._last_queued) > self.max_tracked_users:
+            self._last_queued.popitem(last=False)
+        self._wakeup.set()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._pending),
+            "max_queue": self.max_queue,
+            "in_delivery": self.in_delivery,
+            "submitted": self.submitted,
+            "merged": self.merged,
+            "suppressed": self.suppressed,
+            "dropped": self.dropped,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retried,
+        }
+
+    async def aclose(self, timeout: float = 5.0):
+        """Stops the worker and makes one last, unretried attempt to send what's queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if not self._pending:
+            return
+        try:
+            await asyncio.wait_for(self._drain(retries=0), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Shutdown with {len(self._pending)} admin alerts undelivered.")
+
+    def _ensure_worker(self):
+        # Services outlive event loops in tests, so bind to whichever loop is running.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            # A fresh context: the worker outlives the request that started it
+            # and must not log with (or annotate) that request's correlation fields.
+            self._worker = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Let the window fill before sending.
+            await asyncio.sleep(self.window)
+            self._wakeup.clear()
+            await self._drain(self.retries)
+
+    async def _drain(self, retries: int):
+        # A backlog larger than max_batch goes out in back-to-back batches.
+        while self._pending:
+            batch = [self._pending.popitem(last=False)[1] for _ in range(min(self.max_batch, len(self._pending)))]
+            self.in_delivery = len(batch)
+            try:
+                await self._deliver(batch, retries)
+            finally:
+                self.in_delivery = 0
+
+    async def _deliver(self, alerts: List[dict], retries: int):
+        payload = {"sent_at": _now_iso(), "count": len(alerts), "alerts": alerts}
+        error = None
+        for attempt in range(retries + 1):
+            try:
+                response = await self.http.post(self.webhook_url, json=payload, headers=self.headers)
+                if response.status_code < 300:
+                    self.batches += 1
+                    self.delivered += len(alerts)
+                    return
+                error = f"HTTP {response.status_code}"
+                if response.status_code < 500 and response.status_code != 429:
+                    break  # the receiver rejected the payload; retrying won't help
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < retries:
+                self.retried += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+        self.failed += len(alerts)
+        logger.error(f"Dropped {len(alerts)} admin alerts after {attempt + 1} attempts: {error}")
+
+def create_alert_dispatcher(settings) -> Optional[AlertDispatcher]:
+    """None when no webhook is configured."""
+    if not settings.ALERT_WEBHOOK_URL:
+        return None
+    headers = {"Authorization": f"Bearer {settings.ALERT_WEBHOOK_TOKEN}"} if settings.ALERT_WEBHOOK_TOKEN else {}
+    return AlertDispatcher(
+        settings.ALERT_WEBHOOK_URL,
+        get_upstream_manager().client("alerts", timeout=settings.ALERT_TIMEOUT),
+        window=settings.ALERT_BATCH_WINDOW,
+        max_batch=settings.ALERT_MAX_BATCH,
+        max_queue=settings.ALERT_MAX_QUEUE,
+        overflow=settings.ALERT_OVERFLOW_POLICY,
+        dedup_seconds=settings.ALERT_DEDUP_SECONDS,
+        retries=settings.ALERT_RETRIES,
+        retry_backoff=settings.ALERT_RETRY_BACKOFF,
+        headers=headers
+    )
@@ -0,0 +1,287 @@
+"""
+Offline bulk moderation of JSONL archives.
+
+    cd backend
+    python -m app.services.bulk_moderation archive.jsonl verdicts.jsonl
+    python -m app.services.bulk_moderation archive.jsonl verdicts.jsonl --rewrite --batch-size 64 --concurrency 4
+
+Each input line is a JSON object with a message (and optionally a user id);
+each output line carries the input line number, the verdict, the decided
+action and (with --rewrite) the rewrite and its tier, in input order.
+Progress is checkpointed next to the output after every chunk; rerunning the same
+command resumes after the last completed chunk. Escalation counts live in
+the offence store, so use OFFENCE_STORE=redis if they must survive a resume.
+Admin alerts (ALERT_WEBHOOK_URL) are only sent with --alert.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+from app.core.logging import logger
+from app.schemas.analysis import AnalysisResult
+from app.services.decision_engine import REWRITE_ACTIONS
+
+class BulkStalled(Exception):
+    """Upstream kept failing; the run stopped at the last checkpoint."""
+
+class Checkpoint:
+    """
+    Where to resume: the byte offset of the next unread input line, its line
+    number, and how many output bytes were complete at that point. Written
+    atomically (temp file + rename) after the output has been flushed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, input_path: str, input_offset: int, line: int, output_bytes: int, stats: dict):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "input": os.path.abspath(input_path),
+                "input_offset": input_offset,
+                "line": line,
+                "output_bytes": output_bytes,
+                "stats": stats,
+            }, f)
+        os.replace(tmp, self.path)
+
+def read_records(f, start_line: int, message_field: str, user_field: str) -> Iterator[Tuple[int, int, Optional[dict]]]:
+    """
+    Yields (line number, offset after the line, record) from a binary file
+    positioned at `start_line`. Blank lines are skipped; unparseable ones
+    yield None so they are reported rather than silently dropped.
+    """
+    line_number = start_line
+    for raw in iter(f.readline, b""):
+        line_number += 1
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+            record = {"message": str(record[message_field]), "user_id": str(record.get(user_field) or "anonymous")}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            record = None
+        yield line_number, f.tell(), record
+
+def chunked(records: Iterator, size: int) -> Iterator[list]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class BulkModerator:
+    """
+    Runs records through the toxicity, decision and (optionally) rewriter
+    services. Up to `concurrency` chunks of `batch_size` records are
+    classified at once. Decisions are made strictly in input order, so
+    escalation behaves as if the messages arrived one by one. Memory is
+    bounded by the chunks in flight.
+    """
+
+    def __init__(
+        self,
+        toxicity_service,
+        decision_service,
+        rewriter_service=None,
+        batch_size: int = 32,
+        concurrency: int = 4,
+        rewrite_concurrency: int = 8,
+        retries: int = 3,
+        retry_backoff: float = 2.0,
+        skip_errors: bool = False
+    ):
+        self.toxicity_service = toxicity_service
+        self.decision_service = decision_service
+        self.rewriter_service = rewriter_service
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rewrite_slots = asyncio.Semaphore(rewrite_concurrency)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.skip_errors = skip_errors
+        self.stats = {"records": 0, "invalid": 0, "errors": 0, "rewrites": 0}
+
+    async def run(
+        self,
+        input_path: str,
+        output_path: str,
+        message_field: str = "message",
+        user_field: str = "user_id",
+        checkpoint_path: Optional[str] = None
+    ) -> dict:
+        checkpoint = Checkpoint(checkpoint_path or f"{output_path}.checkpoint")
+        state = checkpoint.load()
+        if state is not None and state["input"] != os.path.abspath(input_path):
+            raise ValueError(f"{checkpoint.path} belongs to {state['input']}; remove it to start over")
+
+        with open(input_path, "rb") as source, open(output_path, "ab") as sink:
+            start_line = 0
+            if state is not None:
+                # Drop output written after the last checkpoint, then skip ahead.
+                sink.truncate(state["output_bytes"])
+                source.seek(state["input_offset"])
+                start_line = state["line"]
+                self.stats.update(state["stats"])
+                logger.info(f"Resuming bulk moderation at line {start_line + 1}.")
+            else:
+                sink.truncate(0)
+
+            records = read_records(source, start_line, message_field, user_field)
+            in_flight = deque()
+            try:
+                for chunk in chunked(records, self.batch_size):
+                    in_flight.append((chunk, asyncio.ensure_future(self._classify(chunk))))
+                    if len(in_flight) >= self.concurrency:
+                        await self._complete(*in_flight.popleft(), sink, checkpoint, input_path)
+                while in_flight:
+                    await self._complete(*in_flight.popleft(), sink, checkpoint, input_path)
+            finally:
+                for _, task in in_flight:
+                    task.cancel()
+        return self.stats
+
+    async def _classify(self, chunk: list) -> List[Optional[AnalysisResult]]:
+        """Verdicts for a chunk, retrying upstream failures with backoff."""
+        valid = [i for i, (_, _, record) in enumerate(chunk) if record is not None]
+        results: List[Optional[AnalysisResult]] = [None] * len(chunk)
+        pending = valid
+        for attempt in range(self.retries + 1):
+            analyses = await self.toxicity_service.analyze_batch([chunk[i][2]["message"] for i in pending])
+            for i, analysis in zip(pending, analyses):
+                results[i] = analysis
+            # Offline runs can wait for the upstream: breaker-open fallbacks are retried too.
+            pending = [i for i in pending if results[i].label in ("error", "fallback")]
+            if not pending or attempt == self.retries:
+                break
+            delay = self.retry_backoff * 2 ** attempt
+            logger.error(f"{len(pending)} records failed classification; retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+        if pending and not self.skip_errors:
+            raise BulkStalled(f"classification kept failing from line {chunk[pending[0]][0]}")
+        return results
+
+    async def _complete(self, chunk: list, classify: asyncio.Future, sink, checkpoint: Checkpoint, input_path: str):
+        analyses = await classify
+        decided = [i for i, (_, _, record) in enumerate(chunk) if record is not None and analyses[i].label not in ("error", "fallback")]
+        decisions = dict(zip(decided, await self.decision_service.decide_batch(
+            [analyses[i] for i in decided], [chunk[i][2]["user_id"] for i in decided]
+        )))
+        outputs = []
+        for i, ((line, _, record), analysis) in enumerate(zip(chunk, analyses)):
+            if record is None:
+                self.stats["invalid"] += 1
+                outputs.append({"line": line, "error": "invalid record"})
+                continue
+            self.stats["records"] += 1
+            if i not in decisions:
+                self.stats["errors"] += 1
+                outputs.append({"line": line, "user_id": record["user_id"], "error": "classification failed"})
+                continue
+            action, reason = decisions[i]
+            outputs.append({
+                "line": line,
+                "user_id": record["user_id"],
+                "label": analysis.label,
+                "score": analysis.score,
+                "severity": analysis.severity,
+                "action": action,
+                "reason": reason,
+            })
+
+        if self.rewriter_service is not None:
+            await self._rewrite(chunk, outputs)
+
+        sink.write(b"".join(json.dumps(o).encode() + b"\n" for o in outputs))
+        sink.flush()
+        os.fsync(sink.fileno())
+        line, offset, _ = chunk[-1]
+        checkpoint.save(input_path, offset, line, sink.tell(), self.stats)
+
+    async def _rewrite(self, chunk: list, outputs: List[dict]):
+        async def rewrite(output: dict, message: str):
+            async with self.rewrite_slots:
+                # No latency budget offline: a slow Gemini call is still worth waiting for.
+                output["rewrite"], output["rewrite_tier"] = await self.rewriter_service.rewrite_with_tier(
+                    message, latency_budget=0
+                )
+
+        to_rewrite = [
+            rewrite(output, record["message"])
+            for (_, _, record), output in zip(chunk, outputs)
+            if output.get("action") in REWRITE_ACTIONS
+        ]
+        await asyncio.gather(*to_rewrite)
+        self.stats["rewrites"] += len(to_rewrite)
+
+async def run_cli(args) -> int:
+    # Imported here so `--help` works without settings or SDKs.
+    from app.services.toxicity_service import ToxicityService
+    from app.services.decision_engine import DecisionService
+    from app.core.upstream import get_upstream_manager
+
+    toxicity_service = ToxicityService()
+    decision_service = DecisionService()
+    if not args.alert:
+        # Archived messages are old news; only page admins when asked to.
+        decision_service.alerts = None
+    rewriter_service = None
+    if args.rewrite:
+        from app.services.rewriter_service import RewriterService
+        rewriter_service = RewriterService()
+    moderator = BulkModerator(
+        toxicity_service,
+        decision_service,
+        rewriter_service,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        rewrite_concurrency=args.rewrite_concurrency,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        skip_errors=args.skip_errors
+    )
+    try:
+        stats = await moderator.run(args.input, args.output, args.message_field, args.user_field, args.checkpoint)
+    except BulkStalled as e:
+        print(f"Stopped: {e}. Rerun the same command to resume.", file=sys.stderr)
+        return 2
+    finally:
+        await toxicity_service.aclose()
+        await decision_service.aclose()
+        await get_upstream_manager().aclose()
+    print(json.dumps(stats))
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Moderate a JSONL archive offline, resumably")
+    parser.add_argument("input", help="JSONL file, one {message, user_id} object per line")
+    parser.add_argument("output", help="JSONL verdicts, appended as chunks complete")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--message-field", default="message")
+    parser.add_argument("--user-field", default="user_id")
+    parser.add_argument("--rewrite", action="store_true", help="also rewrite messages that need it")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4, help="chunks classified at once")
+    parser.add_argument("--rewrite-concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3, help="retries of failed classifications per chunk")
+    parser.add_argument("--retry-backoff", type=float, default=2.0, help="first retry delay in seconds (doubles)")
+    parser.add_argument("--alert", action="store_true", help="send admin alerts for block_and_alert verdicts")
+    parser.add_argument("--skip-errors", action="store_true", help="record failures and carry on instead of stopping")
+    args = parser.parse_args(argv)
+    return asyncio.run(run_cli(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,51 +1,78 @@
-from datetime import datetime
-from typing import Dict, List
+from typing import List
 from app.schemas.analysis import AnalysisResult, AnalysisResponse
-from app.core.logging import logger
+from app.services.offence_store import create_offence_store
+from app.services.policy import Band, CompiledPolicy, get_policy_store
+from app.services.alerts import create_alert_dispatcher
+from app.core.config import get_settings
+from app.core.logging import logger, current_request_id
+
+# Actions whose message gets a polite rewrite
+REWRITE_ACTIONS = ["block_and_rewrite", "warn", "block_and_alert"]
 
 class DecisionService:
     def __init__(self):
-        # In-memory storage. Replace with Redis/DB in production.
-        self._offence_records: Dict[str, List[datetime]] = {}
-        logger.info("DecisionService initialized.")
+        settings = get_settings()
+        # OFFENCE_STORE=redis shares counts across workers and replicas.
+        self._offences = create_offence_store(settings)
+        self.escalation_threshold = settings.ESCALATION_THRESHOLD
+        # Severity bands and escalation rules, shared with ToxicityService's labels.
+        self.policy_store = get_policy_store()
+        # Queued here, delivered in batches by a background task (None = no webhook).
+        self.alerts = create_alert_dispatcher(settings)
+        logger.info(f"DecisionService initialized with {self._offences.name} offence store.")
 
-    def decide(self, analysis: AnalysisResult, user_id: str = "anonymous") -> tuple[str, str]:
+    async def decide(self, analysis: AnalysisResult, user_id: str = "anonymous") -> tuple[str, str]:
         """
         Returns (action, reason) based on analysis severity.
         """
-        severity = analysis.severity
-        action = "allow"
-        reason = "Safe message."
-
-        # 1. Base Logic
-        if severity < 20:
-            action = "allow"
-            reason = "Message is clean."
-        elif 20 <= severity < 40:
-            action = "warn"
-            reason = "Mild toxicity detected. User warned."
-        elif 40 <= severity <= 70:
-            action = "block_and_rewrite"
-            reason = "Toxic content detected. Message blocked and rewrite suggested."
-        else: # > 70
-            action = "block_and_alert"
-            reason = "Severe toxicity detected. Message blocked and admin alerted."
-
-        # 2. Escalation Logic (if toxic)
-        if severity >= 40:
-            self._register_offence(user_id)
-            offence_count = self._get_offence_count(user_id)
-            
-            if offence_count > 3 and action == "block_and_rewrite":
-                action = "block_and_alert"
-                reason += " (Escalated due to repeated offences)"
-        
+        policy = self.policy_store.get()
+        return await self._apply(policy, policy.band_for(analysis.severity), user_id, analysis)
+
+    async def decide_batch(self, analyses: List[AnalysisResult], user_ids: List[str]) -> List[tuple[str, str]]:
+        """
+        Same as `decide` for each item, in order, against a single policy
+        snapshot; the band lookup is done for the whole batch at once.
+        """
+        policy = self.policy_store.get()
+        bands = policy.bands_for([analysis.severity for analysis in analyses])
+        return [
+            await self._apply(policy, band, user_id, analysis)
+            for band, user_id, analysis in zip(bands, user_ids, analyses)
+        ]
+
+    async def aclose(self):
+        if self.alerts is not None:
+            await self.alerts.aclose()
+
+    async def _apply(self, policy: CompiledPolicy, band: Band, user_id: str, analysis: AnalysisResult) -> tuple[str, str]:
+        action, reason = band.action, band.reason
+        offence_count = 0
+        # Escalation Logic (if toxic). Breaker-open fallbacks say nothing
+        # about the user, so they never count as offences or raise alerts.
+        fallback = analysis.label == "fallback"
+        if band.offence and not fallback:
+            offence_count = await self._register_offence(user_id)
+            action, reason = policy.escalate(action, reason, offence_count, self.escalation_threshold)
+
+        if action == "block_and_alert" and self.alerts is not None and not fallback:
+            self.alerts.submit(
+                user_id,
+                label=analysis.label,
+                severity=analysis.severity,
+                reason=reason,
+                escalated=action != band.action,
+                offences=offence_count,
+                request_id=current_request_id()
+            )
         return action, reason
 
-    def _register_offence(self, user_id: str):
-        if user_id not in self._offence_records:
-            self._offence_records[user_id] = []
-        self._offence_records[user_id].append(datetime.now())
+    async def _register_offence(self, user_id: str) -> int:
+        try:
+            return await self._offences.register(user_id)
+        except Exception as e:
+            # Losing escalation briefly beats failing the request.
+            logger.error(f"Offence store error: {e}")
+            return 0
 
-    def _get_offence_count(self, user_id: str) -> int:
-        return len(self._offence_records.get(user_id, []))
+    async def _get_offence_count(self, user_id: str) -> int:
+        return await self._offences.count(user_id)
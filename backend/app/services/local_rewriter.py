@@ -0,0 +1,167 @@
+"""
+Deterministic lexicon-based rewriter: the fast tier in front of Gemini.
+
+The lexicon (see rewrite_lexicon.example.json) has:
+
+    substitutions  phrase -> polite replacement ("shut up" -> "please stop")
+    insults        words removed from the message
+    adjectives     insults only when aimed at the reader ("you are so dumb"),
+                   left alone elsewhere ("a dumb idea", "the fat cat")
+    profanity      intensifiers removed from the message
+    modifiers      words dropped together with an insult ("a", "such", "total")
+    directed       replacement for insults aimed at the reader ("you are an idiot")
+
+Everything is compiled into a handful of regexes once, at startup.
+"""
+import json
+import re
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_LEXICON = {
+    "substitutions": {
+        "shut up": "please stop",
+        "shut the fuck up": "please stop",
+        "you suck": "I disagree with you",
+        "screw you": "I disagree with you",
+        "fuck you": "I disagree with you",
+        "fuck off": "please leave me alone",
+        "piss off": "please leave me alone",
+        "go to hell": "please leave me alone",
+        "go away": "please give me some space",
+        "kill yourself": "please leave me alone",
+        "kys": "please leave me alone",
+        "go die": "please leave me alone",
+        "i hate you": "I am upset with you",
+        "nobody likes you": "I am not happy with you",
+        "everyone hates you": "I am not happy with you",
+        "everyone knows it": "that is how I feel",
+        "what the hell": "what",
+        "what the fuck": "what",
+    },
+    "insults": [
+        "idiot", "idiots", "moron", "morons", "dumbass", "loser", "losers", "jerk", "fool", "fools",
+        "clown", "freak", "retard", "imbecile", "cretin", "scum", "bitch", "bastard", "asshole", "dick",
+    ],
+    "adjectives": ["stupid", "dumb", "pathetic", "worthless", "useless", "trash", "ugly", "fat", "retarded"],
+    "profanity": ["fucking", "fuckin", "fuck", "freaking", "damn", "goddamn", "bloody", "shit", "shitty", "crap"],
+    "modifiers": ["a", "an", "such", "so", "total", "complete", "absolute", "utter", "the", "big", "little", "really", "very"],
+    "directed": "I disagree with you",
+}
+
+FALLBACK_REWRITE = "I would prefer not to say that."
+
+# An insult right after one of these is denied, not made ("you are not stupid").
+_NEGATIONS = frozenset({"not", "never", "no", "nor", "hardly"})
+
+_REPEATED_PUNCTUATION = re.compile(r"([!?.])[!?.]+")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([,.!?;:])")
+_REPEATED_SEPARATORS = re.compile(r"([,;:])(?:\s*[,;:])+")
+_DANGLING_EDGES = re.compile(r"^[\s,;:.!?]+|[\s,;:]+$")
+_SEPARATOR_BEFORE_STOP = re.compile(r"[,;:]+([.!?])")
+
+def _alternation(phrases: Iterable[str]) -> str:
+    # Longest first so "shut the fuck up" wins over "shut up"; any run of
+    # whitespace matches between words.
+    return "|".join(
+        r"\s+".join(re.escape(word) for word in phrase.split())
+        for phrase in sorted(set(phrases), key=len, reverse=True)
+    )
+
+class LocalRewriter:
+    """
+    Phrase substitution, then insults aimed at the reader, then any
+    remaining insults and profanity, then punctuation and shouting cleanup.
+    Pure CPU, typically tens of microseconds per message.
+    """
+
+    def __init__(
+        self,
+        substitutions: Dict[str, str],
+        insults: List[str],
+        profanity: List[str] = (),
+        adjectives: List[str] = (),
+        modifiers: List[str] = (),
+        directed: str = "I disagree with you"
+    ):
+        self.substitutions = {" ".join(k.casefold().split()): v for k, v in substitutions.items()}
+        modifier = f"(?:(?:{_alternation(modifiers)})\\s+)*" if modifiers else ""
+        # A run of insults and profanity ending in an insult ("such a stupid fucking loser").
+        words = _alternation(list(insults) + list(adjectives) + list(profanity))
+        insult = f"{modifier}(?:(?:{words})\\s+)*(?:{_alternation(insults)})" if insults else None
+        # Aimed at the reader, the run may also end in an adjective ("you're so dumb").
+        heads = list(insults) + list(adjectives)
+        directed_insult = f"{modifier}(?:(?:{words})\\s+)*(?:{_alternation(heads)})" if heads else None
+
+        flags = re.IGNORECASE
+        self._substitute = (
+            re.compile(rf"\b(?:{_alternation(self.substitutions)})\b", flags) if self.substitutions else None
+        )
+        self.directed = directed
+        self._directed = (
+            re.compile(rf"\b(?:you\s+are|you're|youre|ur|u\s+r)\s+{directed_insult}\b", flags)
+            if directed_insult else None
+        )
+        # "you idiot" is name-calling rather than a statement: drop it.
+        self._insults = re.compile(rf"\b(?:you\s+)?{insult}\b", flags) if insult else None
+        self._profanity = re.compile(rf"\b(?:{_alternation(profanity)})\b", flags) if profanity else None
+
+    @classmethod
+    def from_lexicon(cls, lexicon: dict) -> "LocalRewriter":
+        return cls(
+            substitutions=lexicon.get("substitutions", {}),
+            insults=lexicon.get("insults", []),
+            profanity=lexicon.get("profanity", []),
+            adjectives=lexicon.get("adjectives", []),
+            modifiers=lexicon.get("modifiers", []),
+            directed=lexicon.get("directed", "I disagree with you")
+        )
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "LocalRewriter":
+        if not path:
+            return cls.from_lexicon(DEFAULT_LEXICON)
+        with open(path, encoding="utf-8") as f:
+            return cls.from_lexicon(json.load(f))
+
+    def rewrite(self, text: str) -> str:
+        """The rewritten text; "" if nothing is left once the insults are gone."""
+        if not text or not text.strip():
+            return ""
+        if self._shouting(text):
+            text = text.lower()
+        if self._substitute is not None:
+            text = self._substitute.sub(lambda m: self.substitutions[" ".join(m.group(0).casefold().split())], text)
+        if self._directed is not None:
+            text = self._directed.sub(self._unless_negated(self.directed), text)
+        if self._insults is not None:
+            text = self._insults.sub(self._unless_negated(""), text)
+        if self._profanity is not None:
+            text = self._profanity.sub("", text)
+        return self._tidy(text)
+
+    @staticmethod
+    def _unless_negated(replacement: str):
+        def replace(match: re.Match) -> str:
+            before = match.string[:match.start()].split()
+            last = before[-1].casefold() if before else ""
+            if last in _NEGATIONS or last.endswith("n't"):
+                return match.group(0)
+            return replacement
+        return replace
+
+    @staticmethod
+    def _shouting(text: str) -> bool:
+        letters = [c for c in text if c.isalpha()]
+        return len(letters) >= 6 and sum(c.isupper() for c in letters) > 0.7 * len(letters)
+
+    @staticmethod
+    def _tidy(text: str) -> str:
+        text = _REPEATED_PUNCTUATION.sub(r"\1", text)        # "!!!" -> "!"
+        text = _SPACE_BEFORE_PUNCTUATION.sub(r"\1", text)    # "word ," -> "word,"
+        text = _REPEATED_SEPARATORS.sub(r"\1", text)         # ", ," -> ","
+        text = " ".join(text.split())
+        text = _DANGLING_EDGES.sub("", text)
+        text = _SEPARATOR_BEFORE_STOP.sub(r"\1", text)
+        if not any(c.isalnum() for c in text):
+            return ""
+        return text[0].upper() + text[1:]
@@ -0,0 +1,148 @@
+import asyncio
+import contextvars
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+class BatcherOverloaded(Exception):
+    pass
+
+class BatcherClosed(Exception):
+    pass
+
+class MicroBatcher:
+    """
+    Collects single classification requests from concurrent coroutines and
+    sends them upstream as one batched call once `max_batch_size` items are
+    queued or the oldest has waited `max_wait` seconds. A failed batch
+    fails every caller in it; logging is left to `classify` so each failure
+    is reported once.
+    """
+
+    def __init__(
+        self,
+        classify: Callable[[List[str]], Awaitable[List[list]]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.005,
+        max_queue: int = 1024
+    ):
+        self.classify = classify
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+        self.rejected = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    async def submit(self, text: str) -> list:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, future, time.monotonic()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherOverloaded(f"micro-batch queue full ({self.max_queue} pending)")
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_observed_batch,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight_batches": len(self._in_flight),
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": 1000 * self.total_queue_wait / self.items if self.items else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_queue_wait,
+        }
+
+    async def aclose(self):
+        """Stops the worker and fails every queued or in-flight submit with BatcherClosed."""
+        worker, self._worker = self._worker, None
+        if self._loop is not asyncio.get_running_loop():
+            # Bound to an event loop that's gone; nothing left to wait on.
+            self._in_flight.clear()
+            return
+        tasks = [task for task in (worker, *self._in_flight) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            self._fail([future])
+
+    @staticmethod
+    def _fail(futures: Iterable[asyncio.Future]):
+        for future in futures:
+            if not future.done():
+                future.set_exception(BatcherClosed("micro-batcher closed"))
+
+    def _ensure_worker(self):
+        # Services outlive event loops in tests, so bind to whichever loop is running.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            # A fresh context: the worker outlives the request that started it
+            # and must not log with (or annotate) that request's correlation fields.
+            self._worker = loop.create_task(self._run(), context=contextvars.Context())
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                # Dispatch without waiting so the next batch can form meanwhile.
+                task = asyncio.ensure_future(self._dispatch(batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+                batch = []
+        except asyncio.CancelledError:
+            self._fail(future for _, future, _ in batch)
+            raise
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        now = time.monotonic()
+        live = [(text, future) for text, future, _ in batch if not future.done()]
+        for _, _, enqueued in batch:
+            wait = now - enqueued
+            self.total_queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+        self.batches += 1
+        self.items += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+        if not live:
+            return
+
+        try:
+            outputs = await self.classify([text for text, _ in live])
+        except asyncio.CancelledError:
+            self._fail(future for _, future in live)
+            raise
+        except Exception as e:
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), output in zip(live, outputs):
+            if not future.done():
+                future.set_result(output)
@@ -0,0 +1,181 @@
+import hashlib
+import re
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Generic, List, Optional, Set, Tuple, TypeVar
+from app.services.verdict_cache import normalize_text
+
+T = TypeVar("T")
+
+_MASK64 = (1 << 64) - 1
+_NON_WORD = re.compile(r"[\W_]+")
+_REPEATS = re.compile(r"(.)\1{2,}")
+
+def fingerprint_text(text: str) -> str:
+    """
+    Normalization for near-duplicate matching, on top of the cache key's:
+    punctuation, symbols and emoji become spaces and runs of a repeated
+    character are cut to two ("stuuupid!!!" -> "stuupid").
+    """
+    text = _NON_WORD.sub(" ", normalize_text(text))
+    return " ".join(_REPEATS.sub(r"\1\1", text).split())
+
+def shingles(text: str, size: int) -> Set[int]:
+    """64-bit hashes of the character `size`-grams of `text`."""
+    return {
+        int.from_bytes(hashlib.blake2b(text[i:i + size].encode("utf-8"), digest_size=8).digest(), "little")
+        for i in range(max(1, len(text) - size + 1))
+    }
+
+class MinHasher:
+    """
+    MinHash signatures with `num_perm` multiply-shift hash functions. Two
+    signatures agree in a position with probability equal to the Jaccard
+    similarity of the underlying shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._params = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "little") | 1  # odd multiplier
+            b = int.from_bytes(digest[8:], "little")
+            self._params.append((a, b))
+
+    def signature(self, text: str) -> array:
+        hashes = shingles(text, self.shingle_size)
+        return array("Q", (min(((a * h + b) & _MASK64) >> 32 for h in hashes) for a, b in self._params))
+
+class NearDuplicateIndex(Generic[T]):
+    """
+    Recent values (verdicts, rewrites) keyed by MinHash signatures of their
+    text, with LSH banding so a lookup only compares against texts sharing
+    at least one band. A candidate is reused when the estimated Jaccard
+    similarity of the character shingles is at least `threshold`.
+
+    Bounded by `max_entries` (least recently used evicted first) and `ttl`.
+    Texts shorter than `min_chars` after normalization are never matched:
+    too few shingles for the estimate to mean anything.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        max_entries: int = 5000,
+        ttl: float = 600.0,
+        min_chars: int = 20,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_chars = min_chars
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self._entries: "OrderedDict[int, Tuple[float, array, T]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.candidates = 0
+        self.evictions = 0
+
+    def signature(self, text: str) -> Optional[array]:
+        normalized = fingerprint_text(text)
+        if len(normalized) < self.min_chars:
+            return None
+        return self.hasher.signature(normalized)
+
+    def get(self, text: str, signature: Optional[array] = None) -> Optional[T]:
+        """The value stored for the most similar recent text, if similar enough."""
+        signature = signature if signature is not None else self.signature(text)
+        if signature is None:
+            self.skipped += 1
+            return None
+
+        now = time.monotonic()
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        expired = []
+        for key in self._band_keys(signature):
+            for entry_id in self._buckets.get(key, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                expires, other, _ = self._entries[entry_id]
+                if expires <= now:
+                    expired.append(entry_id)
+                    continue
+                similarity = sum(x == y for x, y in zip(signature, other)) / len(signature)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+        self.candidates += len(seen)
+        for entry_id in expired:
+            self._evict(entry_id)
+
+        if best_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id][2]
+
+    def put(self, text: str, value: T, signature: Optional[array] = None):
+        signature = signature if signature is not None else self.signature(text)
+        if signature is None:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (time.monotonic() + self.ttl, signature, value)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped_short": self.skipped,
+            "candidates_compared": self.candidates,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, signature: array) -> List[Tuple[int, int]]:
+        rows = self.rows
+        return [(band, hash(tuple(signature[band * rows:(band + 1) * rows]))) for band in range(self.bands)]
+
+    def _evict(self, entry_id: int):
+        _, signature, _ = self._entries.pop(entry_id)
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+def create_near_duplicate_index(settings) -> NearDuplicateIndex:
+    return NearDuplicateIndex(
+        threshold=settings.NEAR_DUP_THRESHOLD,
+        max_entries=settings.NEAR_DUP_MAX_ENTRIES,
+        ttl=settings.NEAR_DUP_TTL,
+        min_chars=settings.NEAR_DUP_MIN_CHARS
+    )
@@ -0,0 +1,91 @@
+import math
+import time
+from app.services.offence_tracker import OffenceTracker
+from app.core.logging import logger
+
+class OffenceStore:
+    """
+    Where DecisionService keeps windowed per-user offence counts.
+    `register` records one offence and returns the count within the window.
+    """
+    name = "base"
+
+    async def register(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    async def count(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+class InMemoryOffenceStore(OffenceStore):
+    """Per-process store. Counts are not shared across workers or replicas."""
+    name = "memory"
+
+    def __init__(self, window_seconds: float, buckets: int, max_users: int):
+        self.tracker = OffenceTracker(window_seconds=window_seconds, buckets=buckets, max_users=max_users)
+
+    async def register(self, user_id: str) -> int:
+        return self.tracker.register(user_id)
+
+    async def count(self, user_id: str) -> int:
+        return self.tracker.count(user_id)
+
+class RedisOffenceStore(OffenceStore):
+    """
+    Shared store on any Redis-protocol server. Each user has one counter key
+    per time bucket, expiring after the window. `register` increments the
+    current bucket and reads the whole window in a single MULTI/EXEC pipeline,
+    so a decision costs one round trip and the increment is atomic.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, window_seconds: float, buckets: int, key_prefix: str = "safespeak:offences"):
+        # Imported lazily so the default memory store never loads the client.
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.bucket_seconds = window_seconds / buckets
+        self.buckets = buckets
+        self.key_ttl = math.ceil(window_seconds + self.bucket_seconds)
+        self.key_prefix = key_prefix
+        logger.info("RedisOffenceStore initialized.")
+
+    async def register(self, user_id: str) -> int:
+        keys = self._window_keys(user_id)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(keys[-1])
+            pipe.expire(keys[-1], self.key_ttl)
+            pipe.mget(keys)
+            _, _, counts = await pipe.execute()
+        return sum(int(c) for c in counts if c is not None)
+
+    async def count(self, user_id: str) -> int:
+        counts = await self._redis.mget(self._window_keys(user_id))
+        return sum(int(c) for c in counts if c is not None)
+
+    async def aclose(self):
+        await self._redis.aclose()
+
+    def _window_keys(self, user_id: str) -> list:
+        # Wall-clock buckets so every worker agrees on the window.
+        epoch = int(time.time() // self.bucket_seconds)
+        return [f"{self.key_prefix}:{user_id}:{e}" for e in range(epoch - self.buckets + 1, epoch + 1)]
+
+def create_offence_store(settings) -> OffenceStore:
+    if settings.OFFENCE_STORE == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("REDIS_URL is required when OFFENCE_STORE=redis")
+        return RedisOffenceStore(
+            url=settings.REDIS_URL,
+            window_seconds=settings.OFFENCE_WINDOW_SECONDS,
+            buckets=settings.OFFENCE_WINDOW_BUCKETS
+        )
+    if settings.OFFENCE_STORE == "memory":
+        return InMemoryOffenceStore(
+            window_seconds=settings.OFFENCE_WINDOW_SECONDS,
+            buckets=settings.OFFENCE_WINDOW_BUCKETS,
+            max_users=settings.OFFENCE_MAX_TRACKED_USERS
+        )
+    raise ValueError(f"Unknown OFFENCE_STORE: {settings.OFFENCE_STORE}")
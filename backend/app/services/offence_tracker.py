@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+class _UserWindow:
+    __slots__ = ("counts", "head", "total")
+
+    def __init__(self, buckets: int, epoch: int):
+        self.counts: List[int] = [0] * buckets
+        self.head = epoch
+        self.total = 0
+
+class OffenceTracker:
+    """
+    Per-user offence counts over a sliding time window, kept as a fixed ring
+    of `buckets` counters with a running total. Register and count are O(1)
+    amortized. Users idle for a full window are evicted, and at most
+    `max_users` users are tracked (least recently active evicted first).
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 86400.0,
+        buckets: int = 24,
+        max_users: int = 100000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.max_users = max_users
+        self.clock = clock
+        self._users: "OrderedDict[str, _UserWindow]" = OrderedDict()
+
+    def register(self, user_id: str) -> int:
+        """Records one offence now and returns the count within the window."""
+        epoch = self._epoch()
+        window = self._users.get(user_id)
+        if window is None:
+            window = _UserWindow(self.buckets, epoch)
+            self._users[user_id] = window
+        else:
+            self._advance(window, epoch)
+            self._users.move_to_end(user_id)
+
+        window.counts[epoch % self.buckets] += 1
+        window.total += 1
+        self._evict(epoch)
+        return window.total
+
+    def count(self, user_id: str) -> int:
+        window = self._users.get(user_id)
+        if window is None:
+            return 0
+        self._advance(window, self._epoch())
+        return window.total
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _epoch(self) -> int:
+        return int(self.clock() // self.bucket_seconds)
+
+    def _advance(self, window: _UserWindow, epoch: int):
+        if epoch - window.head >= self.buckets:
+            window.counts = [0] * self.buckets
+            window.total = 0
+        else:
+            for e in range(window.head + 1, epoch + 1):
+                slot = e % self.buckets
+                window.total -= window.counts[slot]
+                window.counts[slot] = 0
+        window.head = max(window.head, epoch)
+
+    def _evict(self, epoch: int):
+        # Users are ordered by last offence, so idle ones sit at the front.
+        while self._users:
+            window = next(iter(self._users.values()))
+            if len(self._users) <= self.max_users:
+                self._advance(window, epoch)
+                if window.total > 0:
+                    break
+            self._users.popitem(last=False)
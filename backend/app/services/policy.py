@@ -0,0 +1,300 @@
+"""
+Declarative moderation policy: severity bands (label, action, reason) plus
+escalation rules, compiled into sorted breakpoints and evaluated by binary
+search. Both ToxicityService (labels) and DecisionService (actions) read
+the same compiled policy.
+
+Policy file (JSON), see policy.example.json:
+
+    {
+      "version": "default",
+      "bands": [
+        {"from": 0,  "label": "clean", "action": "allow", "reason": "Message is clean."},
+        {"from": 20, "label": "mild",  "action": "warn",  "reason": "...", "offence": false},
+        {"above": 70, "label": "toxic", "action": "block_and_alert", "reason": "...", "offence": true}
+      ],
+      "escalation": {"threshold": 3, "actions": {"block_and_rewrite": "block_and_alert"}, "reason_suffix": " (...)"}
+    }
+
+A band starts at `from` (inclusive) or `above` (exclusive) and runs to the
+next band. Offence bands count towards escalation; without an escalation
+threshold the ESCALATION_THRESHOLD setting applies. Dry-run a candidate
+policy against logged verdicts with:
+
+    python -m app.services.policy replay candidate.json verdicts.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.core.logging import logger
+
+DEFAULT_POLICY = {
+    "version": "default",
+    "bands": [
+        {"from": 0, "label": "clean", "action": "allow", "reason": "Message is clean."},
+        {"from": 20, "label": "mild", "action": "warn", "reason": "Mild toxicity detected. User warned."},
+        {"from": 40, "label": "toxic", "action": "block_and_rewrite",
+         "reason": "Toxic content detected. Message blocked and rewrite suggested.", "offence": True},
+        {"above": 70, "label": "toxic", "action": "block_and_alert",
+         "reason": "Severe toxicity detected. Message blocked and admin alerted.", "offence": True},
+        {"from": 80, "label": "severe", "action": "block_and_alert",
+         "reason": "Severe toxicity detected. Message blocked and admin alerted.", "offence": True},
+    ],
+    "escalation": {
+        "actions": {"block_and_rewrite": "block_and_alert"},
+        "reason_suffix": " (Escalated due to repeated offences)",
+    },
+}
+
+class PolicyError(ValueError):
+    pass
+
+@dataclass(frozen=True)
+class Band:
+    label: str
+    action: str
+    reason: str
+    offence: bool
+
+class CompiledPolicy:
+    """
+    Immutable lookup table. `band_for` is a bisect over the sorted
+    breakpoints; `bands_for` does a whole batch at once (numpy searchsorted
+    when numpy is installed).
+    """
+
+    # Below this size a plain bisect loop beats converting to numpy arrays.
+    VECTORIZE_MIN = 64
+
+    def __init__(
+        self,
+        version: str,
+        breakpoints: List[float],
+        bands: List[Band],
+        escalation: Dict[str, str],
+        threshold: Optional[int],
+        reason_suffix: str
+    ):
+        self.version = version
+        self.breakpoints = breakpoints
+        self.bands = bands
+        self.escalation = escalation
+        self.threshold = threshold
+        self.reason_suffix = reason_suffix
+
+    @classmethod
+    def compile(cls, spec: dict) -> "CompiledPolicy":
+        bands = spec.get("bands")
+        if not bands:
+            raise PolicyError("policy needs at least one band")
+        entries: List[Tuple[float, Band]] = []
+        for raw in bands:
+            if ("from" in raw) == ("above" in raw):
+                raise PolicyError(f"band needs exactly one of 'from' or 'above': {raw}")
+            try:
+                # An exclusive start is the next float up, so one bisect handles both.
+                start = float(raw["from"]) if "from" in raw else math.nextafter(float(raw["above"]), math.inf)
+                band = Band(str(raw["label"]), str(raw["action"]), str(raw.get("reason", "")), bool(raw.get("offence", False)))
+            except (KeyError, TypeError, ValueError) as e:
+                raise PolicyError(f"invalid band {raw}: {e}") from None
+            entries.append((start, band))
+        entries.sort(key=lambda entry: entry[0])
+        starts = [start for start, _ in entries]
+        if len(set(starts)) != len(starts):
+            raise PolicyError("bands must not start at the same severity")
+
+        escalation = spec.get("escalation", {})
+        threshold = escalation.get("threshold")
+        return cls(
+            version=str(spec.get("version", "unversioned")),
+            breakpoints=starts,
+            bands=[band for _, band in entries],
+            escalation=dict(escalation.get("actions", {})),
+            threshold=int(threshold) if threshold is not None else None,
+            reason_suffix=str(escalation.get("reason_suffix", "")),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "CompiledPolicy":
+        with open(path, encoding="utf-8") as f:
+            try:
+                spec = json.load(f)
+            except ValueError as e:
+                raise PolicyError(f"{path} is not valid JSON: {e}") from None
+        return cls.compile(spec)
+
+    def band_for(self, severity: float) -> Band:
+        # Severities below the first breakpoint fall into the first band.
+        return self.bands[max(0, bisect_right(self.breakpoints, severity) - 1)]
+
+    def bands_for(self, severities: Sequence[float]) -> List[Band]:
+        if len(severities) < self.VECTORIZE_MIN:
+            return [self.band_for(s) for s in severities]
+        try:
+            import numpy as np
+        except ImportError:
+            return [self.band_for(s) for s in severities]
+        indices = np.searchsorted(np.asarray(self.breakpoints), np.asarray(severities, dtype=float), side="right") - 1
+        return [self.bands[i] for i in np.maximum(indices, 0).tolist()]
+
+    def label_for(self, severity: float) -> str:
+        return self.band_for(severity).label
+
+    def escalate(self, action: str, reason: str, offence_count: int, default_threshold: int = 3) -> Tuple[str, str]:
+        """Applies the escalation rules once a user has more than `threshold` offences."""
+        threshold = self.threshold if self.threshold is not None else default_threshold
+        if offence_count > threshold and action in self.escalation:
+            return self.escalation[action], reason + self.reason_suffix
+        return action, reason
+
+class PolicyStore:
+    """
+    Holds the active compiled policy. When `path` is set, `get()` checks the
+    file's mtime at most every `check_interval` seconds and recompiles it on
+    change. The new policy replaces the old one in a single assignment, and
+    only once it compiled cleanly; a broken file is logged and the previous
+    policy stays active.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        if path:
+            self._mtime = os.stat(path).st_mtime
+            self.current = CompiledPolicy.from_file(path)
+        else:
+            self.current = CompiledPolicy.compile(DEFAULT_POLICY)
+        logger.info(f"Decision policy '{self.current.version}' loaded ({len(self.current.bands)} bands).")
+
+    def get(self) -> CompiledPolicy:
+        if self.path and time.monotonic() >= self._next_check:
+            self._next_check = time.monotonic() + self.check_interval
+            self.reload_if_changed()
+        return self.current
+
+    def reload_if_changed(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as e:
+            logger.error(f"Policy file unavailable, keeping '{self.current.version}': {e}")
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            policy = CompiledPolicy.from_file(self.path)
+        except (OSError, PolicyError) as e:
+            self.reload_errors += 1
+            self._mtime = mtime  # don't retry the same broken file every check
+            logger.error(f"Policy reload failed, keeping '{self.current.version}': {e}")
+            return False
+        self._mtime = mtime
+        self.current = policy
+        self.reloads += 1
+        logger.info(f"Decision policy reloaded: '{policy.version}'.")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "version": self.current.version,
+            "path": self.path,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+@lru_cache()
+def get_policy_store() -> PolicyStore:
+    from app.core.config import get_settings
+    settings = get_settings()
+    return PolicyStore(path=settings.POLICY_PATH, check_interval=settings.POLICY_RELOAD_INTERVAL)
+
+def replay(policy: CompiledPolicy, records, baseline: Optional[CompiledPolicy] = None, default_threshold: int = 3) -> dict:
+    """
+    Re-decides logged verdicts (dicts with `severity`, and `action` /
+    `user_id` when available) under `policy`. Offences are counted per user
+    over the whole replay. The comparison is against the logged action, or
+    against `baseline` when given.
+    """
+    offences: Counter = Counter()
+    baseline_offences: Counter = Counter()
+    transitions: Counter = Counter()
+    candidate_actions: Counter = Counter()
+    total = 0
+    for record in records:
+        severity = record.get("severity")
+        if severity is None:
+            continue
+        total += 1
+        user_id = record.get("user_id") or "anonymous"
+        action = _decide_offline(policy, float(severity), user_id, offences, default_threshold)
+        if baseline is not None:
+            before = _decide_offline(baseline, float(severity), user_id, baseline_offences, default_threshold)
+        else:
+            before = record.get("action", "unknown")
+        candidate_actions[action] += 1
+        transitions[(before, action)] += 1
+    changed = sum(n for (before, after), n in transitions.items() if before != after)
+    return {
+        "records": total,
+        "changed": changed,
+        "actions": dict(candidate_actions),
+        "transitions": {f"{before} -> {after}": n for (before, after), n in transitions.most_common()},
+    }
+
+def _decide_offline(policy: CompiledPolicy, severity: float, user_id: str, offences: Counter, default_threshold: int) -> str:
+    band = policy.band_for(severity)
+    action = band.action
+    if band.offence:
+        offences[user_id] += 1
+        action, _ = policy.escalate(action, "", offences[user_id], default_threshold)
+    return action
+
+def _read_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Decision policy tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("check", help="compile a policy file and print its bands")
+    check.add_argument("policy")
+    dry_run = commands.add_parser("replay", help="replay logged verdicts through a candidate policy")
+    dry_run.add_argument("policy", help="candidate policy file")
+    dry_run.add_argument("verdicts", help="JSONL with severity (and action, user_id), e.g. JSON logs or bulk output")
+    dry_run.add_argument("--baseline", help="compare with this policy instead of the logged actions")
+    dry_run.add_argument("--threshold", type=int, default=3, help="escalation threshold for policies that don't set one")
+    args = parser.parse_args(argv)
+
+    try:
+        policy = CompiledPolicy.from_file(args.policy)
+    except PolicyError as e:
+        print(f"Invalid policy: {e}", file=sys.stderr)
+        return 1
+    if args.command == "check":
+        for start, band in zip(policy.breakpoints, policy.bands):
+            print(f"{start:>10g}  {band.label:<10}{band.action:<20}{'offence' if band.offence else ''}")
+        return 0
+
+    baseline = CompiledPolicy.from_file(args.baseline) if args.baseline else None
+    print(json.dumps(replay(policy, _read_jsonl(args.verdicts), baseline, args.threshold), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import json
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.schemas.analysis import AnalysisResult
+from app.services.verdict_cache import normalize_text
+from app.core.logging import logger
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher compiled once from a lexicon. `find` scans the text
+    in a single pass regardless of how many patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(pattern)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> List[Tuple[int, str]]:
+        """Returns (end_index, pattern) for every occurrence."""
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern in self._out[state]:
+                matches.append((i, pattern))
+        return matches
+
+class LexicalPreFilter:
+    """
+    Cheap stage run before the model: a definitive "severe" verdict for
+    unambiguous lexicon hits, and optionally "clean" for short whitelisted
+    messages. Returns None when the model should decide.
+
+    Lexicon file (JSON): {"severe": ["..."], "whitelist": ["ok", "lol"]}
+    """
+
+    def __init__(
+        self,
+        severe_terms: Iterable[str],
+        whitelist: Iterable[str] = (),
+        severe_severity: float = 95,
+        whitelist_max_chars: int = 12
+    ):
+        self._severe = AhoCorasick(normalize_text(t) for t in severe_terms)
+        self._whitelist = {self._strip_punctuation(normalize_text(t)) for t in whitelist}
+        self.severe_severity = severe_severity
+        self.whitelist_max_chars = whitelist_max_chars
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "LexicalPreFilter":
+        with open(path, encoding="utf-8") as f:
+            lexicon = json.load(f)
+        prefilter = cls(lexicon.get("severe", []), lexicon.get("whitelist", []), **kwargs)
+        logger.info(
+            f"LexicalPreFilter loaded {len(lexicon.get('severe', []))} severe terms "
+            f"and {len(lexicon.get('whitelist', []))} whitelist entries from {path}."
+        )
+        return prefilter
+
+    def check(self, text: str) -> Optional[AnalysisResult]:
+        normalized = normalize_text(text)
+
+        for end, term in self._severe.find(normalized):
+            start = end - len(term) + 1
+            # Whole-word hits only, so terms inside longer words don't fire.
+            if (start == 0 or not normalized[start - 1].isalnum()) and \
+               (end + 1 == len(normalized) or not normalized[end + 1].isalnum()):
+                return AnalysisResult(
+                    label="severe",
+                    score=self.severe_severity / 100,
+                    severity=self.severe_severity
+                )
+
+        if len(normalized) <= self.whitelist_max_chars and \
+           self._strip_punctuation(normalized) in self._whitelist:
+            return AnalysisResult(label="clean", score=0.0, severity=0.0)
+
+        return None
+
+    @staticmethod
+    def _strip_punctuation(text: str) -> str:
+        return "".join(ch for ch in text if ch.isalnum() or ch.isspace()).strip()
+
+class PreFilterStage:
+    """
+    Wraps LexicalPreFilter with its run mode ("shadow" or "enforce"), stage
+    timing, and shadow-mode agreement counters against the model.
+    """
+
+    def __init__(self, prefilter: LexicalPreFilter, mode: str = "shadow"):
+        if mode not in ("shadow", "enforce"):
+            raise ValueError(f"Unknown prefilter mode: {mode}")
+        self.prefilter = prefilter
+        self.mode = mode
+        self.checks = 0
+        self.severe_hits = 0
+        self.whitelist_hits = 0
+        self.total_seconds = 0.0
+        self.shadow_agree = 0
+        self.shadow_disagree = 0
+
+    @property
+    def enforcing(self) -> bool:
+        return self.mode == "enforce"
+
+    def check(self, text: str) -> Optional[AnalysisResult]:
+        start = time.perf_counter()
+        verdict = self.prefilter.check(text)
+        self.total_seconds += time.perf_counter() - start
+        self.checks += 1
+        if verdict is not None:
+            if verdict.label == "severe":
+                self.severe_hits += 1
+            else:
+                self.whitelist_hits += 1
+        return verdict
+
+    def record_shadow(self, verdict: Optional[AnalysisResult], model_result: AnalysisResult):
+        if verdict is None or model_result.label in ("error", "fallback"):
+            return
+        if verdict.label == model_result.label:
+            self.shadow_agree += 1
+        else:
+            self.shadow_disagree += 1
+            logger.info(
+                f"Prefilter shadow disagreement: prefilter={verdict.label} model={model_result.label} "
+                f"(severity {model_result.severity})"
+            )
+
+    def stats(self) -> dict:
+        compared = self.shadow_agree + self.shadow_disagree
+        return {
+            "mode": self.mode,
+            "checks": self.checks,
+            "severe_hits": self.severe_hits,
+            "whitelist_hits": self.whitelist_hits,
+            "avg_check_us": 1e6 * self.total_seconds / self.checks if self.checks else 0.0,
+            "shadow_agree": self.shadow_agree,
+            "shadow_disagree": self.shadow_disagree,
+            "shadow_agreement_rate": self.shadow_agree / compared if compared else None,
+        }
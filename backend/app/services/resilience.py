@@ -0,0 +1,223 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+from app.core.logging import logger
+from app.core.metrics import UPSTREAM_ERRORS, UPSTREAM_IN_FLIGHT
+from app.core.upstream import ConcurrencyLimiter, UpstreamOverloaded  # noqa: F401 (re-exported)
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    pass
+
+class LatencyTracker:
+    """Recent call latencies (seconds) in a fixed-size window."""
+
+    def __init__(self, window: int = 256):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `reset_seconds`, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.transitions = 0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._transition("half_open")
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        if self.state != "closed":
+            self._transition("closed")
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != "open":
+                self._transition("open")
+
+    def release(self):
+        """Frees the half-open trial slot when a call ends without a verdict (e.g. cancelled)."""
+        self._trial_in_flight = False
+
+    def _transition(self, state: str):
+        logger.info(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+        self.state = state
+        self.transitions += 1
+
+class ResilientCaller:
+    """
+    Wraps calls to one upstream with a circuit breaker, a timeout derived
+    from observed latency (p99 x multiplier, clamped to [min_timeout,
+    max_timeout]), and optional hedging: a duplicate request is sent once
+    the first has run longer than the observed p95, and the first success wins.
+    A shared `limiter` caps concurrent calls across upstreams; waiting for a
+    slot doesn't count against the timeout or the breaker. A hedge needs a
+    slot of its own and is skipped when none is free.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_timeout: float,
+        min_timeout: float = 0.5,
+        timeout_multiplier: float = 3.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        latency_window: int = 256,
+        min_samples: int = 20,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        limiter: Optional[ConcurrencyLimiter] = None
+    ):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.limiter = limiter
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self.latency = LatencyTracker(latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedged = 0
+        self.hedges_skipped = 0
+        self._in_flight = UPSTREAM_IN_FLIGHT.labels(upstream=name)
+        self._errors = {
+            kind: UPSTREAM_ERRORS.labels(upstream=name, kind=kind)
+            for kind in ("error", "timeout", "circuit_open", "overloaded")
+        }
+
+    def current_timeout(self) -> float:
+        if len(self.latency) < self.min_samples:
+            return self.max_timeout
+        adaptive = self.latency.percentile(99) * self.timeout_multiplier
+        return min(self.max_timeout, max(self.min_timeout, adaptive))
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.limiter is None:
+            return await self._call(fn)
+        try:
+            async with self.limiter.slot():
+                return await self._call(fn)
+        except UpstreamOverloaded:
+            self._errors["overloaded"].inc()
+            raise
+
+    async def _call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.breaker.allow():
+            self.rejected += 1
+            self._errors["circuit_open"].inc()
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        self.calls += 1
+        timeout = self.current_timeout()
+        start = time.perf_counter()
+        self._in_flight.inc()
+        try:
+            result = await asyncio.wait_for(self._attempt(fn), timeout=timeout)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self.failures += 1
+            self._errors["timeout" if isinstance(e, asyncio.TimeoutError) else "error"].inc()
+            self.latency.record(time.perf_counter() - start)
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._in_flight.dec()
+
+        self.latency.record(time.perf_counter() - start)
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> dict:
+        p50, p95, p99 = (self.latency.percentile(p) for p in (50, 95, 99))
+        return {
+            "state": self.breaker.state,
+            "transitions": self.breaker.transitions,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedged": self.hedged,
+            "hedges_skipped": self.hedges_skipped,
+            "timeout_ms": round(1000 * self.current_timeout(), 1),
+            "p50_ms": round(1000 * p50, 1) if p50 is not None else None,
+            "p95_ms": round(1000 * p95, 1) if p95 is not None else None,
+            "p99_ms": round(1000 * p99, 1) if p99 is not None else None,
+        }
+
+    def _start_hedge(self, fn: Callable[[], Awaitable[T]]) -> Optional[asyncio.Future]:
+        # Never queue for a slot: a hedge only helps if it can start now.
+        if self.limiter is not None and not self.limiter.try_acquire():
+            self.hedges_skipped += 1
+            return None
+        self.hedged += 1
+        hedge = asyncio.ensure_future(fn())
+        if self.limiter is not None:
+            # A callback, so the slot is freed even if the task is cancelled before it starts.
+            hedge.add_done_callback(lambda _: self.limiter.release())
+        return hedge
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.hedge or len(self.latency) < self.min_samples:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.latency.percentile(self.hedge_percentile))
+            if not done:
+                hedge = self._start_hedge(fn)
+                if hedge is not None:
+                    tasks.add(hedge)
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
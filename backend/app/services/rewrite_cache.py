@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+class RewriteCache:
+    """
+    Memoizes rewrites with LRU + TTL bounds and merges concurrent identical
+    requests into a single upstream call (single-flight).
+    """
+
+    def __init__(self, model_id: str, max_size: int = 2000, ttl: float = 3600.0, uncacheable: Iterable[str] = ()):
+        self.model_id = model_id
+        self.max_size = max_size
+        self.ttl = ttl
+        self.uncacheable = set(uncacheable)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\0{text.strip()}".encode("utf-8")).hexdigest()
+
+    async def get_or_compute(self, text: str, compute: Callable[[str], Awaitable[str]]) -> str:
+        key = self.key(text)
+
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute(key, text, compute))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        # Shielded so one cancelled waiter doesn't cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+    async def _compute(self, key: str, text: str, compute: Callable[[str], Awaitable[str]]) -> str:
+        try:
+            result = await compute(text)
+            if result and result not in self.uncacheable:
+                self._store(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _store(self, key: str, result: str):
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,115 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+from app.schemas.analysis import RewriteJob
+from app.core.logging import logger
+
+class JobStoreFull(Exception):
+    pass
+
+class _Job:
+    __slots__ = ("job_id", "status", "rewrite", "rewrite_tier", "expires", "done", "task", "delivered")
+
+    def __init__(self, job_id: str, expires: float):
+        self.job_id = job_id
+        self.status = "pending"
+        self.rewrite: Optional[str] = None
+        self.rewrite_tier: Optional[str] = None
+        self.expires = expires
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.delivered = False
+
+    def snapshot(self) -> RewriteJob:
+        if self.status != "pending":
+            self.delivered = True
+        return RewriteJob(job_id=self.job_id, status=self.status, rewrite=self.rewrite, rewrite_tier=self.rewrite_tier)
+
+class RewriteJobStore:
+    """
+    Runs rewrites in the background so decisions can be returned first.
+    Jobs are bounded by `max_jobs` and expire `ttl` seconds after creation.
+    At capacity, expired jobs go first, then finished jobs whose result was
+    already read, and only then the oldest unread finished job.
+    """
+
+    def __init__(self, max_jobs: int = 10000, ttl: float = 300.0):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+        self.evicted_unread = 0
+
+    def submit(self, text: str, rewrite: Callable[[str], Awaitable[Tuple[str, str]]]) -> str:
+        """`rewrite` returns (rewrite, tier), like RewriterService.rewrite_with_tier."""
+        self._expire()
+        if len(self._jobs) >= self.max_jobs and not self._evict_finished():
+            raise JobStoreFull(f"{self.max_jobs} rewrite jobs pending")
+
+        job = _Job(uuid.uuid4().hex, time.monotonic() + self.ttl)
+        job.task = asyncio.ensure_future(self._run(job, text, rewrite))
+        self._jobs[job.job_id] = job
+        return job.job_id
+
+    def get(self, job_id: str) -> Optional[RewriteJob]:
+        self._expire()
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    async def wait(self, job_id: str) -> Optional[RewriteJob]:
+        """Waits until the job finishes or expires. Returns None if unknown."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=max(0.0, job.expires - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+        return job.snapshot()
+
+    def stats(self) -> dict:
+        pending = sum(1 for job in self._jobs.values() if job.status == "pending")
+        return {
+            "jobs": len(self._jobs), "pending": pending, "max_jobs": self.max_jobs,
+            "evicted_unread": self.evicted_unread
+        }
+
+    async def _run(self, job: _Job, text: str, rewrite: Callable[[str], Awaitable[Tuple[str, str]]]):
+        try:
+            job.rewrite, job.rewrite_tier = await rewrite(text)
+            job.status = "done"
+        except Exception as e:
+            logger.error(f"Rewrite job {job.job_id} failed: {e}")
+            job.status = "failed"
+        finally:
+            job.done.set()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.expires > now:
+                break
+            self._jobs.popitem(last=False)
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+
+    def _evict_finished(self) -> bool:
+        # Only called after _expire, so every job here is still within its TTL.
+        oldest = None
+        for job_id, job in self._jobs.items():
+            if job.status == "pending":
+                continue
+            if job.delivered:
+                del self._jobs[job_id]
+                return True
+            if oldest is None:
+                oldest = job_id
+        if oldest is None:
+            return False
+        # A poll for this job will now 404 before its TTL; max_jobs is too low.
+        del self._jobs[oldest]
+        self.evicted_unread += 1
+        logger.warning(f"Rewrite job store full; evicted unread job {oldest} before its TTL.")
+        return True
@@ -1,58 +1,189 @@
-from google import genai
-from google.genai import types
+import asyncio
+from typing import Optional, Tuple
 from app.core.config import get_settings
+from app.core.metrics import REWRITE_TIERS
+from app.core.upstream import get_upstream_manager
 from app.core.logging import logger
+from app.services.rewrite_cache import RewriteCache
+from app.services.near_duplicate import create_near_duplicate_index, fingerprint_text
+from app.services.resilience import ResilientCaller, CircuitOpenError, UpstreamOverloaded
+from app.services.local_rewriter import FALLBACK_REWRITE, LocalRewriter
 
-settings = get_settings()
+REWRITER_MODES = ("tiered", "local", "gemini")
 
 class RewriterService:
+    """
+    Tiered rewriting. The local lexicon rewrite is computed first (it's
+    microseconds); Gemini then gets REWRITE_LATENCY_BUDGET_MS to do better.
+    When the budget runs out or Gemini fails, the local rewrite is served,
+    but only if it changed the message: toxicity the lexicon doesn't know
+    (threats, slurs it lacks) comes back untouched, and offering that as
+    the polite version would be worse than waiting for Gemini or the fixed
+    fallback sentence.
+    """
+
     def __init__(self):
+        settings = get_settings()
         try:
-            self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+            self.mode = settings.REWRITER_MODE
+            if self.mode not in REWRITER_MODES:
+                raise ValueError(f"Unknown REWRITER_MODE: {self.mode}")
+            self.local = LocalRewriter.from_file(settings.REWRITE_LEXICON_PATH) if self.mode != "gemini" else None
+            self.latency_budget = settings.REWRITE_LATENCY_BUDGET_MS / 1000
             self.model = "gemini-2.0-flash"
-            logger.info("RewriterService initialized with Google GenAI SDK.")
+            self.client = self._create_client(settings) if self.mode != "local" else None
+            self.timeout = settings.REWRITER_TIMEOUT
+            self.upstream = ResilientCaller(
+                "rewriter",
+                max_timeout=settings.REWRITER_TIMEOUT,
+                min_timeout=settings.ADAPTIVE_TIMEOUT_MIN,
+                timeout_multiplier=settings.ADAPTIVE_TIMEOUT_MULTIPLIER,
+                failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+                reset_seconds=settings.BREAKER_RESET_SECONDS,
+                hedge=settings.REWRITER_HEDGE,
+                limiter=get_upstream_manager().limiter
+            )
+            self.cache = RewriteCache(
+                model_id=self.model,
+                max_size=settings.REWRITE_CACHE_SIZE,
+                ttl=settings.REWRITE_CACHE_TTL,
+                uncacheable=[FALLBACK_REWRITE]
+            ) if settings.REWRITE_CACHE_ENABLED else None
+            self.near_duplicates = (
+                create_near_duplicate_index(settings)
+                if settings.NEAR_DUP_ENABLED and settings.NEAR_DUP_REWRITES else None
+            )
+            logger.info(f"RewriterService initialized in {self.mode} mode.")
         except Exception as e:
             logger.error(f"Failed to initialize RewriterService: {e}")
             raise
 
-    def rewrite(self, text: str) -> str:
+    def _create_client(self, settings):
+        if not settings.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is required for the rewriter")
+        # Imported here so importing the app doesn't pay for the SDK.
+        from google import genai
+        from google.genai import types
+
+        http = get_upstream_manager().client("gemini", timeout=settings.REWRITER_TIMEOUT)
+        client = genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(httpx_async_client=http, base_url=settings.GEMINI_BASE_URL)
+        )
+        self._config = types.GenerateContentConfig(
+            system_instruction="You are a text transformation engine. Your task is to rewrite inputs to be polite and objective. Remove insults but keep the core message. Do not be conversational.",
+            temperature=0.1,
+            candidate_count=1,
+            max_output_tokens=100,
+            safety_settings=[
+                types.SafetySetting(
+                    category=types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+                    threshold=types.HarmBlockThreshold.BLOCK_NONE
+                ),
+                types.SafetySetting(
+                    category=types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+                    threshold=types.HarmBlockThreshold.BLOCK_NONE
+                ),
+                types.SafetySetting(
+                    category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+                    threshold=types.HarmBlockThreshold.BLOCK_NONE
+                ),
+                types.SafetySetting(
+                    category=types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+                    threshold=types.HarmBlockThreshold.BLOCK_NONE
+                ),
+            ]
+        )
+        return client
+
+    async def warmup(self):
+        """One Gemini call, bypassing the caches. Raises if it only produced the fallback."""
+        if self.client is None:
+            return
+        # _generate swallows upstream errors into the fixed fallback text.
+        if await self._generate("hello") == FALLBACK_REWRITE:
+            raise RuntimeError("Gemini returned no rewrite")
+
+    async def aclose(self):
+        # The Gemini client's HTTP pool belongs to the UpstreamManager.
+        pass
+
+    async def rewrite(self, text: str) -> str:
+        return (await self.rewrite_with_tier(text))[0]
+
+    async def rewrite_with_tier(self, text: str, latency_budget: Optional[float] = None) -> Tuple[str, str]:
+        """
+        Returns (rewrite, tier): "gemini", "local", or "fallback" (Gemini
+        failed and there is no usable local rewrite). `latency_budget`
+        overrides REWRITE_LATENCY_BUDGET_MS for this call; 0 waits for Gemini.
+        """
         if not text or not text.strip():
-            return ""
+            return "", "local"
 
+        local = self._local_rewrite(text)
+        if self.client is None:
+            if local is None:
+                return self._served(FALLBACK_REWRITE, "fallback", "local_unchanged")
+            return self._served(local, "local", "local_mode")
+
+        budget = self.latency_budget if latency_budget is None else latency_budget
+        gemini = self.cache.get_or_compute(text, self._reuse_or_generate) if self.cache is not None else self._reuse_or_generate(text)
+        try:
+            if local is not None and budget > 0:
+                # With the cache, the Gemini call is shielded: it carries on
+                # past the budget and the next identical message gets it.
+                rewritten = await asyncio.wait_for(gemini, timeout=budget)
+            else:
+                rewritten = await gemini
+        except asyncio.TimeoutError:
+            return self._served(local, "local", "budget_exceeded")
+
+        if rewritten != FALLBACK_REWRITE:
+            return self._served(rewritten, "gemini", "ok")
+        if local is not None:
+            return self._served(local, "local", "gemini_failed")
+        return self._served(FALLBACK_REWRITE, "fallback", "gemini_failed")
+
+    def _local_rewrite(self, text: str) -> Optional[str]:
+        """
+        The local rewrite, or None if there's no local tier, it left the
+        message as it was, or nothing was left ("you idiot").
+        """
+        if self.local is None:
+            return None
+        local = self.local.rewrite(text)
+        return None if not local or fingerprint_text(local) == fingerprint_text(text) else local
+
+    @staticmethod
+    def _served(rewritten: str, tier: str, reason: str) -> Tuple[str, str]:
+        REWRITE_TIERS.labels(tier=tier, reason=reason).inc()
+        return rewritten, tier
+
+    async def _reuse_or_generate(self, text: str) -> str:
+        # Exact repeats are already served by the cache; this catches variants.
+        if self.near_duplicates is None:
+            return await self._generate(text)
+        signature = self.near_duplicates.signature(text)
+        similar = self.near_duplicates.get(text, signature)
+        if similar is not None:
+            return similar
+        rewritten = await self._generate(text)
+        if rewritten != FALLBACK_REWRITE:
+            self.near_duplicates.put(text, rewritten, signature)
+        return rewritten
+
+    async def _generate(self, text: str) -> str:
         try:
             prompt = f"Objectively rewrite this text to be polite. Maintain the original meaning. Text: {text}"
             
-            response = self.client.models.generate_content(
+            response = await self.upstream.call(lambda: self.client.aio.models.generate_content(
                 model=self.model,
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction="You are a text transformation engine. Your task is to rewrite inputs to be polite and objective. Remove insults but keep the core message. Do not be conversational.",
-                    temperature=0.1,
-                    candidate_count=1,
-                    max_output_tokens=100,
-                    safety_settings=[
-                        types.SafetySetting(
-                            category=types.HarmCategory.HARM_CATEGORY_HARASSMENT,
-                            threshold=types.HarmBlockThreshold.BLOCK_NONE
-                        ),
-                        types.SafetySetting(
-                            category=types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-                            threshold=types.HarmBlockThreshold.BLOCK_NONE
-                        ),
-                        types.SafetySetting(
-                            category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                            threshold=types.HarmBlockThreshold.BLOCK_NONE
-                        ),
-                        types.SafetySetting(
-                            category=types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                            threshold=types.HarmBlockThreshold.BLOCK_NONE
-                        ),
-                    ]
-                )
-            )
+                config=self._config
+            ))
             
             if not response.text:
-                return "I would prefer not to say that."
+                return FALLBACK_REWRITE
 
             rewritten = response.text.strip()
             
@@ -67,6 +198,11 @@ class RewriterService:
             
             return rewritten
 
+        except (CircuitOpenError, UpstreamOverloaded):
+            return FALLBACK_REWRITE
+        except asyncio.TimeoutError:
+            logger.error("Gemini API Error: timed out")
+            return FALLBACK_REWRITE
         except Exception as e:
             logger.error(f"Gemini API Error: {e}")
-            return "I would prefer not to say that."
+            return FALLBACK_REWRITE
@@ -0,0 +1,110 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import httpx
+from app.core.upstream import get_upstream_manager
+from app.core.logging import logger
+
+class ToxicityBackend:
+    """
+    Classifier interface used by ToxicityService. `classify` returns, per input
+    text, the label/score list the scoring loop expects:
+    [{'label': 'neutral', 'score': 0.9}, {'label': 'toxic', 'score': 0.1}]
+    """
+    name = "base"
+
+    async def classify(self, texts: List[str]) -> List[list]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+class RemoteToxicityBackend(ToxicityBackend):
+    """
+    Hugging Face Inference API, called with list inputs so one request can
+    classify many texts. `http` is the pooled client owned by UpstreamManager.
+    """
+    name = "remote"
+
+    def __init__(self, http: httpx.AsyncClient, model_id: str):
+        self.model_id = model_id
+        self.http = http
+
+    async def classify(self, texts: List[str]) -> List[list]:
+        response = await self.http.post(f"/{self.model_id}", json={"inputs": texts})
+        response.raise_for_status()
+        scores = response.json()
+        if len(scores) != len(texts):
+            raise ValueError(f"expected {len(texts)} results, got {len(scores)}")
+        return scores
+
+class LocalToxicityBackend(ToxicityBackend):
+    """
+    In-process CPU classifier loaded from a local checkpoint directory. A
+    directory containing `model.onnx` is loaded through ONNX Runtime (optimum),
+    anything else through transformers/torch. Inference runs on a dedicated
+    thread so it never blocks the event loop.
+    """
+    name = "local"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None, max_length: int = 512):
+        # Imported lazily: these are optional dependencies (requirements-local.txt).
+        from transformers import AutoTokenizer, pipeline
+
+        self.model_path = model_path
+        self.model_id = f"local:{os.path.abspath(model_path)}"
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        if os.path.exists(os.path.join(model_path, "model.onnx")):
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            model = ORTModelForSequenceClassification.from_pretrained(model_path)
+        else:
+            import torch
+            from transformers import AutoModelForSequenceClassification
+            if num_threads:
+                torch.set_num_threads(num_threads)
+            model = AutoModelForSequenceClassification.from_pretrained(model_path)
+            model.eval()
+
+        self._pipeline = pipeline(
+            "text-classification",
+            model=model,
+            tokenizer=tokenizer,
+            device=-1,
+            top_k=None
+        )
+        self.max_length = max_length
+        # One worker: the model is not safe to call from several threads at once.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="toxicity-local")
+        logger.info(f"LocalToxicityBackend loaded model from {model_path}.")
+
+    async def classify(self, texts: List[str]) -> List[list]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._predict, texts)
+
+    def _predict(self, texts: List[str]) -> List[list]:
+        outputs = self._pipeline(list(texts), truncation=True, max_length=self.max_length)
+        return [[{"label": o["label"], "score": float(o["score"])} for o in output] for output in outputs]
+
+    async def aclose(self):
+        self._executor.shutdown(wait=False)
+
+def create_toxicity_backend(settings) -> ToxicityBackend:
+    if settings.TOXICITY_BACKEND == "local":
+        if not settings.TOXICITY_LOCAL_MODEL_PATH:
+            raise ValueError("TOXICITY_LOCAL_MODEL_PATH is required when TOXICITY_BACKEND=local")
+        return LocalToxicityBackend(
+            model_path=settings.TOXICITY_LOCAL_MODEL_PATH,
+            num_threads=settings.TOXICITY_LOCAL_THREADS
+        )
+    if settings.TOXICITY_BACKEND == "remote":
+        if not settings.HF_API_KEY:
+            raise ValueError("HF_API_KEY is required when TOXICITY_BACKEND=remote")
+        http = get_upstream_manager().client(
+            "hf",
+            base_url=settings.HF_INFERENCE_URL,
+            headers={"Authorization": f"Bearer {settings.HF_API_KEY}"},
+            timeout=settings.TOXICITY_TIMEOUT
+        )
+        return RemoteToxicityBackend(http=http, model_id=settings.TOXICITY_MODEL)
+    raise ValueError(f"Unknown TOXICITY_BACKEND: {settings.TOXICITY_BACKEND}")
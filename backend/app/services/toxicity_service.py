@@ -1,32 +1,302 @@
-from huggingface_hub import InferenceClient
+import asyncio
+import re
+from typing import List
 from app.core.config import get_settings
+from app.core.upstream import get_upstream_manager
 from app.schemas.analysis import AnalysisResult
+from app.services.verdict_cache import VerdictCache
+from app.services.near_duplicate import create_near_duplicate_index
+from app.services.toxicity_backends import create_toxicity_backend
+from app.services.micro_batcher import MicroBatcher, BatcherOverloaded
+from app.services.prefilter import LexicalPreFilter, PreFilterStage
+from app.services.policy import get_policy_store
+from app.services.resilience import ResilientCaller, CircuitOpenError, UpstreamOverloaded
 from app.core.logging import logger
 
-settings = get_settings()
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in (part.strip() for part in SENTENCE_BOUNDARY.split(text)) if s]
+
+def split_windows(words: List[str], size: int, overlap: int) -> List[str]:
+    """Overlapping windows of at most `size` words."""
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(len(words) - overlap, 1), step)]
 
 class ToxicityService:
     def __init__(self):
+        settings = get_settings()
         try:
-            self.client = InferenceClient(token=settings.HF_API_KEY)
-            self.model_id = settings.TOXICITY_MODEL
-            logger.info("ToxicityService initialized.")
+            self.backend = create_toxicity_backend(settings)
+            self.model_id = self.backend.model_id
+            self.timeout = settings.TOXICITY_TIMEOUT
+            self.upstream = ResilientCaller(
+                "toxicity",
+                max_timeout=settings.TOXICITY_TIMEOUT,
+                min_timeout=settings.ADAPTIVE_TIMEOUT_MIN,
+                timeout_multiplier=settings.ADAPTIVE_TIMEOUT_MULTIPLIER,
+                failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+                reset_seconds=settings.BREAKER_RESET_SECONDS,
+                hedge=settings.TOXICITY_HEDGE,
+                limiter=get_upstream_manager().limiter
+            )
+            self.batch_size = settings.TOXICITY_BATCH_SIZE
+            self.cache = VerdictCache(
+                model_id=self.model_id,
+                max_size=settings.VERDICT_CACHE_SIZE,
+                ttl=settings.VERDICT_CACHE_TTL,
+                path=settings.VERDICT_CACHE_PATH,
+                disk_max_rows=settings.VERDICT_CACHE_DISK_MAX_ROWS
+            ) if settings.VERDICT_CACHE_ENABLED else None
+            self.near_duplicates = create_near_duplicate_index(settings) if settings.NEAR_DUP_ENABLED else None
+            self.batcher = MicroBatcher(
+                classify=self._classify_batch,
+                max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+                max_wait=settings.MICRO_BATCH_MAX_WAIT_MS / 1000,
+                max_queue=settings.MICRO_BATCH_MAX_QUEUE
+            ) if settings.MICRO_BATCH_ENABLED else None
+            self.prefilter = self._load_prefilter(settings)
+            self.window_words = settings.LONG_TEXT_WINDOW_WORDS
+            self.window_overlap = settings.LONG_TEXT_WINDOW_OVERLAP
+            self.max_chars = settings.MAX_MESSAGE_CHARS
+            self.fallback_severity = settings.TOXICITY_FALLBACK_SEVERITY
+            # Labels come from the same policy bands the decision uses.
+            self.policy_store = get_policy_store()
+            logger.info(f"ToxicityService initialized with {self.backend.name} backend.")
         except Exception as e:
             logger.error(f"Failed to initialize ToxicityService: {e}")
             raise
 
-    def analyze(self, text: str) -> AnalysisResult:
+    def _load_prefilter(self, settings):
+        if settings.PREFILTER_MODE == "off":
+            return None
+        if not settings.PREFILTER_LEXICON_PATH:
+            raise ValueError("PREFILTER_LEXICON_PATH is required when PREFILTER_MODE is not 'off'")
+        prefilter = LexicalPreFilter.from_file(
+            settings.PREFILTER_LEXICON_PATH,
+            severe_severity=settings.PREFILTER_SEVERE_SEVERITY,
+            whitelist_max_chars=settings.PREFILTER_WHITELIST_MAX_CHARS if settings.PREFILTER_WHITELIST_ENABLED else -1
+        )
+        return PreFilterStage(prefilter, mode=settings.PREFILTER_MODE)
+
+    async def warmup(self):
+        """One backend call, bypassing the caches, so the model is loaded before traffic."""
+        await self.backend.classify(["hello"])
+
+    async def aclose(self):
+        if self.batcher is not None:
+            await self.batcher.aclose()
+        await self.backend.aclose()
+
+    async def analyze(self, text: str) -> AnalysisResult:
         if not text or not text.strip():
             return AnalysisResult(label="clean", score=0.0, severity=0.0)
 
+        verdict = self._prefilter(text)
+        if verdict is not None and self.prefilter.enforcing:
+            return verdict
+
+        words = text.split()
+        if len(words) > self.window_words:
+            result = await self._analyze_long(text)
+        else:
+            result = await self._analyze_with_model(text)
+        if verdict is not None:
+            self.prefilter.record_shadow(verdict, result)
+        return result
+
+    async def analyze_incremental(self, text: str) -> AnalysisResult:
+        """
+        Classifies each sentence separately through the verdict cache, so a
+        growing draft only sends new or edited sentences to the model. The
+        message verdict is the most severe sentence verdict, with `segment`
+        set to that sentence's index.
+        """
+        segments = split_sentences(text or "")
+        if len(segments) <= 1:
+            return await self.analyze(text)
+
+        results = await asyncio.gather(*[self.analyze(segment) for segment in segments])
+        return self._most_severe(results)
+
+    async def _analyze_long(self, text: str) -> AnalysisResult:
+        """
+        Texts longer than the model's input are split into overlapping word
+        windows, classified as one batch, and reduced to the most severe
+        window (recorded in `segment`). Input beyond `max_chars` is dropped
+        so latency stays bounded.
+        """
+        if len(text) > self.max_chars:
+            logger.info(f"Truncating {len(text)}-char input to {self.max_chars} chars.")
+            text = text[:self.max_chars]
+        windows = split_windows(text.split(), self.window_words, self.window_overlap)
+        # The whole text has already been through the prefilter.
+        return self._most_severe(await self._classify_texts(windows))
+
+    def _most_severe(self, results: List[AnalysisResult]) -> AnalysisResult:
+        scored = [(i, r) for i, r in enumerate(results) if r.label != "error"]
+        if not scored:
+            return AnalysisResult(label="error", score=0.0, severity=0.0)
+
+        index, worst = max(scored, key=lambda item: item[1].severity)
+        if worst.label == "clean":
+            if len(scored) < len(results):
+                # A failed segment could have been the toxic one.
+                return AnalysisResult(label="error", score=0.0, severity=0.0)
+            # Likewise an unclassified one: its fallback verdict wins.
+            index, worst = next(((i, r) for i, r in scored if r.label == "fallback"), (index, worst))
+        return worst.model_copy(update={"segment": index})
+
+    async def _analyze_with_model(self, text: str) -> AnalysisResult:
+        if self.cache is not None:
+            cached = await self.cache.get(text)
+            if cached is not None:
+                return self._relabel(cached)
+
+        signature = None
+        if self.near_duplicates is not None:
+            signature = self.near_duplicates.signature(text)
+            similar = self.near_duplicates.get(text, signature)
+            if similar is not None:
+                return self._relabel(similar)
+
         try:
-            # API Call
-            scores = self.client.text_classification(text, model=self.model_id)
+            # Backend Call (coalesced with concurrent requests when micro-batching)
+            if self.batcher is not None:
+                scores = await asyncio.wait_for(self.batcher.submit(text), timeout=self.timeout)
+            else:
+                scores = (await self._classify_batch([text]))[0]
             # scores is a list of dicts: [{'label': 'neutral', 'score': 0.9}, ...]
-        except Exception as e:
-            logger.error(f"HF API Error: {e}")
+        except (CircuitOpenError, UpstreamOverloaded):
+            return self._fallback()
+        except BatcherOverloaded as e:
+            logger.warning(f"Toxicity request shed: {e}")
+            return AnalysisResult(label="error", score=0.0, severity=0.0)
+        except Exception:
+            # Upstream failures (timeouts included) are logged once per call
+            # by _classify_batch, not once per message they carried.
             return AnalysisResult(label="error", score=0.0, severity=0.0)
 
+        result = self._score(scores)
+        if self.cache is not None:
+            await self.cache.put(text, result)
+        if self.near_duplicates is not None:
+            self.near_duplicates.put(text, result, signature)
+        return result
+
+    async def analyze_batch(self, texts: List[str]) -> List[AnalysisResult]:
+        """
+        Classifies many texts with one inference call per `batch_size` chunk.
+        Results are returned in input order; a failed chunk yields error results.
+        """
+        results = [AnalysisResult(label="clean", score=0.0, severity=0.0) for _ in texts]
+        verdicts = {}
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            verdict = self._prefilter(text)
+            if verdict is not None:
+                if self.prefilter.enforcing:
+                    results[i] = verdict
+                    continue
+                verdicts[i] = verdict
+            pending.append(i)
+
+        for index, result in zip(pending, await self._classify_texts([texts[i] for i in pending])):
+            results[index] = result
+        for index, verdict in verdicts.items():
+            self.prefilter.record_shadow(verdict, results[index])
+        return results
+
+    async def _classify_texts(self, texts: List[str]) -> List[AnalysisResult]:
+        """
+        The model path of analyze_batch, without the prefilter: verdict cache,
+        near-duplicates, long-text windows, then chunked backend calls.
+        """
+        results: List[AnalysisResult] = [None] * len(texts)
+        signatures = {}
+        pending = []
+        long_texts = []
+        for i, text in enumerate(texts):
+            if len(text.split()) > self.window_words:
+                long_texts.append(i)
+                continue
+            cached = await self.cache.get(text) if self.cache is not None else None
+            if cached is None and self.near_duplicates is not None:
+                signatures[i] = self.near_duplicates.signature(text)
+                cached = self.near_duplicates.get(text, signatures[i])
+            if cached is not None:
+                results[i] = self._relabel(cached)
+            else:
+                pending.append(i)
+        chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        chunk_scores, long_results = await asyncio.gather(
+            asyncio.gather(*[self._classify_chunk([texts[i] for i in chunk]) for chunk in chunks]),
+            asyncio.gather(*[self._analyze_long(texts[i]) for i in long_texts])
+        )
+        for index, result in zip(long_texts, long_results):
+            results[index] = result
+        for chunk, scores in zip(chunks, chunk_scores):
+            for index, item_scores in zip(chunk, scores):
+                if isinstance(item_scores, AnalysisResult):
+                    results[index] = item_scores
+                else:
+                    results[index] = self._score(item_scores)
+                    if self.cache is not None:
+                        await self.cache.put(texts[index], results[index])
+                    if self.near_duplicates is not None:
+                        self.near_duplicates.put(texts[index], results[index], signatures.get(index))
+        return results
+
+    async def _classify_batch(self, texts: List[str]) -> List[list]:
+        # Breaker, adaptive timeout (capped at self.timeout) and optional hedging.
+        # The one place upstream failures are logged.
+        try:
+            return await self.upstream.call(lambda: self.backend.classify(texts))
+        except (CircuitOpenError, UpstreamOverloaded) as e:
+            # Expected while the breaker is open; it logs its own transitions.
+            logger.debug(f"Toxicity call of {len(texts)} not sent: {e!r}")
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Toxicity backend error: call of {len(texts)} timed out")
+            raise
+        except Exception as e:
+            logger.error(f"Toxicity backend error: {e}")
+            raise
+
+    async def _classify_chunk(self, texts: List[str]) -> list:
+        """Backend scores per text, or an error/fallback AnalysisResult per text on failure."""
+        try:
+            return await self._classify_batch(texts)
+        except (CircuitOpenError, UpstreamOverloaded):
+            return [self._fallback()] * len(texts)
+        except Exception:
+            # Already logged by _classify_batch.
+            return [AnalysisResult(label="error", score=0.0, severity=0.0)] * len(texts)
+
+    def _prefilter(self, text: str):
+        if self.prefilter is None:
+            return None
+        verdict = self.prefilter.check(text)
+        # Lexicon hits carry a severity; the active policy names it.
+        return self._relabel(verdict) if verdict is not None else None
+
+    def _fallback(self) -> AnalysisResult:
+        # Served without calling upstream while the breaker is open or the
+        # upstream slots are exhausted. Decided on like a verdict, but never
+        # cached, counted as an offence or alerted on.
+        return AnalysisResult(label="fallback", score=0.0, severity=self.fallback_severity)
+
+    def _relabel(self, cached: AnalysisResult) -> AnalysisResult:
+        # Cached verdicts may predate a policy reload; severity is what's cached.
+        label = self.policy_store.get().label_for(cached.severity)
+        if cached.label == "error" or cached.label == label:
+            return cached
+        return cached.model_copy(update={"label": label})
+
+    def _score(self, scores) -> AnalysisResult:
         toxic_score = 0.0
         
         # Determine toxicity
@@ -43,18 +313,9 @@ class ToxicityService:
                     toxic_score = max(toxic_score, score)
 
         severity_score = int(toxic_score * 100)
-        
-        if severity_score < 20: 
-            label = "clean"
-        elif severity_score < 40:
-            label = "mild"
-        elif severity_score < 80:
-            label = "toxic"
-        else:
-            label = "severe"
 
         return AnalysisResult(
-            label=label,
+            label=self.policy_store.get().label_for(severity_score),
             score=toxic_score,
             severity=severity_score
         )
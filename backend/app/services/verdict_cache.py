@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.schemas.analysis import AnalysisResult
+from app.core.logging import logger
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFKC, case-folded, whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+def cache_key(text: str, model_id: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """
+    Content-addressed LRU + TTL cache for toxicity verdicts, with an optional
+    SQLite tier that survives restarts. Error verdicts are never stored.
+
+    The disk tier is purged of expired rows and trimmed to `disk_max_rows`
+    (soonest-expiring first) at startup and every `disk_purge_every` writes,
+    so it can overshoot the cap by at most that many rows in between.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        max_size: int = 10000,
+        ttl: float = 3600.0,
+        path: Optional[str] = None,
+        disk_max_rows: int = 100000,
+        disk_purge_every: int = 500
+    ):
+        self.model_id = model_id
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, AnalysisResult]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        self.disk_max_rows = disk_max_rows
+        self.disk_purge_every = disk_purge_every
+        self._disk_writes = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, expires REAL, result TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS verdicts_expires ON verdicts (expires)")
+            with self._db_lock:
+                self._disk_purge()
+            logger.info(f"VerdictCache disk tier enabled at {path}.")
+
+    async def get(self, text: str) -> Optional[AnalysisResult]:
+        key = cache_key(text, self.model_id)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, result = entry
+            if expires > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+
+        if self._db is not None:
+            result = await asyncio.to_thread(self._disk_get, key)
+            if result is not None:
+                self._remember(key, result, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    async def put(self, text: str, result: AnalysisResult):
+        if result.label in ("error", "fallback"):
+            return
+        key = cache_key(text, self.model_id)
+        self._remember(key, result, time.monotonic())
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, key, result)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key: str, result: AnalysisResult, now: float):
+        self._entries[key] = (now + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # Disk tier stores wall-clock expiry so entries stay valid across restarts.
+    def _disk_get(self, key: str) -> Optional[AnalysisResult]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT result FROM verdicts WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return AnalysisResult.model_validate_json(row[0]) if row else None
+
+    def _disk_put(self, key: str, result: AnalysisResult):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO verdicts (key, expires, result) VALUES (?, ?, ?)",
+                (key, time.time() + self.ttl, result.model_dump_json())
+            )
+            self._disk_writes += 1
+            if self._disk_writes % self.disk_purge_every == 0:
+                self._disk_purge()
+            else:
+                self._db.commit()
+
+    def _disk_purge(self):
+        # Caller holds _db_lock.
+        self._db.execute("DELETE FROM verdicts WHERE expires <= ?", (time.time(),))
+        excess = self._db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - self.disk_max_rows
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY expires LIMIT ?)", (excess,)
+            )
+            self.disk_evictions += excess
+        self._db.commit()
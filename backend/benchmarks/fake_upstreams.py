@@ -0,0 +1,125 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+TOXIC_WORDS = ("stupid", "idiot", "hate", "loser", "kill")
+
+@dataclass
+class LatencyProfile:
+    """
+    Simulated upstream behaviour: each request waits `mean_ms` +/- `jitter_ms`
+    (uniform), and fails with a 503 with probability `error_rate`. Slow
+    outliers (`tail_ms`) are added with probability `tail_rate`. Seeded so
+    runs are reproducible.
+    """
+    mean_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    tail_rate: float = 0.0
+    tail_ms: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyProfile":
+        """`mean=80,jitter=20,errors=0.01,tail_rate=0.01,tail=1000`"""
+        names = {"mean": "mean_ms", "jitter": "jitter_ms", "errors": "error_rate", "tail_rate": "tail_rate", "tail": "tail_ms", "seed": "seed"}
+        values = {}
+        for part in filter(None, spec.split(",")):
+            key, value = part.split("=")
+            values[names[key.strip()]] = int(value) if key.strip() == "seed" else float(value)
+        return cls(**values)
+
+class _Simulator:
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.random = random.Random(profile.seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def delay(self) -> bool:
+        """Sleeps for one simulated call; returns False if the call should fail."""
+        p = self.profile
+        self.requests += 1
+        ms = p.mean_ms + self.random.uniform(-p.jitter_ms, p.jitter_ms)
+        if p.tail_rate and self.random.random() < p.tail_rate:
+            ms += p.tail_ms
+        await asyncio.sleep(max(0.0, ms) / 1000)
+        if p.error_rate and self.random.random() < p.error_rate:
+            self.errors += 1
+            return False
+        return True
+
+def _fake_scores(text: str) -> list:
+    hits = sum(word in text.lower() for word in TOXIC_WORDS)
+    toxic = min(0.95, 0.3 * hits) if hits else 0.02
+    return [{"label": "toxic", "score": toxic}, {"label": "neutral", "score": 1 - toxic}]
+
+def create_hf_app(profile: LatencyProfile) -> FastAPI:
+    """Stand-in for the HF Inference API: list inputs in, one score list per input out."""
+    app = FastAPI()
+    app.state.simulator = sim = _Simulator(profile)
+
+    @app.post("/{model_id:path}")
+    async def classify(model_id: str, request: Request):
+        body = await request.json()
+        inputs = body["inputs"]
+        if not await sim.delay():
+            return JSONResponse({"error": "Model is overloaded"}, status_code=503)
+        if isinstance(inputs, str):
+            return [_fake_scores(inputs)]
+        return [_fake_scores(text) for text in inputs]
+
+    return app
+
+def create_gemini_app(profile: LatencyProfile) -> FastAPI:
+    """Stand-in for the Gemini generateContent REST endpoint."""
+    app = FastAPI()
+    app.state.simulator = sim = _Simulator(profile)
+
+    @app.post("/{version}/models/{model}:generateContent")
+    async def generate_content(version: str, model: str, request: Request):
+        await request.body()
+        if not await sim.delay():
+            return JSONResponse({"error": {"code": 503, "message": "overloaded", "status": "UNAVAILABLE"}}, status_code=503)
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": "Please let's keep this respectful."}]},
+                "finishReason": "STOP"
+            }],
+            "usageMetadata": {"promptTokenCount": 20, "candidatesTokenCount": 8, "totalTokenCount": 28}
+        }
+
+    return app
+
+class FakeUpstreamServer:
+    """Runs one stand-in app with uvicorn inside the current event loop."""
+
+    def __init__(self, app: FastAPI, host: str = "127.0.0.1", port: int = 0):
+        self.app = app
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def simulator(self) -> _Simulator:
+        return self.app.state.simulator
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self):
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self._task.done():
+                self._task.result()
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        self.server.should_exit = True
+        if self._task is not None:
+            await self._task
@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, List, Optional
+import httpx
+
+CORPUS = [
+    "Hello, how was school today?",
+    "Do you want to play after dinner?",
+    "You are so stupid, nobody likes you",
+    "That game was fun, let's do it again tomorrow",
+    "I hate you, loser",
+    "Can you send me the homework for maths?",
+    "You're an idiot and everyone knows it",
+    "See you at practice!",
+]
+
+def message_stream(unique: bool = True, tag: str = "msg"):
+    """
+    Cycles the corpus; `unique` tags each message with the scenario and a
+    counter so caches don't absorb the load.
+    """
+    for i, text in enumerate(itertools.cycle(CORPUS)):
+        yield f"{text} ({tag} {i})" if unique else text
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+@dataclass
+class ScenarioResult:
+    name: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    throughput: float
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+    p99_ms: Optional[float]
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "error_rate": round(self.error_rate, 4)}
+
+def summarize(name: str, concurrency: int, latencies: List[float], errors: int, seconds: float) -> ScenarioResult:
+    ordered = sorted(latencies)
+    ms = lambda p: round(1000 * percentile(ordered, p), 2) if ordered else None
+    total = len(latencies)
+    return ScenarioResult(
+        name=name,
+        concurrency=concurrency,
+        requests=total,
+        errors=errors,
+        seconds=round(seconds, 3),
+        throughput=round(total / seconds, 2) if seconds else 0.0,
+        p50_ms=ms(50),
+        p95_ms=ms(95),
+        p99_ms=ms(99),
+    )
+
+async def closed_loop(
+    name: str,
+    call: Callable[[int], Awaitable[bool]],
+    concurrency: int,
+    total_requests: int
+) -> ScenarioResult:
+    """
+    `concurrency` workers issue `total_requests` calls back to back. `call`
+    receives the request number and returns False for a failed request.
+    """
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while (n := next(counter)) < total_requests:
+            start = time.perf_counter()
+            try:
+                ok = await call(n)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(name, concurrency, latencies, errors, time.perf_counter() - start)
+
+async def run_analyze(client: httpx.AsyncClient, concurrency: int, total_requests: int, unique: bool = True) -> ScenarioResult:
+    messages = message_stream(unique, f"analyze c{concurrency}")
+
+    async def call(n: int) -> bool:
+        response = await client.post("/analyze", json={"message": next(messages), "user_id": f"bench-{n % 64}"})
+        return response.status_code == 200
+
+    return await closed_loop("analyze", call, concurrency, total_requests)
+
+async def run_batch(
+    client: httpx.AsyncClient, concurrency: int, total_requests: int, batch_size: int = 16, unique: bool = True
+) -> ScenarioResult:
+    messages = message_stream(unique, f"batch c{concurrency}")
+
+    async def call(n: int) -> bool:
+        items = [{"message": next(messages), "user_id": f"bench-{n % 64}"} for _ in range(batch_size)]
+        response = await client.post("/analyze/batch", json={"items": items})
+        return response.status_code == 200 and all(r["error"] is None for r in response.json()["results"])
+
+    return await closed_loop(f"analyze_batch[{batch_size}]", call, concurrency, total_requests)
+
+async def run_stream(base_url: str, concurrency: int, total_requests: int, unique: bool = True) -> ScenarioResult:
+    """One WebSocket per worker; each update waits for its own verdict."""
+    import websockets
+
+    messages = message_stream(unique, f"stream c{concurrency}")
+    ws_url = base_url.replace("http", "ws", 1) + "/ws/analyze"
+    connections = [await websockets.connect(ws_url) for _ in range(concurrency)]
+    free = asyncio.Queue()
+    for connection in connections:
+        free.put_nowait(connection)
+
+    async def call(n: int) -> bool:
+        connection = await free.get()
+        try:
+            await connection.send(json.dumps({"seq": n, "message": next(messages), "user_id": f"bench-{n % 64}"}))
+            reply = json.loads(await connection.recv())
+            return reply.get("seq") == n and "error" not in reply
+        finally:
+            free.put_nowait(connection)
+
+    try:
+        return await closed_loop("ws_analyze", call, concurrency, total_requests)
+    finally:
+        for connection in connections:
+            await connection.close()
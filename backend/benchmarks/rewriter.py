@@ -0,0 +1,87 @@
+"""
+Rewriter tiers benchmark: the local lexicon rewriter against the Gemini path
+(through the Gemini stand-in), and the tiered path under a latency budget.
+
+    cd backend
+    python -m benchmarks.rewriter
+    python -m benchmarks.rewriter --gemini-profile mean=800,jitter=300,tail_rate=0.05,tail=3000 --budget-ms 1000
+
+The rewrite cache is disabled so every Gemini-path request reaches the
+stand-in. For the tiered scenario, the table also lists which tier served
+each rewrite.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from typing import List
+from benchmarks.fake_upstreams import FakeUpstreamServer, LatencyProfile, create_gemini_app
+from benchmarks.loadgen import CORPUS, ScenarioResult, closed_loop, message_stream
+from benchmarks.run import print_table
+
+def local_microseconds(rewriter, iterations: int) -> float:
+    """Mean wall time of one local rewrite over the corpus, in microseconds."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        rewriter.rewrite(CORPUS[i % len(CORPUS)])
+    return 1e6 * (time.perf_counter() - start) / iterations
+
+async def run(args) -> int:
+    gemini = FakeUpstreamServer(create_gemini_app(LatencyProfile.parse(args.gemini_profile)))
+    await gemini.start()
+    os.environ.update({
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "bench"),
+        "GEMINI_BASE_URL": gemini.url,
+        "REWRITE_CACHE_ENABLED": "false",
+        "REWRITER_MODE": "tiered",
+    })
+    # Imported after the environment is set: settings are read once.
+    from app.services.rewriter_service import RewriterService
+    from app.core.upstream import get_upstream_manager
+
+    service = RewriterService()
+    results: List[ScenarioResult] = []
+    tiers: Counter = Counter()
+    try:
+        print(f"local rewrite: {local_microseconds(service.local, 20000):.1f} us/message (tight loop)\n")
+        for concurrency in args.concurrency:
+            async def local(n: int) -> bool:
+                return bool(service.local.rewrite(CORPUS[n % len(CORPUS)]))
+            results.append(await closed_loop("local", local, concurrency, args.requests))
+
+            messages = message_stream(True, f"gemini c{concurrency}")
+            async def gemini_only(n: int) -> bool:
+                service.latency_budget = 0
+                return (await service.rewrite_with_tier(next(messages)))[1] == "gemini"
+            results.append(await closed_loop("gemini", gemini_only, concurrency, args.requests))
+
+            messages = message_stream(True, f"tiered c{concurrency}")
+            async def tiered(n: int) -> bool:
+                service.latency_budget = args.budget_ms / 1000
+                _, tier = await service.rewrite_with_tier(next(messages))
+                tiers[(concurrency, tier)] += 1
+                return tier != "fallback"
+            results.append(await closed_loop(f"tiered[{args.budget_ms:g}ms]", tiered, concurrency, args.requests))
+    finally:
+        await get_upstream_manager().aclose()
+        await gemini.stop()
+
+    print_table(results)
+    print("\nTiered rewrites served by:")
+    for (concurrency, tier), count in sorted(tiers.items()):
+        print(f"  c={concurrency:<4}{tier:<10}{count:>6}")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local vs Gemini rewriter latency against the Gemini stand-in")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 8])
+    parser.add_argument("--requests", type=int, default=100, help="rewrites per scenario and concurrency level")
+    parser.add_argument("--gemini-profile", default="mean=250,jitter=50,tail_rate=0.05,tail=2000,seed=2")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Benchmark runner. Starts the HF and Gemini stand-ins, launches the API under
+uvicorn pointed at them, drives each scenario at each concurrency level and
+prints throughput, p50/p95/p99 and error rates.
+
+    cd backend
+    python -m benchmarks.run                            # compare against benchmarks/baseline.json
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --hf-profile mean=80,jitter=20,errors=0.02 --scenarios analyze
+
+Exits with status 1 when a scenario regresses beyond --tolerance against the
+baseline (higher p95/p99, lower throughput, or a higher error rate).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+import httpx
+from benchmarks.fake_upstreams import FakeUpstreamServer, LatencyProfile, create_gemini_app, create_hf_app
+from benchmarks.loadgen import ScenarioResult, run_analyze, run_batch, run_stream
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ApiProcess:
+    """The API under test in its own process, so the load generator doesn't share its CPU."""
+
+    def __init__(self, env: Dict[str, str], port: int):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, **env}
+        )
+
+    async def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(base_url=self.url) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"API exited with status {self.process.returncode}")
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise TimeoutError("API did not become ready")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Regressions of `results` against `baseline`, as human-readable lines."""
+    previous = {(r["name"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["concurrency"]))
+        if before is None:
+            continue
+        label = f"{result['name']} @ c={result['concurrency']}"
+        for key in ("p95_ms", "p99_ms"):
+            if before[key] and result[key] and result[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{label}: {key} {before[key]} -> {result[key]}")
+        if before["throughput"] and result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {before['throughput']} -> {result['throughput']}")
+        if result["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{label}: error_rate {before['error_rate']} -> {result['error_rate']}")
+    return regressions
+
+def print_table(results: List[ScenarioResult]):
+    # Batch scenarios count whole batches per second.
+    print(f"{'scenario':<22}{'conc':>6}{'reqs':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for r in results:
+        print(f"{r.name:<22}{r.concurrency:>6}{r.requests:>7}{r.throughput:>10}{r.p50_ms or '-':>10}{r.p95_ms or '-':>10}{r.p99_ms or '-':>10}{r.error_rate:>9.2%}")
+
+async def run(args) -> int:
+    hf = FakeUpstreamServer(create_hf_app(LatencyProfile.parse(args.hf_profile)))
+    gemini = FakeUpstreamServer(create_gemini_app(LatencyProfile.parse(args.gemini_profile)))
+    await hf.start()
+    await gemini.start()
+
+    env = {
+        "HF_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "HF_INFERENCE_URL": hf.url,
+        "GEMINI_BASE_URL": gemini.url,
+        "TOXICITY_BACKEND": "remote",
+        "OFFENCE_STORE": "memory",
+        # All load comes from one address; per-client rate limits would cap it.
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    env.update(dict(item.split("=", 1) for item in args.env))
+    api = ApiProcess(env, args.port or _free_port())
+
+    results: List[ScenarioResult] = []
+    try:
+        await api.wait_ready()
+        limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+        async with httpx.AsyncClient(base_url=api.url, limits=limits, timeout=60.0) as client:
+            for concurrency in args.concurrency:
+                for scenario in args.scenarios:
+                    if scenario == "analyze":
+                        result = await run_analyze(client, concurrency, args.requests, unique=not args.cached)
+                    elif scenario == "batch":
+                        batches = max(2 * concurrency, args.requests // args.batch_size)
+                        result = await run_batch(client, concurrency, batches, args.batch_size, unique=not args.cached)
+                    else:
+                        result = await run_stream(api.url, concurrency, args.requests, unique=not args.cached)
+                    results.append(result)
+    finally:
+        api.stop()
+        await hf.stop()
+        await gemini.stop()
+
+    print_table(results)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "requests": args.requests,
+            "hf_profile": args.hf_profile,
+            "gemini_profile": args.gemini_profile,
+            "cached": args.cached,
+            "env": args.env,
+        },
+        "results": [r.to_dict() for r in results],
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.save}")
+        return 0
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"] != report["meta"]:
+            print(f"Warning: baseline was recorded with different settings: {baseline['meta']}")
+        regressions = compare(report["results"], baseline["results"], args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="SafeSpeak load test against local upstream stand-ins")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=["analyze", "batch", "stream"],
+                        help="comma-separated: analyze, batch, stream")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--hf-profile", default="mean=40,jitter=10,seed=1")
+    parser.add_argument("--gemini-profile", default="mean=250,jitter=50,seed=2")
+    parser.add_argument("--cached", action="store_true", help="repeat messages so caches can serve them")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE settings for the API")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--save", help="write results to this file (e.g. a new baseline)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import os
+
+# The services refuse to start without keys; tests never hit the real APIs.
+os.environ.setdefault("HF_API_KEY", "test-hf-key")
+os.environ.setdefault("GEMINI_API_KEY", "test-gemini-key")
+
+import pytest
+from app.main import app
+from app.api.deps import get_toxicity_service, get_rewriter_service, get_decision_service, get_admission_controller
+from app.services.decision_engine import DecisionService
+from tests.fakes import FakeRewriterService, FakeToxicityService
+
+@pytest.fixture
+def override_services():
+    """
+    Installs fake (or given) toxicity and rewriter services, a real
+    DecisionService and optionally an admission controller as the app's
+    dependencies; returns the toxicity and rewriter services. Cleared after
+    the test.
+    """
+    def install(toxicity=None, rewriter=None, admission=None):
+        toxicity = toxicity if toxicity is not None else FakeToxicityService()
+        rewriter = rewriter if rewriter is not None else FakeRewriterService()
+        app.dependency_overrides[get_toxicity_service] = lambda: toxicity
+        app.dependency_overrides[get_rewriter_service] = lambda: rewriter
+        app.dependency_overrides[get_decision_service] = DecisionService
+        if admission is not None:
+            app.dependency_overrides[get_admission_controller] = lambda: admission
+        return toxicity, rewriter
+
+    yield install
+    app.dependency_overrides.clear()
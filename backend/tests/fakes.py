@@ -0,0 +1,70 @@
+"""Stand-ins for the toxicity and rewriter services in API tests."""
+import asyncio
+from typing import Dict, Optional
+from app.schemas.analysis import AnalysisResult
+from app.services.resilience import ResilientCaller
+
+class FakeToxicityService:
+    """
+    Messages containing "stupid" score severity 50, "boom" fails, anything
+    else is clean. `delays` holds per-message latencies, `delay` the rest.
+    """
+    cache = None
+    near_duplicates = None
+    batcher = None
+    prefilter = None
+    upstream = ResilientCaller("toxicity", max_timeout=1.0)
+
+    def __init__(self, delay: float = 0.0, delays: Optional[Dict[str, float]] = None):
+        self.delay = delay
+        self.delays = delays or {}
+        self.completed = []
+        self.batch_calls = 0
+
+    def _score(self, text: str) -> AnalysisResult:
+        if text == "boom":
+            return AnalysisResult(label="error", score=0.0, severity=0.0)
+        if "stupid" in text:
+            return AnalysisResult(label="toxic", score=0.5, severity=50)
+        return AnalysisResult(label="clean", score=0.01, severity=1)
+
+    async def analyze(self, text: str) -> AnalysisResult:
+        await asyncio.sleep(self.delays.get(text, self.delay))
+        self.completed.append(text)
+        return self._score(text)
+
+    async def analyze_incremental(self, text: str) -> AnalysisResult:
+        return await self.analyze(text)
+
+    async def analyze_batch(self, texts):
+        self.batch_calls += 1
+        return [self._score(text) for text in texts]
+
+    async def warmup(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+class FakeRewriterService:
+    cache = None
+    near_duplicates = None
+    upstream = ResilientCaller("rewriter", max_timeout=1.0)
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def rewrite_with_tier(self, text: str):
+        await asyncio.sleep(self.delay)
+        self.calls.append(text)
+        return "Please be kind.", "gemini"
+
+    async def rewrite(self, text: str) -> str:
+        return (await self.rewrite_with_tier(text))[0]
+
+    async def warmup(self):
+        pass
+
+    async def aclose(self):
+        pass
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+class RedisStandIn:
+    """
+    Minimal in-process Redis-protocol server for tests. Supports the commands
+    RedisOffenceStore uses plus HELLO and MULTI/EXEC; anything else gets +OK.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.commands = []
+        self.server = None
+        self._writers = set()
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/0"
+
+    async def stop(self):
+        for writer in list(self._writers):
+            writer.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        queued = None
+        proto = 2
+        self._writers.add(writer)
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                name = command[0].upper()
+                self.commands.append(name)
+                if name == "HELLO" and len(command) > 1:
+                    proto = int(command[1])
+                if name == "MULTI":
+                    queued = []
+                    writer.write(b"+OK\r\n")
+                elif name == "EXEC":
+                    replies = [self._execute(c, proto) for c in queued]
+                    queued = None
+                    writer.write(b"*%d\r\n" % len(replies) + b"".join(replies))
+                elif queued is not None:
+                    queued.append(command)
+                    writer.write(b"+QUEUED\r\n")
+                else:
+                    writer.write(self._execute(command, proto))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        parts = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:])
+            parts.append((await reader.readexactly(length + 2))[:-2].decode())
+        return parts
+
+    def _get(self, key):
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.get(key)
+
+    def _execute(self, command, proto: int) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name in ("INCR", "INCRBY"):
+            value = int(self._get(args[0]) or 0) + (int(args[1]) if name == "INCRBY" else 1)
+            self.data[args[0]] = str(value)
+            return b":%d\r\n" % value
+        if name == "EXPIRE":
+            self.expiry[args[0]] = time.time() + int(args[1])
+            return b":1\r\n"
+        if name == "GET":
+            return self._bulk(self._get(args[0]), proto)
+        if name == "MGET":
+            return b"*%d\r\n" % len(args) + b"".join(self._bulk(self._get(k), proto) for k in args)
+        if name == "HELLO":
+            fields = ["server", "redis", "version", "7.0.0", "proto", str(proto)]
+            return b"*%d\r\n" % len(fields) + b"".join(self._bulk(f, proto) for f in fields)
+        return b"+OK\r\n"
+
+    @staticmethod
+    def _bulk(value, proto: int) -> bytes:
+        if value is None:
+            return b"_\r\n" if proto == 3 else b"$-1\r\n"
+        encoded = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(encoded), encoded)
@@ -0,0 +1,115 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.admission import AdmissionController, TokenBucketLimiter
+from app.services.resilience import ConcurrencyLimiter, UpstreamOverloaded
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket_refills_and_stays_bounded():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, max_clients=3, clock=clock)
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(1.0)
+    clock.now = 1.0
+    assert limiter.acquire("a") == 0
+
+    for user in ("b", "c", "d"):
+        limiter.acquire(user)
+    assert len(limiter) == 3 and limiter.acquire("a") == 0  # "a" was evicted and starts full
+
+def test_concurrency_limiter_queues_then_sheds():
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        order = []
+
+        async def call(name, hold):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        first = asyncio.create_task(call("first", 0.02))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(call("second", 0))
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloaded):
+            await call("third", 0)  # queue already holds "second"
+        await asyncio.gather(first, second)
+
+        slow = asyncio.create_task(call("slow", 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloaded):
+            await call("timed-out", 0)
+        await slow
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["first", "second", "slow"]
+    assert stats["rejected"] == 2 and stats["in_flight"] == 0 and stats["waiting"] == 0
+
+def test_rate_limited_user_gets_429_with_retry_after(override_services):
+    admission = AdmissionController(
+        TokenBucketLimiter(rate=0.5, burst=1), ConcurrencyLimiter(max_concurrency=4), overload_threshold=10
+    )
+    override_services(admission=admission)
+    noisy = TestClient(app, client=("10.0.0.1", 50000))
+    assert noisy.post("/analyze", json={"message": "hi", "user_id": "a"}).status_code == 200
+    # A different user_id from the same client doesn't get a fresh bucket.
+    response = noisy.post("/analyze", json={"message": "hi", "user_id": "b"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    quiet = TestClient(app, client=("10.0.0.2", 50000))
+    assert quiet.post("/analyze", json={"message": "hi", "user_id": "a"}).status_code == 200
+
+def test_clients_sharing_a_default_user_id_have_separate_buckets(override_services):
+    # Every extension install sends user_id "browser_user"; requests without one are "anonymous".
+    admission = AdmissionController(
+        TokenBucketLimiter(rate=0.5, burst=1), ConcurrencyLimiter(max_concurrency=4), overload_threshold=10
+    )
+    override_services(admission=admission)
+    for i in range(30):
+        client = TestClient(app, client=(f"10.0.1.{i}", 50000))
+        assert client.post("/analyze", json={"message": "hi", "user_id": "browser_user"}).status_code == 200
+        assert client.post("/analyze", json={"message": "hi"}).status_code == 429
+        with client.websocket_connect("/ws/analyze") as ws:
+            ws.send_json({"seq": 1, "message": "hi", "user_id": "browser_user"})
+            assert ws.receive_json()["error"] == "rate_limited"
+    assert admission.stats()["tracked_clients"] == 30
+
+def test_client_header_identifies_callers_behind_a_proxy(override_services, monkeypatch):
+    from app.core.config import get_settings
+    monkeypatch.setattr(get_settings(), "RATE_LIMIT_CLIENT_HEADER", "X-Forwarded-For")
+    admission = AdmissionController(
+        TokenBucketLimiter(rate=0.5, burst=1), ConcurrencyLimiter(max_concurrency=4), overload_threshold=10
+    )
+    override_services(admission=admission)
+    proxy = TestClient(app)
+    for forwarded in ("203.0.113.1", "10.0.0.1, 203.0.113.2"):
+        response = proxy.post("/analyze", json={"message": "hi"}, headers={"X-Forwarded-For": forwarded})
+        assert response.status_code == 200
+    # The proxy appends the real address; a spoofed leftmost entry doesn't get a fresh bucket.
+    spoofed = {"X-Forwarded-For": "198.51.100.7, 203.0.113.1"}
+    assert proxy.post("/analyze", json={"message": "hi"}, headers=spoofed).status_code == 429
+
+@pytest.mark.parametrize("policy", ["degrade", "reject"])
+def test_low_priority_requests_are_shed_under_overload(policy, override_services):
+    # Threshold 0: the upstream limiter always counts as overloaded.
+    admission = AdmissionController(None, ConcurrencyLimiter(max_concurrency=4), overload_threshold=0, policy=policy)
+    override_services(admission=admission)
+    client = TestClient(app)
+    normal = client.post("/analyze", json={"message": "you are stupid", "user_id": "u"})
+    assert normal.json()["rewrite"] == "Please be kind." and not normal.json()["degraded"]
+
+    low = client.post("/analyze", json={"message": "you are stupid", "user_id": "u", "priority": "low"})
+    if policy == "degrade":
+        assert low.status_code == 200
+        assert low.json()["degraded"] and low.json()["rewrite"] is None
+        assert low.json()["action"] == "block_and_rewrite"
+    else:
+        assert low.status_code == 429 and low.headers["Retry-After"] == "1"
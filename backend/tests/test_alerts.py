@@ -0,0 +1,102 @@
+import asyncio
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from benchmarks.fake_upstreams import FakeUpstreamServer
+from app.schemas.analysis import AnalysisResult
+from app.services.alerts import AlertDispatcher
+from app.services.decision_engine import DecisionService
+
+def create_receiver(fail_first: int = 0) -> FastAPI:
+    """Webhook stand-in: records payloads, answering 503 to the first `fail_first` posts."""
+    app = FastAPI()
+    app.state.payloads = []
+    app.state.posts = 0
+
+    @app.post("/hook")
+    async def hook(request: Request):
+        app.state.posts += 1
+        if app.state.posts <= fail_first:
+            return JSONResponse({"error": "busy"}, status_code=503)
+        app.state.payloads.append(await request.json())
+        return {"ok": True}
+
+    return app
+
+async def with_receiver(receiver: FastAPI, scenario):
+    server = FakeUpstreamServer(receiver)
+    await server.start()
+    try:
+        async with httpx.AsyncClient() as http:
+            return await scenario(f"{server.url}/hook", http)
+    finally:
+        await server.stop()
+
+def test_alerts_are_batched_deduplicated_and_retried():
+    receiver = create_receiver(fail_first=1)
+
+    async def scenario(url, http):
+        dispatcher = AlertDispatcher(url, http, window=0.05, retries=2, retry_backoff=0.01)
+        assert dispatcher.submit("a", severity=80) is True
+        assert dispatcher.submit("a", severity=95) is False
+        assert dispatcher.submit("b", severity=85) is True
+        await asyncio.sleep(0.3)
+        # Still inside a's dedup window after delivery.
+        assert dispatcher.submit("a", severity=90) is False
+        await dispatcher.aclose()
+        return dispatcher.stats()
+
+    stats = asyncio.run(with_receiver(receiver, scenario))
+    assert receiver.state.posts == 2 and len(receiver.state.payloads) == 1
+    alerts = {alert["user_id"]: alert for alert in receiver.state.payloads[0]["alerts"]}
+    assert alerts["a"]["count"] == 2 and alerts["a"]["max_severity"] == 95
+    assert stats["delivered"] == 2 and stats["retries"] == 1
+    assert stats["merged"] == 1 and stats["suppressed"] == 1 and stats["queued"] == 0
+
+def test_overflow_policy_is_explicit():
+    def run(overflow):
+        receiver = create_receiver()
+
+        async def scenario(url, http):
+            dispatcher = AlertDispatcher(url, http, window=0.05, max_queue=2, overflow=overflow)
+            for user in ("a", "b", "c"):
+                dispatcher.submit(user, severity=90)
+            await asyncio.sleep(0.2)
+            await dispatcher.aclose()
+            return dispatcher.stats()
+
+        stats = asyncio.run(with_receiver(receiver, scenario))
+        return [alert["user_id"] for alert in receiver.state.payloads[0]["alerts"]], stats["dropped"]
+
+    assert run("drop_newest") == (["a", "b"], 1)
+    assert run("drop_oldest") == (["b", "c"], 1)
+
+def test_failed_batches_are_counted_and_dropped():
+    async def scenario():
+        async with httpx.AsyncClient() as http:
+            # Nothing listens on port 9 locally.
+            dispatcher = AlertDispatcher("http://127.0.0.1:9/hook", http, window=0.01, retries=1, retry_backoff=0.01)
+            dispatcher.submit("a", severity=90)
+            await asyncio.sleep(0.3)
+            await dispatcher.aclose()
+            return dispatcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["failed"] == 1 and stats["retries"] == 1 and stats["queued"] == 0
+
+def test_decision_service_queues_alerts_for_block_and_alert():
+    class RecordingDispatcher:
+        def __init__(self):
+            self.alerts = []
+
+        def submit(self, user_id, **details):
+            self.alerts.append((user_id, details))
+            return True
+
+    service = DecisionService()
+    service.alerts = RecordingDispatcher()
+    severe = AnalysisResult(label="severe", score=0.9, severity=90)
+    clean = AnalysisResult(label="clean", score=0.0, severity=1)
+    asyncio.run(service.decide_batch([severe, clean], ["alert-user", "fine-user"]))
+    assert [user for user, _ in service.alerts.alerts] == ["alert-user"]
+    assert service.alerts.alerts[0][1]["severity"] == 90 and service.alerts.alerts[0][1]["escalated"] is False
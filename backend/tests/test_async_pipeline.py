@@ -0,0 +1,37 @@
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from tests.fakes import FakeRewriterService, FakeToxicityService
+
+def slow_services(override_services):
+    override_services(FakeToxicityService(delay=0.2), FakeRewriterService(delay=0.2))
+
+def test_analyze_awaits_async_services(override_services):
+    slow_services(override_services)
+    client = TestClient(app)
+    response = client.post("/analyze", json={"message": "you are stupid", "user_id": "test"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["action"] == "block_and_rewrite"
+    assert data["rewrite"] == "Please be kind."
+
+def test_concurrent_requests_overlap(override_services):
+    import httpx
+
+    slow_services(override_services)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.post("/analyze", json={"message": "hello", "user_id": f"u{i}"})
+                for i in range(20)
+            ])
+            return time.perf_counter() - start, responses
+
+    elapsed, responses = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    # 20 sequential calls would take >= 4s.
+    assert elapsed < 2.0
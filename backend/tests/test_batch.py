@@ -0,0 +1,52 @@
+import asyncio
+import json
+import httpx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.toxicity_service import ToxicityService
+
+def test_batch_endpoint_preserves_order_and_rewrites_only_flagged(override_services):
+    toxicity, rewriter = override_services()
+    client = TestClient(app)
+    response = client.post("/analyze/batch", json={"items": [
+        {"message": "hello", "user_id": "a"},
+        {"message": "you are stupid", "user_id": "b"},
+        {"message": "boom", "user_id": "c"},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["result"]["action"] == "allow"
+    assert results[1]["result"]["rewrite"] == "Please be kind."
+    assert results[2]["result"] is None and results[2]["error"]
+    assert toxicity.batch_calls == 1
+    assert rewriter.calls == ["you are stupid"]
+
+def test_batch_items_reject_single_message_options(override_services):
+    toxicity, _ = override_services()
+    client = TestClient(app)
+    for option in ({"defer_rewrite": True}, {"incremental": True}, {"priority": "low"}):
+        response = client.post("/analyze/batch", json={"items": [{"message": "hello", **option}]})
+        assert response.status_code == 422
+    assert toxicity.batch_calls == 0
+
+def test_analyze_batch_chunks_upstream_calls():
+    requests_seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["inputs"]
+        requests_seen.append(inputs)
+        return httpx.Response(200, json=[
+            [{"label": "toxic", "score": 0.9 if "hate" in text else 0.01},
+             {"label": "neutral", "score": 0.1}]
+            for text in inputs
+        ])
+
+    service = ToxicityService()
+    service.batch_size = 2
+    service.backend.http = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://hf.test")
+
+    results = asyncio.run(service.analyze_batch(["hi", "", "i hate you", "ok", "fine"]))
+
+    assert [r.label for r in results] == ["clean", "clean", "severe", "clean", "clean"]
+    assert sorted(len(inputs) for inputs in requests_seen) == [2, 2]
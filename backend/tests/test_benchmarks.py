@@ -0,0 +1,34 @@
+import asyncio
+import httpx
+from benchmarks.fake_upstreams import FakeUpstreamServer, LatencyProfile, create_hf_app
+from benchmarks.loadgen import closed_loop
+from benchmarks.run import compare
+from app.services.toxicity_backends import RemoteToxicityBackend
+
+def test_fake_hf_server_follows_latency_and_error_profile():
+    async def run():
+        server = FakeUpstreamServer(create_hf_app(LatencyProfile(mean_ms=5, jitter_ms=0, error_rate=0.5, seed=7)))
+        await server.start()
+        try:
+            async with httpx.AsyncClient(base_url=server.url) as http:
+                backend = RemoteToxicityBackend(http, "some/model")
+
+                async def call(n: int) -> bool:
+                    scores = await backend.classify(["you idiot", "hello"])
+                    return scores[0][0]["score"] > scores[1][0]["score"]
+
+                return await closed_loop("hf", call, concurrency=4, total_requests=40), server.simulator
+        finally:
+            await server.stop()
+
+    result, simulator = asyncio.run(run())
+    assert result.requests == 40 and simulator.requests == 40
+    assert result.errors == simulator.errors and 0 < result.errors < 40
+    assert result.p50_ms >= 5
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = [{"name": "analyze", "concurrency": 8, "throughput": 100.0, "p95_ms": 50.0, "p99_ms": 80.0, "error_rate": 0.0}]
+    within = [{**baseline[0], "throughput": 90.0, "p95_ms": 55.0}]
+    worse = [{**baseline[0], "throughput": 70.0, "p99_ms": 120.0, "error_rate": 0.05}]
+    assert compare(within, baseline, tolerance=0.2) == []
+    assert len(compare(worse, baseline, tolerance=0.2)) == 3
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import pytest
+from app.schemas.analysis import AnalysisResult
+from app.services.bulk_moderation import BulkModerator, BulkStalled
+from app.services.decision_engine import DecisionService
+
+class FakeToxicityService:
+    def __init__(self, fail_after_calls=None):
+        self.calls = 0
+        self.fail_after_calls = fail_after_calls
+
+    async def analyze_batch(self, texts):
+        self.calls += 1
+        if self.fail_after_calls is not None and self.calls > self.fail_after_calls:
+            return [AnalysisResult(label="error", score=0.0, severity=0.0) for _ in texts]
+        return [
+            AnalysisResult(label="toxic", score=0.5, severity=50) if "stupid" in t
+            else AnalysisResult(label="clean", score=0.01, severity=1)
+            for t in texts
+        ]
+
+class FakeRewriterService:
+    def __init__(self):
+        self.budgets = []
+
+    async def rewrite_with_tier(self, text, latency_budget=None):
+        self.budgets.append(latency_budget)
+        return "Please be kind.", "gemini"
+
+def write_corpus(path, n):
+    with open(path, "w") as f:
+        for i in range(n):
+            message = "you are stupid" if i % 3 == 0 else f"hello {i}"
+            f.write(json.dumps({"message": message, "user_id": f"u{i % 4}"}) + "\n")
+        f.write("not json\n")
+
+def read_output(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_streams_verdicts_in_input_order_with_rewrites(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_corpus(source, 25)
+    rewriter = FakeRewriterService()
+    moderator = BulkModerator(FakeToxicityService(), DecisionService(), rewriter, batch_size=4, concurrency=3)
+    stats = asyncio.run(moderator.run(str(source), str(output)))
+
+    rows = read_output(output)
+    assert [r["line"] for r in rows] == list(range(1, 27))
+    assert rows[-1] == {"line": 26, "error": "invalid record"}
+    assert rows[0]["action"] == "block_and_rewrite" and rows[0]["rewrite"] == "Please be kind."
+    assert rows[0]["rewrite_tier"] == "gemini" and set(rewriter.budgets) == {0}
+    assert rows[1]["action"] == "allow" and "rewrite" not in rows[1]
+    assert stats == {"records": 25, "invalid": 1, "errors": 0, "rewrites": 9}
+
+def test_stalled_run_resumes_from_checkpoint_without_duplicates(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_corpus(source, 20)
+
+    # Upstream starts failing after three chunks; the run stops at the checkpoint.
+    failing = BulkModerator(FakeToxicityService(fail_after_calls=3), DecisionService(), batch_size=5, concurrency=1, retries=1, retry_backoff=0)
+    with pytest.raises(BulkStalled):
+        asyncio.run(failing.run(str(source), str(output)))
+    assert [r["line"] for r in read_output(output)] == list(range(1, 16))
+
+    # Simulate a torn write after the checkpoint; resuming must discard it.
+    with open(output, "a") as f:
+        f.write('{"line": 16, "partial')
+    resumed = BulkModerator(FakeToxicityService(), DecisionService(), batch_size=5, concurrency=2)
+    stats = asyncio.run(resumed.run(str(source), str(output)))
+
+    assert [r["line"] for r in read_output(output)] == list(range(1, 22))
+    assert stats["records"] == 20 and stats["invalid"] == 1
@@ -0,0 +1,35 @@
+import asyncio
+from app.services.toxicity_service import ToxicityService, split_sentences
+from app.services.verdict_cache import VerdictCache
+
+class RecordingBackend:
+    name = "fake"
+    model_id = "fake-model"
+
+    def __init__(self):
+        self.seen = []
+
+    async def classify(self, texts):
+        self.seen.extend(texts)
+        return [[{"label": "toxic", "score": 0.9 if "idiot" in t else 0.01}] for t in texts]
+
+def test_split_sentences():
+    assert split_sentences("Hi there. How are you?\nFine!") == ["Hi there.", "How are you?", "Fine!"]
+    assert split_sentences("no punctuation yet") == ["no punctuation yet"]
+
+def test_growing_draft_only_classifies_new_sentences():
+    service = ToxicityService()
+    service.backend = RecordingBackend()
+    service.cache = VerdictCache("fake-model")
+    service.batcher = None
+    service.prefilter = None
+
+    async def run():
+        first = await service.analyze_incremental("Hi there. You are great.")
+        second = await service.analyze_incremental("Hi there. You are great. You idiot.")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.label == "clean"
+    assert second.label == "severe" and second.segment == 2
+    assert service.backend.seen == ["Hi there.", "You are great.", "You idiot."]
@@ -0,0 +1,73 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import get_settings
+from app.core.upstream import UpstreamManager, get_upstream_manager
+from app.services.local_rewriter import FALLBACK_REWRITE
+from app.services.rewriter_service import RewriterService
+from tests.fakes import FakeRewriterService
+
+class WarmableBackend:
+    def __init__(self):
+        self.calls = []
+
+    async def classify(self, texts):
+        self.calls.append(texts)
+        return [[{"label": "neutral", "score": 1.0}] for _ in texts]
+
+    async def aclose(self):
+        pass
+
+class WarmableToxicityService:
+    def __init__(self):
+        self.backend = WarmableBackend()
+        self.closed = False
+
+    async def warmup(self):
+        await self.backend.classify(["hello"])
+
+    async def aclose(self):
+        self.closed = True
+
+class FailingWarmupToxicityService(WarmableToxicityService):
+    async def warmup(self):
+        raise ConnectionError("HF unreachable")
+
+def test_lifespan_warms_up_before_ready_and_closes_on_shutdown(override_services):
+    toxicity, _ = override_services(WarmableToxicityService(), FakeRewriterService())
+    assert TestClient(app).get("/ready").status_code == 503
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["warmup"]["toxicity"]["status"] == "ok"
+        assert toxicity.backend.calls == [["hello"]]
+    assert toxicity.closed
+    assert not get_upstream_manager().ready
+
+def test_failed_toxicity_warmup_keeps_worker_unready(override_services):
+    override_services(FailingWarmupToxicityService(), FakeRewriterService())
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["warmup"]["toxicity"]["status"] == "failed"
+
+def test_upstream_clients_are_pooled_per_upstream():
+    manager = get_upstream_manager()
+    assert manager.client("hf") is manager.client("hf")
+    assert manager.client("hf") is not manager.client("gemini")
+
+def test_rewriter_warmup_fails_when_gemini_only_returns_the_fallback():
+    class UnreachableRewriter(RewriterService):
+        client = object()
+
+        def __init__(self):
+            pass
+
+        async def _generate(self, text):
+            return FALLBACK_REWRITE
+
+    manager = UpstreamManager(get_settings())
+    checks = {"toxicity": WarmableToxicityService().warmup, "rewriter": UnreachableRewriter().warmup}
+    assert asyncio.run(manager.warmup(checks, required=("toxicity",)))
+    assert manager.warmup_results["toxicity"]["status"] == "ok"
+    assert manager.warmup_results["rewriter"]["status"] == "failed"
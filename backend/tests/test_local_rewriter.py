@@ -0,0 +1,109 @@
+import asyncio
+from app.services.local_rewriter import FALLBACK_REWRITE, LocalRewriter
+from app.services.rewriter_service import RewriterService
+
+def test_local_rewriter_substitutes_and_removes_insults():
+    rewriter = LocalRewriter.from_file()
+    assert rewriter.rewrite("SHUT UP YOU IDIOT!!!") == "Please stop!"
+    assert rewriter.rewrite("you're such a stupid fucking loser") == "I disagree with you"
+    assert rewriter.rewrite("I hate you, loser") == "I am upset with you"
+    assert rewriter.rewrite("this is a damn good game") == "This is a good game"
+    assert rewriter.rewrite("See you at practice!") == "See you at practice!"
+    assert rewriter.rewrite("idiot") == ""
+
+def test_local_rewriter_leaves_ordinary_adjectives_alone():
+    rewriter = LocalRewriter.from_file()
+    assert rewriter.rewrite("That was a dumb idea") == "That was a dumb idea"
+    assert rewriter.rewrite("the fat cat sat on the mat") == "The fat cat sat on the mat"
+    assert rewriter.rewrite("take out the trash") == "Take out the trash"
+    assert rewriter.rewrite("you are so dumb") == "I disagree with you"
+    assert rewriter.rewrite("shut up you stupid idiot") == "Please stop"
+
+def test_local_rewriter_uses_custom_lexicon():
+    rewriter = LocalRewriter.from_lexicon({"substitutions": {"buzz off": "excuse me"}, "insults": ["nitwit"]})
+    assert rewriter.rewrite("Buzz   off, nitwit") == "Excuse me"
+
+def make_service(generate):
+    service = RewriterService()
+    service._generate = generate
+    return service
+
+def test_slow_gemini_falls_back_to_local_within_budget():
+    async def slow(text):
+        await asyncio.sleep(0.2)
+        return "Could you please stop?"
+
+    async def run():
+        service = make_service(slow)
+        service.latency_budget = 0.05
+        first = await service.rewrite_with_tier("shut up you idiot")
+        await asyncio.sleep(0.25)
+        # The Gemini call kept going in the background and filled the cache.
+        second = await service.rewrite_with_tier("shut up you idiot")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == ("Please stop", "local")
+    assert second == ("Could you please stop?", "gemini")
+
+def test_failed_gemini_uses_local_tier_or_fixed_fallback():
+    async def failing(text):
+        return FALLBACK_REWRITE
+
+    async def run():
+        service = make_service(failing)
+        tiered = await service.rewrite_with_tier("you are a moron")
+        service.local = None
+        gemini_only = await service.rewrite_with_tier("you are a moron")
+        return tiered, gemini_only
+
+    tiered, gemini_only = asyncio.run(run())
+    assert tiered == ("I disagree with you", "local")
+    assert gemini_only == (FALLBACK_REWRITE, "fallback")
+
+def test_local_rewriter_keeps_denied_insults():
+    rewriter = LocalRewriter.from_file()
+    assert rewriter.rewrite("you are not stupid, just wrong") == "You are not stupid, just wrong"
+    assert rewriter.rewrite("you aren't a loser") == "You aren't a loser"
+
+def test_unchanged_local_rewrite_is_never_served():
+    async def slow(text):
+        await asyncio.sleep(0.1)
+        return "I am upset with you."
+
+    async def failing(text):
+        return FALLBACK_REWRITE
+
+    async def run():
+        service = make_service(slow)
+        service.latency_budget = 0.01
+        # The lexicon doesn't know this one: Gemini gets its full timeout.
+        waited = await service.rewrite_with_tier("I will find where you live")
+        service._generate = failing
+        failed = await service.rewrite_with_tier("go back to your country")
+        service.client = None
+        local_only = await service.rewrite_with_tier("you are such a disgrace to your family")
+        return waited, failed, local_only
+
+    waited, failed, local_only = asyncio.run(run())
+    assert waited == ("I am upset with you.", "gemini")
+    assert failed == (FALLBACK_REWRITE, "fallback")
+    assert local_only == (FALLBACK_REWRITE, "fallback")
+
+def test_fully_stripped_local_rewrite_is_not_served_as_local():
+    async def slow(text):
+        await asyncio.sleep(0.1)
+        return "Please be kinder."
+
+    async def run():
+        service = make_service(slow)
+        service.latency_budget = 0.01
+        # Nothing is left locally, so Gemini gets its full timeout.
+        waited = await service.rewrite_with_tier("you idiot")
+        service.client = None
+        local_only = await service.rewrite_with_tier("you stupid loser")
+        return waited, local_only
+
+    waited, local_only = asyncio.run(run())
+    assert waited == ("Please be kinder.", "gemini")
+    assert local_only == (FALLBACK_REWRITE, "fallback")
@@ -0,0 +1,126 @@
+import asyncio
+import io
+import json
+import logging
+import threading
+import time
+import httpx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import logging as app_logging
+from app.services.alerts import AlertDispatcher
+from app.services.micro_batcher import MicroBatcher
+
+def capture(**kwargs) -> io.StringIO:
+    stream = io.StringIO()
+    app_logging.setup_logging(stream=stream, **kwargs)
+    return stream
+
+def lines(stream: io.StringIO) -> list:
+    app_logging.flush_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def test_messages_with_quotes_are_valid_json():
+    stream = capture()
+    try:
+        app_logging.logger.info('User said "hi" \\ and left')
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            app_logging.logger.exception("Failed")
+        entries = lines(stream)
+    finally:
+        app_logging.setup_logging()
+    assert entries[0]["message"] == 'User said "hi" \\ and left'
+    assert "ValueError: bad" in entries[1]["exception"]
+
+def test_request_log_carries_correlation_fields(override_services):
+    override_services()
+    stream = capture()
+    try:
+        response = TestClient(app).post(
+            "/analyze", json={"message": "you are stupid", "user_id": "kid-1"}, headers={"X-Request-ID": "req-42"}
+        )
+        assert response.headers["X-Request-ID"] == "req-42"
+        entries = [e for e in lines(stream) if e["message"] == "Analysis complete"]
+    finally:
+        app_logging.setup_logging()
+    assert len(entries) == 1
+    entry = entries[0]
+    assert entry["request_id"] == "req-42" and entry["user_id"] == "kid-1"
+    assert entry["action"] == "block_and_rewrite"
+    assert set(entry["stages_ms"]) == {"classify", "decide", "rewrite"}
+
+def test_high_volume_events_are_sampled_but_errors_are_not():
+    stream = capture(sample_rate=0.0)
+    try:
+        for _ in range(50):
+            app_logging.logger.info("request done", extra={"high_volume": True})
+        app_logging.logger.info("startup")
+        app_logging.logger.error("upstream down", extra={"high_volume": True})
+        entries = lines(stream)
+    finally:
+        app_logging.setup_logging()
+    assert [e["message"] for e in entries] == ["startup", "upstream down"]
+
+class StalledStream(io.StringIO):
+    """Blocks the writer thread on its first write until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.release.wait(timeout=5)
+        return super().write(text)
+
+def test_full_queue_drops_instead_of_blocking():
+    stream = StalledStream()
+    app_logging.setup_logging(stream=stream, queue_size=1)
+    try:
+        app_logging.logger.warning("event 0")
+        assert stream.writing.wait(timeout=5)
+        # The writer is stuck on event 0: event 1 fills the queue, the rest are dropped.
+        for i in range(1, 6):
+            app_logging.logger.warning(f"event {i}")
+        assert app_logging.logging_stats()["dropped"] == 4
+        stream.release.set()
+        while app_logging.logging_stats()["queued"]:
+            time.sleep(0.001)
+        entries = lines(stream)
+    finally:
+        stream.release.set()
+        app_logging.setup_logging()
+    assert [e["message"] for e in entries] == ["event 0", "event 1"]
+
+def test_background_workers_do_not_inherit_the_starting_requests_context():
+    seen = []
+
+    async def classify(texts):
+        seen.append(("batcher", app_logging.current_request_id()))
+        return [[] for _ in texts]
+
+    class RecordingHttp:
+        async def post(self, url, json, headers):
+            seen.append(("alerts", app_logging.current_request_id()))
+            return httpx.Response(200)
+
+    async def run():
+        batcher = MicroBatcher(classify, max_batch_size=1, max_wait=0.01)
+        alerts = AlertDispatcher("http://hook.test", RecordingHttp(), window=0.01)
+        for request_id in ("first", "second", "third"):
+            token = app_logging.bind_request(request_id=request_id, user_id=request_id)
+            try:
+                await batcher.submit("x")
+                alerts.submit(request_id, severity=90)
+            finally:
+                app_logging.unbind_request(token)
+        await asyncio.sleep(0.1)
+        await batcher.aclose()
+        await alerts.aclose()
+
+    asyncio.run(run())
+    assert {source for source, _ in seen} == {"batcher", "alerts"}
+    assert all(request_id is None for _, request_id in seen)
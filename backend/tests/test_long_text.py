@@ -0,0 +1,44 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import get_settings
+from app.services.toxicity_service import ToxicityService, split_windows
+
+class WindowBackend:
+    name = "fake"
+    model_id = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    async def classify(self, texts):
+        self.calls.append(list(texts))
+        return [[{"label": "toxic", "score": 0.9 if "idiot" in t else 0.01}] for t in texts]
+
+def test_split_windows_overlap_and_cover_all_words():
+    words = [str(i) for i in range(250)]
+    windows = split_windows(words, size=100, overlap=20)
+    assert [len(w.split()) for w in windows] == [100, 100, 90]
+    assert windows[1].split()[0] == "80"
+    assert windows[-1].split()[-1] == "249"
+
+def test_long_text_is_classified_in_windows_and_reports_trigger():
+    service = ToxicityService()
+    service.backend = WindowBackend()
+    service.cache = None
+    service.batcher = None
+    service.prefilter = None
+    service.window_words, service.window_overlap = 50, 10
+
+    text = " ".join(["hello"] * 120 + ["idiot"] + ["hello"] * 30)
+    result = asyncio.run(service.analyze(text))
+
+    assert result.label == "severe"
+    assert result.segment == 2  # first window containing the insult
+    assert len(service.backend.calls) == 1 and len(service.backend.calls[0]) == 4
+
+def test_oversized_message_is_rejected():
+    client = TestClient(app)
+    message = "a" * (get_settings().MAX_MESSAGE_CHARS + 1)
+    response = client.post("/analyze", json={"message": message, "user_id": "test"})
+    assert response.status_code == 413
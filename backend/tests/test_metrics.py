@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.resilience import ResilientCaller
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.rsplit(" ", 1)[0] == name:
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def test_metrics_endpoint_exposes_stage_latency_and_counters(override_services):
+    override_services()
+    client = TestClient(app)
+    before = sample(client.get("/metrics").text, 'safespeak_actions_total{action="block_and_rewrite"}')
+    assert client.post("/analyze", json={"message": "you are stupid", "user_id": "m1"}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert sample(body, 'safespeak_actions_total{action="block_and_rewrite"}') == before + 1
+    for stage in ("classify", "decide", "rewrite"):
+        assert sample(body, f'safespeak_stage_seconds_count{{stage="{stage}"}}') >= 1
+    assert sample(body, 'safespeak_request_seconds_count{endpoint="analyze"}') >= 1
+    assert sample(body, 'safespeak_requests_in_flight{endpoint="analyze"}') == 0
+    assert 'safespeak_component{component="toxicity_upstream",stat="state"} 0.0' in body
+
+def test_upstream_errors_are_counted_by_kind():
+    from app.core.metrics import render_metrics
+
+    async def failing():
+        raise RuntimeError("down")
+
+    async def slow():
+        await asyncio.sleep(1.0)
+
+    async def run():
+        caller = ResilientCaller("metrics-test", max_timeout=0.05)
+        with pytest.raises(RuntimeError):
+            await caller.call(failing)
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.call(slow)
+
+    asyncio.run(run())
+    body = render_metrics()[0].decode()
+    assert sample(body, 'safespeak_upstream_errors_total{kind="error",upstream="metrics-test"}') == 1
+    assert sample(body, 'safespeak_upstream_errors_total{kind="timeout",upstream="metrics-test"}') == 1
+    assert sample(body, 'safespeak_upstream_in_flight{upstream="metrics-test"}') == 0
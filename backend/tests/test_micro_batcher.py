@@ -0,0 +1,94 @@
+import asyncio
+from app.services.micro_batcher import MicroBatcher, BatcherClosed, BatcherOverloaded
+
+def test_concurrent_submits_are_grouped_and_answered_individually():
+    calls = []
+
+    async def classify(texts):
+        calls.append(list(texts))
+        return [[{"label": "toxic", "score": len(t) / 10}] for t in texts]
+
+    async def run():
+        batcher = MicroBatcher(classify, max_batch_size=4, max_wait=0.05)
+        outputs = await asyncio.gather(*[batcher.submit("x" * i) for i in range(1, 7)])
+        await batcher.aclose()
+        return outputs, batcher.stats()
+
+    outputs, stats = asyncio.run(run())
+    assert [o[0]["score"] for o in outputs] == [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
+    assert [len(c) for c in calls] == [4, 2]
+    assert stats["batches"] == 2 and stats["max_batch_size"] == 4
+
+def test_failed_batch_propagates_to_every_caller():
+    async def classify(texts):
+        raise RuntimeError("upstream down")
+
+    async def run():
+        batcher = MicroBatcher(classify, max_wait=0.01)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_full_queue_rejects():
+    async def classify(texts):
+        return [[] for _ in texts]
+
+    async def run():
+        batcher = MicroBatcher(classify, max_queue=1, max_wait=0.01)
+        # Both submits run before the worker gets a chance to drain the queue.
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        await batcher.aclose()
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(run())
+    assert results[0] == [] and isinstance(results[1], BatcherOverloaded)
+    assert stats["rejected"] == 1
+
+def test_aclose_fails_queued_and_in_flight_submits():
+    async def classify(texts):
+        await asyncio.sleep(10)
+
+    async def run():
+        batcher = MicroBatcher(classify, max_batch_size=1, max_wait=0.01, max_queue=10)
+        submits = [asyncio.ensure_future(batcher.submit(t)) for t in ("a", "b", "c")]
+        await asyncio.sleep(0.05)
+        await batcher.aclose()
+        results = await asyncio.wait_for(asyncio.gather(*submits, return_exceptions=True), timeout=1)
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(run())
+    assert all(isinstance(r, BatcherClosed) for r in results)
+    assert stats["in_flight_batches"] == 0 and stats["queue_depth"] == 0
+
+def test_failed_micro_batch_is_logged_once():
+    import io
+    import json
+    from app.core import logging as app_logging
+    from app.services.toxicity_service import ToxicityService
+
+    class DownBackend:
+        async def classify(self, texts):
+            raise RuntimeError("upstream down")
+
+    service = ToxicityService()
+    service.backend = DownBackend()
+    service.cache = None
+    service.near_duplicates = None
+    service.batcher = MicroBatcher(service._classify_batch, max_batch_size=8, max_wait=0.02)
+
+    async def run():
+        results = await asyncio.gather(*[service.analyze(f"message {i}") for i in range(5)])
+        await service.batcher.aclose()
+        return results
+
+    stream = io.StringIO()
+    app_logging.setup_logging(stream=stream)
+    try:
+        results = asyncio.run(run())
+        app_logging.flush_logging()
+        errors = [json.loads(line) for line in stream.getvalue().splitlines()]
+    finally:
+        app_logging.setup_logging()
+    assert all(r.label == "error" for r in results)
+    assert [e["message"] for e in errors if e["level"] == "ERROR"] == ["Toxicity backend error: upstream down"]
@@ -0,0 +1,67 @@
+import asyncio
+from app.schemas.analysis import AnalysisResult
+from app.services.near_duplicate import NearDuplicateIndex, fingerprint_text
+from app.services.toxicity_service import ToxicityService
+
+TOXIC = AnalysisResult(label="toxic", score=0.6, severity=60)
+FLOOD = "you are a complete idiot and everyone in this chat hates you"
+
+class CountingBackend:
+    name = "fake"
+    model_id = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def classify(self, texts):
+        self.calls += 1
+        return [[{"label": "toxic", "score": 0.6}] for _ in texts]
+
+def test_fingerprint_drops_punctuation_emoji_and_repeats():
+    assert fingerprint_text("You are SOOOO dumb!!! 😡") == "you are soo dumb"
+
+def test_variants_match_and_unrelated_text_does_not():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.put(FLOOD, TOXIC)
+    assert index.get("You are a complete IDIOT and everyone in this chat hates you!!!") == TOXIC
+    assert index.get("you are a compelte idiot and everyone in this chat hates you 😡") == TOXIC
+    assert index.get("thanks for the help earlier, the build works again now") is None
+    stats = index.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+def test_short_texts_are_never_matched():
+    index = NearDuplicateIndex(min_chars=20)
+    index.put("lol ok", TOXIC)
+    assert index.get("lol ok") is None
+    assert len(index) == 0 and index.stats()["skipped_short"] == 1
+
+def test_entries_are_bounded_and_evicted_from_buckets():
+    index = NearDuplicateIndex(max_entries=2)
+    for i in range(5):
+        index.put(f"message number {i} with some distinct padding {i * 7919}", TOXIC)
+    assert len(index) == 2 and index.stats()["evictions"] == 3
+    live = {entry_id for bucket in index._buckets.values() for entry_id in bucket}
+    assert live == set(index._entries)
+
+def test_expired_entries_are_not_reused():
+    index = NearDuplicateIndex(ttl=0.0)
+    index.put(FLOOD, TOXIC)
+    assert index.get(FLOOD) is None and len(index) == 0
+
+def test_toxicity_service_reuses_verdicts_for_variants():
+    service = ToxicityService()
+    service.backend = CountingBackend()
+    service.cache = None
+    service.batcher = None
+    service.prefilter = None
+    service.near_duplicates = NearDuplicateIndex(threshold=0.8)
+
+    async def run():
+        await service.analyze(FLOOD)
+        await service.analyze(FLOOD.upper() + "!!")
+        return await service.analyze_batch([FLOOD + " 😡", "an entirely different message about the weather"])
+
+    results = asyncio.run(run())
+    assert [r.label for r in results] == ["toxic", "toxic"]
+    assert service.backend.calls == 2
+    assert service.near_duplicates.stats()["hits"] == 2
@@ -0,0 +1,25 @@
+import asyncio
+from app.services.offence_store import RedisOffenceStore
+from tests.redis_standin import RedisStandIn
+
+def test_redis_store_counts_atomically_in_one_round_trip():
+    async def run():
+        server = RedisStandIn()
+        url = await server.start()
+        store = RedisOffenceStore(url, window_seconds=3600, buckets=12)
+        # Two stores model two workers sharing one server.
+        other = RedisOffenceStore(url, window_seconds=3600, buckets=12)
+        try:
+            counts = [await store.register("u1"), await other.register("u1"), await store.register("u2")]
+            shared = await other.count("u1")
+        finally:
+            await store.aclose()
+            await other.aclose()
+            await server.stop()
+        return counts, shared, server
+
+    counts, shared, server = asyncio.run(run())
+    assert counts == [1, 2, 1]
+    assert shared == 2
+    assert server.commands.count("MULTI") == 3 and server.commands.count("EXEC") == 3
+    assert any(ttl > 0 for ttl in server.expiry.values())
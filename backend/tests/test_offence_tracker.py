@@ -0,0 +1,40 @@
+import asyncio
+from app.schemas.analysis import AnalysisResult
+from app.services.decision_engine import DecisionService
+from app.services.offence_tracker import OffenceTracker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_offences_decay_out_of_the_window():
+    clock = FakeClock()
+    tracker = OffenceTracker(window_seconds=60, buckets=6, clock=clock)
+    assert tracker.register("u") == 1
+    clock.now = 30
+    assert tracker.register("u") == 2
+    clock.now = 65
+    assert tracker.count("u") == 1
+    clock.now = 200
+    assert tracker.count("u") == 0
+
+def test_tracked_users_are_capped_and_idle_users_evicted():
+    clock = FakeClock()
+    tracker = OffenceTracker(window_seconds=60, buckets=6, max_users=2, clock=clock)
+    for user in ("a", "b", "c"):
+        tracker.register(user)
+    assert len(tracker) == 2 and tracker.count("a") == 0
+
+    clock.now = 120
+    tracker.register("d")
+    assert len(tracker) == 1
+
+def test_escalation_uses_configured_threshold():
+    service = DecisionService()
+    service.escalation_threshold = 1
+    toxic = AnalysisResult(label="toxic", score=0.5, severity=50)
+    assert asyncio.run(service.decide(toxic, "repeat"))[0] == "block_and_rewrite"
+    assert asyncio.run(service.decide(toxic, "repeat"))[0] == "block_and_alert"
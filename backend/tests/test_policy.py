@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import pytest
+from app.schemas.analysis import AnalysisResult
+from app.services.decision_engine import DecisionService
+from app.services.policy import DEFAULT_POLICY, CompiledPolicy, PolicyError, PolicyStore, replay
+
+STRICT_POLICY = {
+    "version": "strict",
+    "bands": [
+        {"from": 0, "label": "clean", "action": "allow"},
+        {"from": 10, "label": "mild", "action": "warn"},
+        {"from": 30, "label": "toxic", "action": "block_and_alert", "offence": True},
+    ],
+}
+
+def write_policy(path, spec, mtime):
+    path.write_text(json.dumps(spec))
+    os.utime(path, (mtime, mtime))
+
+def test_default_policy_keeps_the_old_thresholds():
+    policy = CompiledPolicy.compile(DEFAULT_POLICY)
+    cases = {
+        0: ("clean", "allow"), 19: ("clean", "allow"), 20: ("mild", "warn"), 39: ("mild", "warn"),
+        40: ("toxic", "block_and_rewrite"), 70: ("toxic", "block_and_rewrite"),
+        70.5: ("toxic", "block_and_alert"), 79: ("toxic", "block_and_alert"), 80: ("severe", "block_and_alert"),
+        100: ("severe", "block_and_alert"), -1: ("clean", "allow"),
+    }
+    for severity, expected in cases.items():
+        band = policy.band_for(severity)
+        assert (band.label, band.action) == expected, severity
+
+def test_batch_lookup_matches_single_lookup():
+    policy = CompiledPolicy.compile(DEFAULT_POLICY)
+    severities = [i / 2 for i in range(0, 201)]
+    assert policy.bands_for(severities) == [policy.band_for(s) for s in severities]
+
+def test_invalid_policies_are_rejected():
+    with pytest.raises(PolicyError):
+        CompiledPolicy.compile({"bands": []})
+    with pytest.raises(PolicyError):
+        CompiledPolicy.compile({"bands": [{"from": 0, "above": 0, "label": "x", "action": "allow"}]})
+    with pytest.raises(PolicyError):
+        CompiledPolicy.compile({"bands": [{"from": 0, "label": "a", "action": "allow"}, {"from": 0, "label": "b", "action": "warn"}]})
+
+def test_store_reloads_changed_file_and_keeps_policy_on_error(tmp_path):
+    path = tmp_path / "policy.json"
+    write_policy(path, DEFAULT_POLICY, 1000)
+    store = PolicyStore(str(path), check_interval=0)
+    assert store.get().band_for(35).action == "warn"
+
+    write_policy(path, STRICT_POLICY, 2000)
+    assert store.get().version == "strict"
+    assert store.get().band_for(35).action == "block_and_alert"
+
+    path.write_text("{not json")
+    os.utime(path, (3000, 3000))
+    assert store.get().version == "strict"
+    assert store.stats()["reloads"] == 1 and store.stats()["reload_errors"] == 1
+
+def test_decision_service_follows_the_active_policy(tmp_path):
+    path = tmp_path / "policy.json"
+    write_policy(path, STRICT_POLICY, 1000)
+    service = DecisionService()
+    service.policy_store = PolicyStore(str(path), check_interval=0)
+    analysis = AnalysisResult(label="mild", score=0.35, severity=35)
+    assert asyncio.run(service.decide(analysis, "policy-user"))[0] == "block_and_alert"
+    batch = asyncio.run(service.decide_batch([analysis, AnalysisResult(label="clean", score=0.0, severity=0)], ["a", "b"]))
+    assert [action for action, _ in batch] == ["block_and_alert", "allow"]
+
+def test_replay_reports_transitions():
+    records = [
+        {"severity": 15, "action": "allow", "user_id": "u"},
+        {"severity": 35, "action": "warn", "user_id": "u"},
+        {"severity": 50, "action": "block_and_rewrite", "user_id": "u"},
+        {"message": "no severity"},
+    ]
+    report = replay(CompiledPolicy.compile(STRICT_POLICY), records)
+    assert report["records"] == 3 and report["changed"] == 3
+    assert report["transitions"]["warn -> block_and_alert"] == 1
+
+    same = replay(CompiledPolicy.compile(DEFAULT_POLICY), records, baseline=CompiledPolicy.compile(DEFAULT_POLICY))
+    assert same["changed"] == 0
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from app.services.prefilter import AhoCorasick, LexicalPreFilter, PreFilterStage
+from app.services.policy import PolicyStore
+from app.services.toxicity_service import ToxicityService
+
+class CountingBackend:
+    name = "fake"
+    model_id = "fake-model"
+
+    def __init__(self, toxic_score):
+        self.toxic_score = toxic_score
+        self.calls = 0
+
+    async def classify(self, texts):
+        self.calls += 1
+        return [[{"label": "toxic", "score": self.toxic_score}] for _ in texts]
+
+def make_service(mode, toxic_score=0.9):
+    service = ToxicityService()
+    service.backend = CountingBackend(toxic_score)
+    service.cache = None
+    service.batcher = None
+    service.prefilter = PreFilterStage(LexicalPreFilter(["kys", "go die"], ["ok", "lol"]), mode=mode)
+    return service
+
+def test_aho_corasick_finds_overlapping_patterns():
+    matcher = AhoCorasick(["he", "she", "hers"])
+    assert sorted(p for _, p in matcher.find("ushers")) == ["he", "hers", "she"]
+
+def test_prefilter_requires_whole_words():
+    prefilter = LexicalPreFilter(["kys"], ["ok"])
+    assert prefilter.check("just KYS!").label == "severe"
+    assert prefilter.check("skyscraper") is None
+    assert prefilter.check("ok!!").label == "clean"
+    assert prefilter.check("ok but you are wrong") is None
+
+def test_enforce_mode_skips_model():
+    service = make_service("enforce")
+    result = asyncio.run(service.analyze("go die"))
+    assert result.label == "severe"
+    assert service.backend.calls == 0
+
+def test_shadow_mode_calls_model_and_records_agreement():
+    service = make_service("shadow", toxic_score=0.9)
+    asyncio.run(service.analyze("go die"))
+    asyncio.run(service.analyze("lol"))
+    stats = service.prefilter.stats()
+    assert service.backend.calls == 2
+    assert stats["shadow_agree"] == 1 and stats["shadow_disagree"] == 1
+
+def test_enforced_verdicts_are_labelled_by_the_policy(tmp_path):
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps({"version": "renamed", "bands": [
+        {"from": 0, "label": "ok", "action": "allow"},
+        {"from": 50, "label": "abusive", "action": "block_and_alert", "offence": True},
+    ]}))
+    service = make_service("enforce")
+    service.policy_store = PolicyStore(str(path), check_interval=0)
+    assert asyncio.run(service.analyze("go die")).label == "abusive"
+    assert [r.label for r in asyncio.run(service.analyze_batch(["kys", "lol"]))] == ["abusive", "ok"]
+    assert service.prefilter.stats()["severe_hits"] == 2
+
+def test_long_text_windows_skip_the_prefilter():
+    service = make_service("shadow")
+    service.window_words, service.window_overlap = 4, 1
+    asyncio.run(service.analyze("lol " + "word " * 10 + "go die"))
+    asyncio.run(service.analyze_batch(["kys " + "word " * 10]))
+    stats = service.prefilter.stats()
+    assert stats["checks"] == 2 and stats["severe_hits"] == 2
+    assert stats["shadow_agree"] + stats["shadow_disagree"] == 2
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from app.services.resilience import ConcurrencyLimiter, ResilientCaller, CircuitOpenError
+from app.services.toxicity_service import ToxicityService
+from app.services.decision_engine import DecisionService
+
+def test_breaker_opens_rejects_and_recovers():
+    async def failing():
+        raise RuntimeError("down")
+
+    async def ok():
+        return "ok"
+
+    async def run():
+        caller = ResilientCaller("test", max_timeout=1.0, failure_threshold=2, reset_seconds=0.05)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await caller.call(failing)
+        with pytest.raises(CircuitOpenError):
+            await caller.call(ok)
+        assert caller.breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        assert await caller.call(ok) == "ok"
+        return caller.stats()
+
+    stats = asyncio.run(run())
+    assert stats["state"] == "closed" and stats["rejected"] == 1
+    assert stats["transitions"] == 3  # closed -> open -> half_open -> closed
+
+def test_timeout_adapts_to_observed_latency():
+    caller = ResilientCaller("test", max_timeout=10.0, min_timeout=0.01, timeout_multiplier=2.0, min_samples=5)
+    assert caller.current_timeout() == 10.0
+    for _ in range(5):
+        caller.latency.record(0.1)
+    assert caller.current_timeout() == pytest.approx(0.2)
+
+def test_hedged_request_wins_when_primary_stalls():
+    attempts = []
+
+    async def flaky():
+        attempt = len(attempts)
+        attempts.append(attempt)
+        await asyncio.sleep(1.0 if attempt == 0 else 0.01)
+        return attempt
+
+    async def run():
+        caller = ResilientCaller("test", max_timeout=5.0, hedge=True, min_samples=1)
+        caller.latency.record(0.02)
+        return await caller.call(flaky), caller.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == 1 and stats["hedged"] == 1
+
+def test_hedge_needs_a_free_limiter_slot():
+    async def slow(seconds):
+        await asyncio.sleep(seconds)
+        return seconds
+
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrency=2)
+        caller = ResilientCaller("test", max_timeout=5.0, hedge=True, min_samples=1, limiter=limiter)
+        caller.latency.record(0.01)
+        # Two stalled calls hold both slots, so neither may hedge.
+        results = await asyncio.gather(caller.call(lambda: slow(0.05)), caller.call(lambda: slow(0.05)))
+        full = caller.stats()
+        assert limiter.in_flight == 0
+
+        # Alone, the call hedges into the free slot and gives it back.
+        await caller.call(lambda: slow(0.2))
+        assert limiter.in_flight == 0
+        return results, full, caller.stats()
+
+    results, full, stats = asyncio.run(run())
+    assert results == [0.05, 0.05]
+    assert full["hedged"] == 0 and full["hedges_skipped"] == 2
+    assert stats["hedged"] == 1
+
+def test_open_toxicity_breaker_serves_fallback_without_calling_backend():
+    class CountingBackend:
+        calls = 0
+
+        async def classify(self, texts):
+            CountingBackend.calls += 1
+            raise RuntimeError("down")
+
+    service = ToxicityService()
+    service.backend = CountingBackend()
+    service.cache = None
+    service.batcher = None
+    service.upstream = ResilientCaller("toxicity", max_timeout=1.0, failure_threshold=1, reset_seconds=60)
+
+    async def run():
+        return [await service.analyze(f"message {i}") for i in range(3)]
+
+    results = asyncio.run(run())
+    assert CountingBackend.calls == 1
+    assert [r.label for r in results] == ["error", "fallback", "fallback"]
+
+def test_fallback_verdicts_are_decided_everywhere_but_never_count_as_offences():
+    class DownBackend:
+        async def classify(self, texts):
+            raise RuntimeError("down")
+
+    class RecordingDispatcher:
+        def __init__(self):
+            self.alerts = []
+
+        def submit(self, user_id, **details):
+            self.alerts.append(user_id)
+            return True
+
+    service = ToxicityService()
+    service.backend = DownBackend()
+    service.cache = None
+    service.batcher = None
+    service.near_duplicates = None
+    service.fallback_severity = 50
+    service.upstream = ResilientCaller("toxicity", max_timeout=1.0, failure_threshold=1, reset_seconds=60)
+    decisions = DecisionService()
+    decisions.alerts = RecordingDispatcher()
+
+    async def run():
+        await service.analyze("trip the breaker")
+        single = [await service.analyze("message") for _ in range(3)]
+        batch = await service.analyze_batch(["one", "two"])
+        long_text = await service.analyze(" ".join(["word"] * (service.window_words * 2)))
+        draft = await service.analyze_incremental("First sentence. Second sentence.")
+        actions = [await decisions.decide(result, "user") for result in single]
+        actions += await decisions.decide_batch(batch, ["user", "user"])
+        return single + batch + [long_text, draft], actions, await decisions._get_offence_count("user")
+
+    results, actions, offences = asyncio.run(run())
+    assert all(r.label == "fallback" and r.severity == 50 for r in results)
+    assert len(set(actions)) == 1 and actions[0][0] != "allow"
+    assert offences == 0 and decisions.alerts.alerts == []
@@ -0,0 +1,50 @@
+import asyncio
+from app.services.rewrite_cache import RewriteCache
+from app.services.rewriter_service import FALLBACK_REWRITE
+
+def test_concurrent_identical_requests_share_one_call():
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return "Please stop."
+
+    async def run():
+        cache = RewriteCache("m")
+        results = await asyncio.gather(*[cache.get_or_compute("shut up", compute) for _ in range(25)])
+        again = await cache.get_or_compute("shut up", compute)
+        return results, again, cache.stats()
+
+    results, again, stats = asyncio.run(run())
+    assert calls == ["shut up"]
+    assert set(results) == {"Please stop."} and again == "Please stop."
+    assert stats["misses"] == 1 and stats["coalesced"] == 24 and stats["hits"] == 1
+
+def test_fallback_is_not_cached():
+    calls = []
+
+    async def compute(text):
+        calls.append(text)
+        return FALLBACK_REWRITE
+
+    async def run():
+        cache = RewriteCache("m", uncacheable=[FALLBACK_REWRITE])
+        await cache.get_or_compute("x", compute)
+        await cache.get_or_compute("x", compute)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+def test_size_bound_evicts_oldest():
+    async def compute(text):
+        return text.upper()
+
+    async def run():
+        cache = RewriteCache("m", max_size=1)
+        await cache.get_or_compute("a", compute)
+        await cache.get_or_compute("b", compute)
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["size"] == 1 and stats["evictions"] == 1
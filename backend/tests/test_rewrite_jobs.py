@@ -0,0 +1,62 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.rewrite_jobs import RewriteJobStore, JobStoreFull
+from tests.fakes import FakeRewriterService
+
+def test_deferred_rewrite_returns_job_then_result(override_services):
+    override_services(rewriter=FakeRewriterService(delay=0.1))
+    with TestClient(app) as client:
+        response = client.post("/analyze", json={"message": "you are stupid", "user_id": "u", "defer_rewrite": True})
+        data = response.json()
+        assert data["action"] == "block_and_rewrite"
+        assert data["rewrite"] is None and data["rewrite_job_id"]
+
+        stream = client.get(f"/rewrite/{data['rewrite_job_id']}/stream")
+        event = json.loads(stream.text.split("data: ", 1)[1])
+        assert event == {
+            "job_id": data["rewrite_job_id"], "status": "done", "rewrite": "Please be kind.", "rewrite_tier": "gemini"
+        }
+
+        assert client.get(f"/rewrite/{data['rewrite_job_id']}").json()["status"] == "done"
+        assert client.get("/rewrite/unknown").status_code == 404
+
+def test_store_is_bounded_and_expires():
+    async def rewrite(text):
+        await asyncio.sleep(1)
+        return text, "local"
+
+    async def run():
+        store = RewriteJobStore(max_jobs=1, ttl=60)
+        store.submit("a", rewrite)
+        try:
+            store.submit("b", rewrite)
+            raise AssertionError("expected JobStoreFull")
+        except JobStoreFull:
+            pass
+
+        expiring = RewriteJobStore(ttl=0)
+        job_id = expiring.submit("a", rewrite)
+        return expiring.get(job_id)
+
+    assert asyncio.run(run()) is None
+
+def test_full_store_evicts_expired_then_read_jobs_first():
+    async def rewrite(text):
+        return text, "local"
+
+    async def run():
+        store = RewriteJobStore(max_jobs=3, ttl=60)
+        expired, read, unread = (store.submit(text, rewrite) for text in ("a", "b", "c"))
+        await asyncio.sleep(0)
+        store._jobs[expired].expires = 0
+        assert store.get(read).status == "done"
+
+        store.submit("d", rewrite)
+        assert store.get(expired) is None and store.get(unread) is not None
+        store.submit("e", rewrite)
+        assert store.get(read) is None and store.get(unread).rewrite == "c"
+        assert store.stats()["evicted_unread"] == 0
+
+    asyncio.run(run())
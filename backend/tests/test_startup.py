@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous for slow CI machines; importing app.main takes well under 1s locally.
+COLD_START_BUDGET = float(os.environ.get("COLD_START_BUDGET", "2.0"))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("google.genai", "transformers", "torch", "optimum", "redis") if m in sys.modules]
+print(json.dumps({"seconds": elapsed, "heavy": heavy}))
+"""
+
+def run_probe() -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in ("HF_API_KEY", "GEMINI_API_KEY")}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_app_imports_without_api_keys_and_without_heavy_sdks():
+    probe = run_probe()
+    assert probe["heavy"] == []
+
+def test_cold_import_stays_within_budget():
+    # Best of three, so one noisy run doesn't fail the build.
+    seconds = min(run_probe()["seconds"] for _ in range(3))
+    assert seconds < COLD_START_BUDGET, f"import app.main took {seconds:.2f}s (budget {COLD_START_BUDGET}s)"
+
+def test_rewriter_requires_its_key_when_built():
+    from app.core.config import get_settings
+    from app.services.rewriter_service import RewriterService
+
+    settings = get_settings()
+    key, settings.GEMINI_API_KEY = settings.GEMINI_API_KEY, None
+    try:
+        with pytest.raises(ValueError, match="GEMINI_API_KEY"):
+            RewriterService()
+    finally:
+        settings.GEMINI_API_KEY = key
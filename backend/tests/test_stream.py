@@ -0,0 +1,28 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from tests.fakes import FakeToxicityService
+
+def test_newer_update_supersedes_in_flight_one(override_services):
+    toxicity, _ = override_services(FakeToxicityService(delays={"first draft": 0.5}))
+    client = TestClient(app)
+    with client.websocket_connect("/ws/analyze") as ws:
+        ws.send_json({"seq": 1, "message": "first draft"})
+        ws.send_json({"seq": 2, "message": "second draft"})
+        assert ws.receive_json()["seq"] == 2
+
+        ws.send_json({"seq": 1, "message": "late duplicate"})
+        ws.send_json({"seq": 3, "message": "third draft"})
+        reply = ws.receive_json()
+        assert reply["seq"] == 3 and reply["action"] == "allow"
+    assert "first draft" not in toxicity.completed
+    assert "late duplicate" not in toxicity.completed
+
+def test_malformed_frame_gets_an_error_reply(override_services):
+    override_services()
+    client = TestClient(app)
+    with client.websocket_connect("/ws/analyze") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json() == {"seq": None, "error": "Invalid update"}
+        # The connection is still usable.
+        ws.send_json({"seq": 1, "message": "hello"})
+        assert ws.receive_json()["action"] == "allow"
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from app.services.toxicity_backends import LocalToxicityBackend
+from app.services.toxicity_service import ToxicityService
+
+class FakeBackend:
+    name = "fake"
+    model_id = "fake-model"
+
+    def __init__(self):
+        self.calls = []
+
+    async def classify(self, texts):
+        self.calls.append(list(texts))
+        return [[{"label": "toxic", "score": 0.85}, {"label": "neutral", "score": 0.15}] for _ in texts]
+
+@pytest.fixture
+def tiny_model_path(tmp_path):
+    pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "you", "are", "nice", "awful"]
+    vocab_file = tmp_path / "vocab.txt"
+    vocab_file.write_text("\n".join(vocab))
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=8, num_hidden_layers=1, num_attention_heads=1,
+        intermediate_size=8, id2label={0: "neutral", 1: "toxic"}, label2id={"neutral": 0, "toxic": 1}
+    )
+    transformers.BertForSequenceClassification(config).save_pretrained(tmp_path)
+    transformers.BertTokenizer(str(vocab_file)).save_pretrained(tmp_path)
+    return str(tmp_path)
+
+def test_local_backend_returns_label_score_lists(tiny_model_path):
+    backend = LocalToxicityBackend(tiny_model_path)
+    outputs = asyncio.run(backend.classify(["you are nice", "you are awful"]))
+
+    assert len(outputs) == 2
+    for scores in outputs:
+        assert {item["label"] for item in scores} == {"neutral", "toxic"}
+        assert sum(item["score"] for item in scores) == pytest.approx(1.0, abs=1e-4)
+
+def test_service_scores_backend_output():
+    service = ToxicityService()
+    service.backend = FakeBackend()
+    service.cache = None
+
+    result = asyncio.run(service.analyze("anything"))
+    assert result.label == "severe" and result.severity == 85
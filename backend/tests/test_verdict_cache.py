@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+from app.schemas.analysis import AnalysisResult
+from app.services.verdict_cache import VerdictCache, cache_key
+
+TOXIC = AnalysisResult(label="toxic", score=0.6, severity=60)
+
+def test_key_normalizes_text_and_includes_model():
+    assert cache_key("  LOL   ok ", "m") == cache_key("lol ok", "m")
+    assert cache_key("lol", "m1") != cache_key("lol", "m2")
+
+def test_lru_eviction_and_counters():
+    async def run():
+        cache = VerdictCache("m", max_size=2)
+        await cache.put("a", TOXIC)
+        await cache.put("b", TOXIC)
+        assert await cache.get("a") == TOXIC  # "b" is now least recently used
+        await cache.put("c", TOXIC)
+        assert await cache.get("b") is None
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["evictions"] == 1
+
+def test_ttl_expiry():
+    async def run():
+        cache = VerdictCache("m", ttl=0.0)
+        await cache.put("a", TOXIC)
+        return await cache.get("a")
+
+    assert asyncio.run(run()) is None
+
+def test_error_results_are_not_cached():
+    async def run():
+        cache = VerdictCache("m")
+        await cache.put("a", AnalysisResult(label="error", score=0.0, severity=0.0))
+        return await cache.get("a")
+
+    assert asyncio.run(run()) is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+
+    async def run():
+        await VerdictCache("m", path=path).put("same insult", TOXIC)
+        restarted = VerdictCache("m", path=path)
+        return await restarted.get("same insult"), restarted.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == TOXIC
+    assert stats["disk_hits"] == 1
+
+def test_disk_tier_purges_expired_rows_and_stays_bounded(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+
+    async def run():
+        expired = VerdictCache("m", ttl=0.0, path=path, disk_purge_every=1000)
+        for i in range(5):
+            await expired.put(f"old {i}", TOXIC)
+        cache = VerdictCache("m", path=path, disk_max_rows=3, disk_purge_every=2)
+        for i in range(6):
+            await cache.put(f"new {i}", TOXIC)
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] == 3
+    assert stats["disk_evictions"] == 3
@@ -4,7 +4,9 @@
     console.log("SafeSpeak: Initializing...");
 
     // Configuration
-    const API_URL = "http://localhost:10000/analyze";
+    const API_BASE = "http://localhost:10000";
+    const API_URL = `${API_BASE}/analyze`;
+    const WS_URL = API_BASE.replace(/^http/, 'ws') + "/ws/analyze";
 
     // Dependencies
     const TooltipManager = new window.SafeSpeak.TooltipManager();
@@ -12,6 +14,12 @@
     let justBlocked = false;
     let lastAnalysedText = "";
 
+    // Streaming channel: one socket, updates tagged with increasing seq numbers.
+    // Only the reply for the latest seq is acted on.
+    let socket = null;
+    let seq = 0;
+    const pendingTargets = new Map();
+
     // Adapter Selection
     const url = window.location.href;
     if (window.SafeSpeak.WhatsAppAdapter.matches(url)) {
@@ -22,6 +30,30 @@
 
     // Start Adapter
     currentAdapter.start(handleInput);
+    connectSocket();
+
+    function connectSocket() {
+        socket = new WebSocket(WS_URL);
+        socket.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            const target = pendingTargets.get(data.seq);
+            // Replies can arrive after a newer update was sent: forget only
+            // this seq and older ones, never the drafts still in flight.
+            for (const pendingSeq of pendingTargets.keys()) {
+                if (pendingSeq <= data.seq) pendingTargets.delete(pendingSeq);
+            }
+            if (data.seq !== seq || !target) return;
+            if (data.error) {
+                console.error("SafeSpeak Error:", data.error);
+                return;
+            }
+            handleDecision(target, data);
+        };
+        socket.onclose = () => {
+            socket = null;
+            setTimeout(connectSocket, 5000);
+        };
+    }
 
     async function handleInput(target) {
         const text = currentAdapter.getText(target);
@@ -39,23 +71,33 @@
         if (text === lastAnalysedText) return;
         lastAnalysedText = text;
 
+        seq += 1;
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            console.log("SafeSpeak: Analyzing (stream)...", text);
+            pendingTargets.set(seq, target);
+            socket.send(JSON.stringify({ seq, message: text, user_id: 'browser_user', defer_rewrite: true, incremental: true }));
+            return;
+        }
+
+        // Fallback when the socket is unavailable
+        const requestSeq = seq;
         try {
             console.log("SafeSpeak: Analyzing...", text);
             const response = await fetch(API_URL, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ message: text, user_id: 'browser_user' })
+                body: JSON.stringify({ message: text, user_id: 'browser_user', defer_rewrite: true })
             });
 
             const data = await response.json();
-            handleDecision(target, data);
+            if (requestSeq === seq) handleDecision(target, data);
         } catch (error) {
             console.error("SafeSpeak Error:", error);
         }
     }
 
     function handleDecision(target, data) {
-        const { action, analysis, rewrite, reason } = data;
+        const { action, analysis, rewrite, reason, rewrite_job_id } = data;
 
         TooltipManager.remove();
 
@@ -66,6 +108,24 @@
             currentAdapter.setText(target, ""); // Clear text
         }
 
+        showTooltip(target, action, reason, rewrite);
+
+        // Rewrite is produced in the background; update the tooltip when it lands.
+        if (rewrite_job_id) {
+            const source = new EventSource(`${API_BASE}/rewrite/${rewrite_job_id}/stream`);
+            const shownTooltip = TooltipManager.currentTooltip;
+            source.addEventListener('rewrite', (event) => {
+                source.close();
+                const job = JSON.parse(event.data);
+                if (job.status === 'done' && TooltipManager.currentTooltip === shownTooltip) {
+                    showTooltip(target, action, reason, job.rewrite);
+                }
+            });
+            source.onerror = () => source.close();
+        }
+    }
+
+    function showTooltip(target, action, reason, rewrite) {
         const position = currentAdapter.getTooltipPosition(target);
         TooltipManager.show(
             target,